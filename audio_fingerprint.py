@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Decoded-audio fingerprints for finding re-encoded duplicate tracks
+
+Byte-identical copies of a download are caught by the library scanner's
+sampled content hash. A re-encode (another bitrate, container or tag set)
+has different bytes but the same music, so this compares what it sounds
+like instead:
+
+- The first FINGERPRINT_SECONDS are decoded mono at 8 kHz (from the PCM
+  cache when the track is already there, else straight from the file)
+- Every 0.1 s frame keeps one value: the log-spaced band (250-3500 Hz)
+  with the most energy relative to that band's median over the track.
+  Silent frames are marked and ignored. The result is one byte per frame
+- Two fingerprints match when, at the best alignment within MAX_OFFSET
+  frames (encoder delay/padding), at least MATCH_THRESHOLD of the frames
+  voiced in both have the same peak band
+
+Only tracks whose durations are within DURATION_SLACK of each other are
+compared, so grouping a sorted library is close to linear.
+"""
+
+from typing import Hashable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+FINGERPRINT_RATE = 8000
+FRAME_SIZE = 1024
+HOP_SIZE = 800              # 0.1 s
+FINGERPRINT_SECONDS = 120.0
+BANDS = 32
+BAND_RANGE = (250.0, 3500.0)
+SILENT = 255                # frame marker: no usable peak
+
+# Matching
+MATCH_THRESHOLD = 0.5       # unrelated music agrees on ~1/BANDS to ~0.2 of frames
+MAX_OFFSET = 5              # frames (0.5 s) of alignment search
+MIN_OVERLAP = 50            # voiced frames both fingerprints must share
+DURATION_SLACK = 1.0        # seconds
+
+
+def _decode_mono(path) -> np.ndarray:
+    """Up to FINGERPRINT_SECONDS of path as mono float32 at FINGERPRINT_RATE"""
+    from audio_mixer import _Decoder
+    from pcm_cache import default_pcm_cache
+
+    cache = default_pcm_cache()
+    pcm = cache.lookup(path) if cache.enabled else None
+    decoder = _Decoder(path, FINGERPRINT_RATE, 1,
+                       input_args=pcm.ffmpeg_input() if pcm is not None else None)
+    samples = np.empty((int(FINGERPRINT_SECONDS * FINGERPRINT_RATE), 1), dtype=np.float32)
+    try:
+        frames = decoder.read(samples)
+    finally:
+        decoder.close()
+    return samples[:frames, 0]
+
+
+def _band_edges() -> np.ndarray:
+    """rfft bin index of each band boundary"""
+    edges_hz = np.geomspace(BAND_RANGE[0], BAND_RANGE[1], BANDS + 1)
+    return np.rint(edges_hz * FRAME_SIZE / FINGERPRINT_RATE).astype(np.intp)
+
+
+def fingerprint_samples(samples: np.ndarray) -> bytes:
+    """Peak band per HOP_SIZE frame of mono FINGERPRINT_RATE samples"""
+    if len(samples) < FRAME_SIZE:
+        return b""
+
+    count = 1 + (len(samples) - FRAME_SIZE) // HOP_SIZE
+    frames = np.lib.stride_tricks.as_strided(
+        samples, shape=(count, FRAME_SIZE), strides=(samples.strides[0] * HOP_SIZE, samples.strides[0]))
+    power = np.square(np.abs(np.fft.rfft(frames * np.hanning(FRAME_SIZE).astype(np.float32), axis=1)))
+
+    edges = _band_edges()
+    bands = np.add.reduceat(power[:, edges[0]:edges[-1]], edges[:-1] - edges[0], axis=1)
+    log_bands = np.log(bands + 1e-10)
+
+    # Relative to each band's typical level, so the peak isn't always the bass
+    peaks = np.argmax(log_bands - np.median(log_bands, axis=0), axis=1).astype(np.uint8)
+    peaks[bands.sum(axis=1) < 1e-6 * FRAME_SIZE] = SILENT
+    return peaks.tobytes()
+
+
+def fingerprint(path) -> bytes:
+    """Fingerprint of path's audio (b"" when it is too short); raises
+    RuntimeError when ffmpeg cannot decode path"""
+    return fingerprint_samples(_decode_mono(path))
+
+
+def similarity(a: bytes, b: bytes) -> float:
+    """Best fraction of shared voiced frames with equal peaks, over small offsets"""
+    x = np.frombuffer(a, dtype=np.uint8)
+    y = np.frombuffer(b, dtype=np.uint8)
+    best = 0.0
+    for offset in range(-MAX_OFFSET, MAX_OFFSET + 1):
+        xs = x[max(offset, 0):]
+        ys = y[max(-offset, 0):]
+        n = min(len(xs), len(ys))
+        xs, ys = xs[:n], ys[:n]
+        voiced = (xs != SILENT) & (ys != SILENT)
+        overlap = int(voiced.sum())
+        if overlap >= MIN_OVERLAP:
+            best = max(best, float(np.mean(xs[voiced] == ys[voiced])))
+    return best
+
+
+def duplicate_groups(entries: Sequence[Tuple[Hashable, float, Optional[bytes]]]
+                     ) -> List[List[Hashable]]:
+    """
+    Groups (of 2+) of entry keys that sound the same
+
+    entries are (key, duration, fingerprint); keys come back in entry order,
+    so the first key of a group is the earliest entry.
+    """
+    order = {key: i for i, (key, _, _) in enumerate(entries)}
+    usable = sorted((e for e in entries if e[1] > 0 and e[2]), key=lambda e: e[1])
+    parent = {key: key for key, _, _ in usable}
+
+    def root(key):
+        while parent[key] != key:
+            parent[key] = parent[parent[key]]
+            key = parent[key]
+        return key
+
+    for i, (key, duration, fp) in enumerate(usable):
+        for other, other_duration, other_fp in usable[i + 1:]:
+            if other_duration - duration > DURATION_SLACK:
+                break
+            a, b = root(key), root(other)
+            if a != b and similarity(fp, other_fp) >= MATCH_THRESHOLD:
+                first, second = sorted((a, b), key=order.get)
+                parent[second] = first
+
+    groups = {}
+    for key in parent:
+        groups.setdefault(root(key), []).append(key)
+    return [sorted(keys, key=order.get) for keys in groups.values() if len(keys) > 1]
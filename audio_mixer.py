@@ -0,0 +1,583 @@
+#!/usr/bin/env python3
+"""
+Streaming audio mixer
+Mix background music under narration in constant memory
+
+Replaces the pydub path (decode everything, `music * repeats`, overlay,
+export) with three ffmpeg processes connected through fixed-size float32
+blocks:
+
+- Narration and music are decoded to f32le PCM at a common sample rate
+  (mono inputs stay mono and are broadcast to every channel); music shorter
+  than the narration loops seamlessly (music_loop: cached bar-aligned loop
+  points, equal-power crossfade), or via -stream_loop -1 with MUSIC_LOOP=hard
+- Each block gets the music gain (and optional fades), is summed with the
+  narration and clipped, exactly like pydub's gain + overlay
+- Mixed blocks are piped straight into the encoder. A .wav output is
+  written as float32 PCM, so a mix that is only an intermediate (muxed into
+  the video later) costs no lossy generation: the container's AAC encode is
+  the only one
+- Optional sidechain ducking: a pre-pass turns the narration into a small
+  RMS envelope (strided windows), smoothed with attack/release into a gain
+  curve that is interpolated onto each music block
+
+- stream_mix_platforms renders several mixes (e.g. one per platform) from
+  one decode of each input: per-platform gain vectors over shared blocks,
+  with each mix's loudness target solved from shared stem statistics
+
+Peak memory is a few blocks regardless of narration length. Output length
+follows the narration, as with the pydub mix.
+"""
+
+import os
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from local_renderer import ffmpeg_bin
+from media_probe import probe
+
+# Samples per channel per block (~1.5 s at 44.1 kHz)
+BLOCK_FRAMES = 65536
+
+# Ducking analysis: narration is measured at this rate in RMS windows
+ENVELOPE_RATE = 16000
+ENVELOPE_WINDOW = 0.05   # seconds per RMS window (hop is half a window)
+
+# Default ducking shape
+DUCK_THRESHOLD_DB = -40.0  # narration level where ducking starts
+DUCK_KNEE_DB = 10.0        # dB above threshold to reach full duck
+DUCK_ATTACK = 0.08         # seconds to duck (applied as lookahead too)
+DUCK_RELEASE = 0.6         # seconds to recover in speech gaps
+
+# How much louder music plays in narration gaps than under speech
+DUCK_GAP_BOOST_DB = float(os.getenv("MUSIC_DUCK_BOOST_DB", "8"))
+
+
+# ElevenLabs output format; pcm_* keeps narration lossless (see save_tts_audio)
+TTS_OUTPUT_FORMAT = os.getenv("ELEVENLABS_OUTPUT_FORMAT", "pcm_24000")
+
+
+def ducking_enabled() -> bool:
+    """Sidechain ducking is on unless MUSIC_DUCKING=0"""
+    return os.getenv("MUSIC_DUCKING", "1") != "0"
+
+
+def volume_to_db(volume: float) -> float:
+    """Linear gain (e.g. 0.15) to dB"""
+    return 20.0 * np.log10(max(volume, 1e-6))
+
+
+def probe_audio(path) -> Tuple[int, int, float]:
+    """(sample_rate, channels, duration_seconds) of the first audio stream"""
+    info = probe(path)
+    if not info.sample_rate:
+        raise RuntimeError(f"No audio stream found in {path}")
+    return info.sample_rate, info.channels or 2, info.duration
+
+
+def encoder_args(output_path, bitrate: str = "192k") -> List[str]:
+    """ffmpeg audio codec args for output_path: float PCM for .wav, else bitrate"""
+    if Path(output_path).suffix.lower() == '.wav':
+        return ['-c:a', 'pcm_f32le']
+    return ['-b:a', bitrate]
+
+
+def save_tts_audio(chunks, output_path, output_format: str = TTS_OUTPUT_FORMAT) -> Path:
+    """
+    Write a TTS response stream to disk
+
+    pcm_<rate> responses (16-bit mono) are wrapped in a WAV header and saved
+    next to output_path with a .wav suffix; anything else (mp3_*) is written
+    as-is. Returns the path written.
+    """
+    output_path = Path(output_path)
+    if not output_format.startswith("pcm_"):
+        with open(output_path, "wb") as f:
+            for chunk in chunks:
+                if chunk:
+                    f.write(chunk)
+        return output_path
+
+    import wave
+
+    output_path = output_path.with_suffix(".wav")
+    with wave.open(str(output_path), "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(int(output_format.split("_")[1]))
+        # Joined first: HTTP chunks may split a sample
+        wf.writeframes(b"".join(chunk for chunk in chunks if chunk))
+    return output_path
+
+
+class _Decoder:
+    """ffmpeg subprocess decoding one input to interleaved float32 blocks"""
+
+    def __init__(self, path, rate: int, channels: int, loop: bool = False,
+                 input_args: Optional[List[str]] = None):
+        self.channels = channels
+        self._stderr = tempfile.TemporaryFile()
+        cmd = [ffmpeg_bin(), '-hide_banner', '-loglevel', 'error']
+        if loop:
+            cmd += ['-stream_loop', '-1']
+        # input_args replaces '-i path' (e.g. raw PCM from pcm_cache)
+        cmd += input_args or ['-i', str(path)]
+        cmd += ['-vn', '-f', 'f32le', '-acodec', 'pcm_f32le',
+                '-ar', str(rate), '-ac', str(channels), '-']
+        self._proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=self._stderr)
+        self._eof = False
+
+    def read(self, buffer: np.ndarray) -> int:
+        """Fill buffer (frames x channels) from the stream; returns frames read"""
+        view = memoryview(buffer).cast('B')
+        filled = 0
+        while filled < len(view):
+            n = self._proc.stdout.readinto(view[filled:])
+            if not n:
+                self._eof = True
+                break
+            filled += n
+        return filled // (4 * self.channels)
+
+    def close(self):
+        """Stop the decode; raises if ffmpeg failed (not when stopped early here)"""
+        killed = False
+        if not self._eof and self._proc.poll() is None:
+            self._proc.kill()
+            killed = True
+        self._proc.stdout.close()
+        returncode = self._proc.wait()
+        self._stderr.seek(0)
+        stderr = self._stderr.read().decode('utf-8', errors='ignore').strip()
+        self._stderr.close()
+        if not killed and returncode != 0:
+            raise RuntimeError(f"Audio decode failed ({returncode}): {stderr[-2000:]}")
+
+
+def _close_all(*closers):
+    """Call every closer, then re-raise the first failure"""
+    errors = []
+    for close in closers:
+        try:
+            close()
+        except RuntimeError as e:
+            errors.append(e)
+    if errors:
+        raise errors[0]
+
+
+def _music_source(music_path, rate: int, channels: int, music_duration: float,
+                  narr_duration: float):
+    """
+    Music stream long enough for the narration (seamless loop when it has to
+    loop); tracks are decoded once into the PCM cache and read from there
+    """
+    from music_loop import looping_source, seamless_loop_enabled
+    from pcm_cache import open_track
+
+    if music_duration >= narr_duration:
+        return open_track(music_path, rate, channels)
+    if seamless_loop_enabled():
+        try:
+            return looping_source(music_path, rate, channels, duration=music_duration)
+        except (RuntimeError, ValueError, OSError) as e:
+            print(f"  [WARNING] Seamless loop unavailable ({e}), looping end-to-start")
+    return open_track(music_path, rate, channels, loop=True)
+
+
+class _Encoder:
+    """ffmpeg subprocess encoding piped float32 blocks into output_path"""
+
+    def __init__(self, output_path, rate: int, channels: int, bitrate: str):
+        self._stderr = tempfile.TemporaryFile()
+        self._proc = subprocess.Popen(
+            [ffmpeg_bin(), '-y', '-hide_banner', '-loglevel', 'error',
+             '-f', 'f32le', '-ar', str(rate), '-ac', str(channels), '-i', '-',
+             *encoder_args(output_path, bitrate), str(output_path)],
+            stdin=subprocess.PIPE, stderr=self._stderr
+        )
+
+    def write(self, block: np.ndarray):
+        self._proc.stdin.write(memoryview(block).cast('B'))
+
+    def finish(self):
+        """Close the pipe and wait; raises if ffmpeg failed"""
+        try:
+            self._proc.stdin.close()
+        except (BrokenPipeError, OSError):
+            pass
+        returncode = self._proc.wait()
+        self._stderr.seek(0)
+        stderr = self._stderr.read().decode('utf-8', errors='ignore').strip()
+        self._stderr.close()
+        if returncode != 0:
+            raise RuntimeError(f"Audio encode failed ({returncode}): {stderr[-2000:]}")
+
+
+def narration_envelope(narration_path, window: float = ENVELOPE_WINDOW,
+                       rate: int = ENVELOPE_RATE) -> Tuple[np.ndarray, float]:
+    """
+    RMS level of the narration in half-overlapping windows
+
+    Decodes mono at `rate` in blocks and measures each block with strided
+    window views, so memory is one block plus the (tiny) envelope.
+    Returns (rms per window, hop in seconds); window i is centred at
+    i * hop + window / 2.
+    """
+    meter = _WindowRMS(window, rate)
+    decoder = _Decoder(narration_path, rate, 1)
+    block = np.empty((BLOCK_FRAMES, 1), dtype=np.float32)
+    try:
+        while True:
+            frames = decoder.read(block)
+            if frames == 0:
+                break
+            meter.add(block[:frames, 0])
+    finally:
+        decoder.close()
+    return meter.result()
+
+
+class _WindowRMS:
+    """RMS of a mono stream in half-overlapping windows, fed block by block"""
+
+    def __init__(self, window: float, rate: int):
+        self.win = max(1, int(window * rate))
+        self.hop = max(1, self.win // 2)
+        self.rate = rate
+        self._tail = np.empty(0, dtype=np.float32)
+        self._levels = []
+
+    def add(self, samples: np.ndarray):
+        samples = np.concatenate((self._tail, samples))
+        if len(samples) < self.win:
+            self._tail = samples
+            return
+        windows = np.lib.stride_tricks.sliding_window_view(samples, self.win)[::self.hop]
+        self._levels.append(np.sqrt(np.mean(np.square(windows), axis=1)))
+        self._tail = samples[len(windows) * self.hop:].copy()
+
+    def result(self) -> Tuple[np.ndarray, float]:
+        rms = np.concatenate(self._levels) if self._levels else np.zeros(1, dtype=np.float32)
+        return rms, self.hop / self.rate
+
+
+def duck_curve(rms: np.ndarray, hop: float, speech_gain_db: float, gap_gain_db: float,
+               threshold_db: float = DUCK_THRESHOLD_DB, knee_db: float = DUCK_KNEE_DB,
+               attack: float = DUCK_ATTACK, release: float = DUCK_RELEASE,
+               window: float = ENVELOPE_WINDOW) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Music gain curve from a narration envelope
+
+    Speech activity ramps from 0 at threshold_db to 1 at threshold_db +
+    knee_db, looks ahead by `attack` so the music dips before a phrase
+    starts, and is smoothed with separate attack/release time constants.
+    Music sits at gap_gain_db in silence and speech_gain_db under speech.
+    Returns (times in seconds, linear gains) for np.interp.
+    """
+    level_db = 20.0 * np.log10(np.maximum(rms, 1e-9))
+    activity = np.clip((level_db - threshold_db) / knee_db, 0.0, 1.0)
+
+    lookahead = int(round(attack / hop))
+    if lookahead > 0 and len(activity) > 1:
+        padded = np.concatenate((activity, np.zeros(lookahead, dtype=activity.dtype)))
+        activity = np.lib.stride_tricks.sliding_window_view(padded, lookahead + 1).max(axis=1)
+
+    # One-pole attack/release smoothing at envelope rate (~40 values per second)
+    a_attack = np.exp(-hop / max(attack, 1e-6))
+    a_release = np.exp(-hop / max(release, 1e-6))
+    smoothed = np.empty_like(activity)
+    state = 0.0
+    for i, target in enumerate(activity.tolist()):
+        coeff = a_attack if target > state else a_release
+        state = target + coeff * (state - target)
+        smoothed[i] = state
+
+    gain_db = gap_gain_db + (speech_gain_db - gap_gain_db) * smoothed
+    times = np.arange(len(smoothed)) * hop + window / 2
+    return times, (10.0 ** (gain_db / 20.0)).astype(np.float32)
+
+
+def stream_mix(music_path, narration_path, output_path, music_gain_db: float = -20.0,
+               bitrate: str = "192k", fade_in: float = 0.0, fade_out: float = 0.0,
+               gap_gain_db: Optional[float] = None, duck_options: Optional[Dict] = None,
+               normalize: bool = False, block_frames: int = BLOCK_FRAMES) -> Dict:
+    """
+    Mix looped, attenuated music under narration and encode output_path
+    (float PCM when it is a .wav, otherwise bitrate-coded by extension)
+
+    Sample rate and channel count are the larger of the two inputs (what
+    pydub's overlay would pick); a mono input is duplicated into every
+    channel like pydub does (ffmpeg's upmix would drop it by 3 dB). fade_in /
+    fade_out shape the music only.
+
+    With gap_gain_db set, the music is ducked: music_gain_db applies under
+    speech and gap_gain_db in narration gaps (duck_options are passed on to
+    duck_curve). Without it the gain is flat, as before.
+
+    normalize halves the sum, as ffmpeg's amix does by default with two
+    inputs, so the result is level-matched with an amix graph it replaces
+    (narration at -6 dB rather than unity). Returns render stats.
+    """
+    start_time = time.perf_counter()
+    output_path = Path(output_path)
+
+    music_rate, music_channels, music_duration = probe_audio(music_path)
+    narr_rate, narr_channels, narr_duration = probe_audio(narration_path)
+    rate = max(music_rate, narr_rate)
+    channels = max(music_channels, narr_channels)
+
+    gain = np.float32(10 ** (music_gain_db / 20.0))
+    fade_in_frames = int(fade_in * rate)
+    fade_out_frames = int(fade_out * rate)
+    total_frames = int(narr_duration * rate)
+
+    curve = None
+    if gap_gain_db is not None:
+        rms, hop = narration_envelope(narration_path)
+        curve = duck_curve(rms, hop, music_gain_db, gap_gain_db, **(duck_options or {}))
+
+    # Mono inputs stay mono and broadcast across channels when mixed
+    narr_channels = 1 if narr_channels == 1 else channels
+    music_channels = 1 if music_channels == 1 else channels
+    narration = _Decoder(narration_path, rate, narr_channels)
+    music = _music_source(music_path, rate, music_channels, music_duration, narr_duration)
+
+    encoder = _Encoder(output_path, rate, channels, bitrate)
+
+    narr_block = np.empty((block_frames, narr_channels), dtype=np.float32)
+    music_block = np.empty((block_frames, music_channels), dtype=np.float32)
+    mix_block = np.empty((block_frames, channels), dtype=np.float32)
+    envelope = np.empty(block_frames, dtype=np.float32)
+    position = 0
+
+    try:
+        while True:
+            frames = narration.read(narr_block)
+            if frames == 0:
+                break
+
+            got = music.read(music_block[:frames])
+            if got < frames:
+                music_block[got:frames] = 0.0
+
+            mixed = mix_block[:frames]
+            if curve is not None or fade_in_frames or fade_out_frames:
+                env = envelope[:frames]
+                idx = np.arange(position, position + frames, dtype=np.float64)
+                if curve is not None:
+                    env[:] = np.interp(idx / rate, curve[0], curve[1])
+                else:
+                    env[:] = gain
+                if fade_in_frames:
+                    env *= np.clip(idx / fade_in_frames, 0.0, 1.0)
+                if fade_out_frames:
+                    env *= np.clip((total_frames - idx) / fade_out_frames, 0.0, 1.0)
+                np.multiply(music_block[:frames], env[:, None], out=mixed)
+            else:
+                np.multiply(music_block[:frames], gain, out=mixed)
+
+            mixed += narr_block[:frames]
+            if normalize:
+                mixed *= np.float32(0.5)
+            np.clip(mixed, -1.0, 1.0, out=mixed)
+            encoder.write(mixed)
+            position += frames
+    except BrokenPipeError:
+        pass
+    finally:
+        _close_all(narration.close, music.close, encoder.finish)
+
+    if position == 0:
+        raise RuntimeError(f"No audio decoded from {narration_path}")
+
+    elapsed = time.perf_counter() - start_time
+    return {
+        "frames": position,
+        "duration_seconds": position / rate,
+        "sample_rate": rate,
+        "channels": channels,
+        "ducked": curve is not None,
+        "elapsed_seconds": elapsed,
+        "realtime_factor": (position / rate) / elapsed if elapsed > 0 else 0.0,
+        "output": str(output_path)
+    }
+
+
+def stream_mix_platforms(music_path, narration_path, mixes: Dict[str, Dict],
+                         bitrate: str = "192k", duck_options: Optional[Dict] = None,
+                         block_frames: int = BLOCK_FRAMES) -> Dict:
+    """
+    Several mixes of one narration and music track (e.g. one per platform),
+    decoding each input once
+
+    mixes maps a name to {"output_path", "music_gain_db"} plus optional
+    "gap_gain_db" (ducking, as in stream_mix), "target_lufs" and
+    "true_peak_db" (loudness normalization). Both stems are read through
+    the PCM cache, so two passes over them cost one decode:
+
+    1. Analysis: the narration envelope for the duck curves and, per 100 ms,
+       the K-weighted narration energy A, music energy B, their cross term X
+       and both sample peaks. A mix with music gain g then has energy
+       A + 2gX + g^2 B, so every mix's loudness (and the gain that brings
+       it to target) follows in closed form before anything is encoded. g
+       is taken as constant within each 100 ms; with the music 15-30 dB
+       under speech this is accurate to well under 0.1 LU.
+    2. Render: a (mixes x frames) gain matrix, with the loudness gain folded
+       in, scales the shared music block; the scaled narration is added and
+       each row is piped to its own encoder.
+
+    Returns shared render stats plus {"mixes": {name: {"output",
+    "loudness_gain_db", "integrated_lufs", "peak_db", "ducked"}}}, where
+    integrated_lufs and peak_db (an upper bound on the sample peak) describe
+    the encoded mix.
+    """
+    from loudness import (DEFAULT_TRUE_PEAK_DB, SUBBLOCK_SECONDS, KWeighting,
+                          correction_gain, gated_loudness)
+    from pcm_cache import open_track
+
+    start_time = time.perf_counter()
+    names = list(mixes)
+
+    music_rate, music_channels, music_duration = probe_audio(music_path)
+    narr_rate, narr_channels, narr_duration = probe_audio(narration_path)
+    rate = max(music_rate, narr_rate)
+    channels = max(music_channels, narr_channels)
+    narr_channels = 1 if narr_channels == 1 else channels
+    music_channels = 1 if music_channels == 1 else channels
+
+    def open_stems():
+        return (open_track(narration_path, rate, narr_channels),
+                _music_source(music_path, rate, music_channels, music_duration, narr_duration))
+
+    # Blocks hold whole 100 ms sub-blocks so the statistics never straddle reads
+    sub = int(rate * SUBBLOCK_SECONDS)
+    block_frames = max(1, block_frames // sub) * sub
+    narr_block = np.empty((block_frames, narr_channels), dtype=np.float32)
+    music_block = np.empty((block_frames, music_channels), dtype=np.float32)
+
+    # Pass 1: shared stem statistics
+    meter = _WindowRMS(ENVELOPE_WINDOW, rate)
+    k_narr, k_music = KWeighting(rate, narr_channels), KWeighting(rate, music_channels)
+    energies, peaks = [], []
+    narration, music = open_stems()
+    try:
+        while True:
+            frames = narration.read(narr_block)
+            if frames == 0:
+                break
+            got = music.read(music_block[:frames])
+            padded = -(-frames // sub) * sub
+            music_block[got:padded] = 0.0
+            narr_block[frames:padded] = 0.0
+
+            meter.add(narr_block[:frames].mean(axis=1))
+
+            kn, km = np.broadcast_arrays(k_narr.process(narr_block[:frames]),
+                                         k_music.process(music_block[:frames]))
+            whole = frames // sub * sub
+            energies.append(np.stack([
+                (a[:whole] * b[:whole]).reshape(-1, sub * a.shape[1]).mean(axis=1) * a.shape[1]
+                for a, b in ((kn, kn), (kn, km), (km, km))
+            ]))
+            peaks.append(np.stack([
+                np.abs(block[:padded]).reshape(-1, sub * block.shape[1]).max(axis=1)
+                for block in (narr_block, music_block)
+            ]))
+    finally:
+        _close_all(narration.close, music.close)
+
+    if not energies:
+        raise RuntimeError(f"No audio decoded from {narration_path}")
+
+    narr_energy, cross, music_energy = np.concatenate(energies, axis=1)
+    narr_peak, music_peak = np.concatenate(peaks, axis=1)
+    rms, hop = meter.result()
+
+    # Per-mix music gain: a duck curve or a flat gain, sampled per sub-block
+    curves, flat = [], np.zeros(len(names), dtype=np.float32)
+    centres = (np.arange(len(narr_peak)) + 0.5) * SUBBLOCK_SECONDS
+    sub_gains = np.empty((len(names), len(centres)))
+    for i, name in enumerate(names):
+        spec = mixes[name]
+        curve = None
+        if spec.get("gap_gain_db") is not None:
+            curve = duck_curve(rms, hop, spec["music_gain_db"], spec["gap_gain_db"],
+                               **(duck_options or {}))
+            sub_gains[i] = np.interp(centres, curve[0], curve[1])
+        else:
+            flat[i] = 10 ** (spec["music_gain_db"] / 20.0)
+            sub_gains[i] = flat[i]
+        curves.append(curve)
+
+    g = sub_gains[:, :len(narr_energy)]
+    premix_lufs = gated_loudness(narr_energy + 2.0 * g * cross + g * g * music_energy)
+    with np.errstate(divide="ignore"):
+        premix_peak_db = 20.0 * np.log10((narr_peak + sub_gains * music_peak).max(axis=1, initial=0.0))
+
+    results, loudness_gain_db = {}, np.zeros(len(names))
+    for i, name in enumerate(names):
+        spec = mixes[name]
+        if spec.get("target_lufs") is not None:
+            measurement = {"integrated_lufs": float(premix_lufs[i]),
+                           "true_peak_db": float(premix_peak_db[i])}
+            loudness_gain_db[i] = correction_gain(measurement, spec["target_lufs"],
+                                                  spec.get("true_peak_db", DEFAULT_TRUE_PEAK_DB))
+        results[name] = {
+            "output": str(spec["output_path"]),
+            "loudness_gain_db": float(loudness_gain_db[i]),
+            "integrated_lufs": float(premix_lufs[i] + loudness_gain_db[i]),
+            "peak_db": float(premix_peak_db[i] + loudness_gain_db[i]),
+            "ducked": curves[i] is not None,
+        }
+    output_gain = (10 ** (loudness_gain_db / 20.0)).astype(np.float32)
+
+    # Pass 2: all mixes from the same blocks
+    gain_block = np.empty((len(names), block_frames), dtype=np.float32)
+    mix_block = np.empty((len(names), block_frames, channels), dtype=np.float32)
+    encoders = [_Encoder(mixes[name]["output_path"], rate, channels, bitrate) for name in names]
+    narration, music = open_stems()
+    position = 0
+
+    try:
+        while True:
+            frames = narration.read(narr_block)
+            if frames == 0:
+                break
+            got = music.read(music_block[:frames])
+            if got < frames:
+                music_block[got:frames] = 0.0
+
+            gains = gain_block[:, :frames]
+            seconds = np.arange(position, position + frames, dtype=np.float64) / rate
+            for i, curve in enumerate(curves):
+                gains[i] = flat[i] if curve is None else np.interp(seconds, curve[0], curve[1])
+            gains *= output_gain[:, None]
+
+            mixed = mix_block[:, :frames]
+            np.multiply(music_block[None, :frames], gains[:, :, None], out=mixed)
+            mixed += narr_block[None, :frames] * output_gain[:, None, None]
+            np.clip(mixed, -1.0, 1.0, out=mixed)
+            for encoder, row in zip(encoders, mixed):
+                encoder.write(row)
+            position += frames
+    except BrokenPipeError:
+        pass
+    finally:
+        _close_all(narration.close, music.close, *(encoder.finish for encoder in encoders))
+
+    elapsed = time.perf_counter() - start_time
+    return {
+        "frames": position,
+        "duration_seconds": position / rate,
+        "sample_rate": rate,
+        "channels": channels,
+        "elapsed_seconds": elapsed,
+        "realtime_factor": (position / rate) / elapsed if elapsed > 0 else 0.0,
+        "mixes": results
+    }
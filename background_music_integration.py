@@ -85,7 +85,7 @@ class BackgroundMusicIntegration:
         return cache_path
 
     def mix_with_narration(self, narration_path: str, bg_music_path: str,
-                          output_path: str, bg_volume=0.15, fade_duration=2.0):
+                          output_path: str, bg_volume=0.15, fade_duration=2.0, duck=None):
         """
         Mix background music with narration
 
@@ -95,10 +95,14 @@ class BackgroundMusicIntegration:
             output_path: Output path for mixed audio
             bg_volume: Background music volume (0.0-1.0, default: 0.15)
             fade_duration: Duration of fade in/out in seconds (default: 2.0)
+            duck: Duck music under narration (bg_volume under speech, louder
+                  in gaps); default follows MUSIC_DUCKING
 
         Returns:
             output_path: Path to mixed audio
         """
+        from audio_mixer import DUCK_GAP_BOOST_DB, ducking_enabled, stream_mix, volume_to_db
+
         print(f"\n{'='*80}")
         print("MIXING AUDIO")
         print(f"{'='*80}")
@@ -107,6 +111,21 @@ class BackgroundMusicIntegration:
         print(f"  BG Volume: {bg_volume*100:.0f}%")
         print(f"  Fade duration: {fade_duration}s")
 
+        # Streaming mix: constant memory, seamless music loop, optional ducking
+        ducked = ducking_enabled() if duck is None else duck
+        if ducked:
+            print(f"  Ducking: +{DUCK_GAP_BOOST_DB:.0f} dB in narration gaps")
+        try:
+            stream_mix(bg_music_path, narration_path, output_path,
+                       music_gain_db=volume_to_db(bg_volume),
+                       gap_gain_db=volume_to_db(bg_volume) + DUCK_GAP_BOOST_DB if ducked else None,
+                       fade_in=fade_duration, fade_out=fade_duration, bitrate='192k')
+            print(f"  Mixed audio saved: {output_path}")
+            print(f"{'='*80}\n")
+            return output_path
+        except Exception as e:
+            print(f"  [WARNING] Streaming mix failed ({e}), using MoviePy")
+
         # Load audio
         narration = AudioFileClip(narration_path)
         bg_music = AudioFileClip(bg_music_path)
@@ -272,7 +291,8 @@ class BackgroundMusicIntegration:
         print(f"\n{'='*80}")
         print(f"LIBRARY ANALYSIS COMPLETE")
         print(f"{'='*80}")
-        print(f"Analyzed: {len(analysis_results)}/{len(audio_files)} files")
+        print(f"Analyzed: {len(analysis_results)}/{len(audio_files)} files "
+              f"({self.clip_finder.cache.hits} from cache)")
         print(f"Summary saved: {summary_file}\n")
 
         return analysis_results
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Beat-grid aligned cut scheduler
+
+Moves image transitions onto the music's beats without drifting away from
+the narration-driven timing: each cut whose nearest beat is within a
+tolerance of its target moves onto that beat, the rest stay where they
+were. Output is plain per-image durations, so the Shotstack and local
+assemblers use it unchanged.
+
+Beats come from Epidemic Sound's beats endpoint (cached on disk per track,
+they never change) or from the local onset/tempo analysis in
+optimal_clip_finder (cached by content hash) for any other audio file.
+Snapping is a sort plus one searchsorted over the beats: O(n log n).
+
+Environment:
+    BEAT_SYNC_MUSIC            Audio file whose beats the cuts follow
+    BEAT_SYNC_EPIDEMIC_TRACK   Epidemic Sound track id (instead of a file)
+    BEAT_SYNC_OFFSET           Seconds into the music at video start (default: 0)
+    BEAT_SNAP_TOLERANCE        Max cut shift in seconds (default: 0.5)
+    BEAT_CACHE_DIR             Epidemic beats cache (default: .cache/beats)
+"""
+
+import json
+import logging
+import os
+from pathlib import Path
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TOLERANCE = float(os.getenv("BEAT_SNAP_TOLERANCE", "0.5"))
+
+# Never let snapping shrink an image's solo time (on screen outside any
+# crossfade) below this many seconds
+MIN_IMAGE_DURATION = 1.0
+
+
+def epidemic_beats(track_id: str, client=None, cache_dir=None) -> np.ndarray:
+    """Beat times for an Epidemic Sound track (API result cached on disk)"""
+    cache_file = Path(cache_dir or os.getenv("BEAT_CACHE_DIR", ".cache/beats")) / f"{track_id}.json"
+    if cache_file.exists():
+        return np.asarray(json.loads(cache_file.read_text()), dtype=np.float64)
+
+    if client is None:
+        from epidemic_sound_client import create_client_from_env
+        client = create_client_from_env()
+
+    response = client.get_track_beats(track_id)
+    beats = sorted(
+        float(beat["timestamp"] if isinstance(beat, dict) else beat)
+        for beat in response.get("beats", [])
+    )
+
+    cache_file.parent.mkdir(parents=True, exist_ok=True)
+    cache_file.write_text(json.dumps(beats))
+    logger.info(f"Cached {len(beats)} beats for Epidemic track {track_id}")
+    return np.asarray(beats, dtype=np.float64)
+
+
+def detect_beats(audio_path) -> np.ndarray:
+    """Beat times from local onset/tempo analysis (cached by file content)"""
+    from optimal_clip_finder import OptimalClipFinder
+
+    analysis = OptimalClipFinder().analyze_audio(str(audio_path))
+    return np.asarray(analysis["beat_times"], dtype=np.float64)
+
+
+def beats_from_env() -> Optional[np.ndarray]:
+    """Beat grid in video time from BEAT_SYNC_* settings, or None when unset"""
+    track_id = os.getenv("BEAT_SYNC_EPIDEMIC_TRACK")
+    music = os.getenv("BEAT_SYNC_MUSIC")
+    if track_id:
+        beats = epidemic_beats(track_id)
+    elif music:
+        beats = detect_beats(music)
+    else:
+        return None
+
+    offset = float(os.getenv("BEAT_SYNC_OFFSET", "0"))
+    beats = beats - offset
+    return beats[beats >= 0]
+
+
+def snap_to_beats(targets: Sequence[float], beats: Sequence[float],
+                  tolerance: float = DEFAULT_TOLERANCE) -> np.ndarray:
+    """
+    Move each target time to its nearest beat when that beat is within tolerance
+
+    Targets need not be sorted. Beats are sorted once, then every target
+    finds its neighbours with a single binary search.
+    """
+    targets = np.asarray(targets, dtype=np.float64)
+    beats = np.sort(np.asarray(beats, dtype=np.float64))
+    if len(beats) == 0 or len(targets) == 0:
+        return targets.copy()
+
+    idx = np.searchsorted(beats, targets)
+    before = beats[np.maximum(idx - 1, 0)]
+    after = beats[np.minimum(idx, len(beats) - 1)]
+    nearest = np.where(targets - before <= after - targets, before, after)
+
+    return np.where(np.abs(nearest - targets) <= tolerance, nearest, targets)
+
+
+def beat_aligned_durations(durations: Sequence[float], beats: Sequence[float],
+                           transition: float = 0.0, tolerance: float = DEFAULT_TOLERANCE,
+                           min_duration: float = MIN_IMAGE_DURATION) -> List[float]:
+    """
+    Per-image durations whose transitions land on beats
+
+    Args:
+        durations: Target duration of each image (narration-driven)
+        beats: Beat times in video seconds
+        transition: Crossfade overlap between consecutive images; clip i+1
+                    starts at start_i + duration_i - transition
+        tolerance: Max shift of any cut from its target
+        min_duration: Shortest allowed solo time, start to start (a snap
+                      that would go below this keeps the target instead)
+
+    Returns:
+        durations: Same length; the final image keeps its target duration
+    """
+    durations = np.asarray(durations, dtype=np.float64)
+    if len(durations) < 2:
+        return durations.tolist()
+
+    # Clip start times; the cut is felt mid-crossfade, so that is what snaps
+    starts = np.concatenate(([0.0], np.cumsum(durations[:-1] - transition)))
+    cuts = starts[1:] + transition / 2
+    snapped = snap_to_beats(cuts, beats, tolerance) - transition / 2
+
+    new_starts = np.concatenate(([0.0], snapped))
+    for i in range(1, len(new_starts)):
+        if new_starts[i] - new_starts[i - 1] < min_duration:
+            new_starts[i] = starts[i]
+        # A reverted start can still be too close to an earlier start that
+        # snapped later; revert those back to their targets too
+        j = i
+        while j > 0 and new_starts[j] - new_starts[j - 1] < min_duration \
+                and new_starts[j - 1] > starts[j - 1]:
+            new_starts[j - 1] = starts[j - 1]
+            j -= 1
+
+    aligned = np.append(np.diff(new_starts) + transition, durations[-1])
+    moved = int(np.count_nonzero(np.abs(new_starts - starts) > 1e-9))
+    logger.info(f"Beat sync: {moved}/{len(cuts)} cuts moved onto beats "
+                f"(tolerance {tolerance:.2f}s, {len(beats)} beats)")
+    return aligned.tolist()
@@ -1,41 +1,82 @@
+#!/usr/bin/env python3
+"""
+Fast low-resolution preview of the generated images
+
+Streams one image at a time at proxy resolution into local_renderer's
+SegmentRenderer, so each hold is a single encoded VFR frame and memory
+stays constant no matter how many images there are. Narration is muxed
+when available; otherwise the preview is silent (no placeholder WAV).
+"""
+
+import argparse
 import os
 from pathlib import Path
-import wave
+
 import numpy as np
 from PIL import Image
-from moviepy.video.io.ImageSequenceClip import ImageSequenceClip
-from moviepy.audio.io.AudioFileClip import AudioFileClip
+
+from frame_cache import default_cache
+from local_renderer import SegmentRenderer
 
 output_dir = Path('output')
 video_dir = Path('output/generated_images')
-images = sorted(video_dir.glob('*.png'))
-print('found images', len(images))
-if not images:
-    raise SystemExit('no images found')
-
-duration_sec = 21*60
-frame_rate = 16000
-n_frames = duration_sec * frame_rate
-audio_path = output_dir / 'narration_placeholder.wav'
-if not audio_path.exists():
-    with wave.open(str(audio_path), 'w') as wf:
-        wf.setnchannels(1)
-        wf.setsampwidth(2)
-        wf.setframerate(frame_rate)
-        wf.writeframes(b'\x00\x00' * n_frames)
-    print('created audio')
-else:
-    print('audio exists')
-
-frames = []
-target_size = (1920, 1080)
-for p in images:
-    img = Image.open(p).convert('RGB').resize(target_size)
-    frames.append(np.array(img))
-
-per_image = duration_sec / len(frames)
-clip = ImageSequenceClip(frames, durations=[per_image]*len(frames))
-clip = clip.with_audio(AudioFileClip(str(audio_path)))
-final_path = output_dir / 'preview_21min.mp4'
-clip.write_videofile(str(final_path), fps=24, codec='libx264', audio_codec='aac', bitrate='2000k')
-print('done', final_path)
+
+# Proxy geometry and encoder settings (override with PREVIEW_* env vars)
+PREVIEW_WIDTH = int(os.getenv("PREVIEW_WIDTH", "640"))
+PREVIEW_HEIGHT = int(os.getenv("PREVIEW_HEIGHT", "360"))
+PREVIEW_FPS = int(os.getenv("PREVIEW_FPS", "24"))
+PREVIEW_PRESET = os.getenv("PREVIEW_PRESET", "veryfast")
+
+
+def load_proxy_frame(path, width=PREVIEW_WIDTH, height=PREVIEW_HEIGHT):
+    """Decode one image straight to an RGB proxy frame"""
+    with Image.open(path) as img:
+        # draft() lets JPEG decode at reduced scale; a no-op for PNG
+        img.draft('RGB', (width, height))
+        return np.asarray(img.convert('RGB').resize((width, height), Image.Resampling.BILINEAR))
+
+
+def build_preview(images, output_path, duration_sec, audio_path=None,
+                  width=PREVIEW_WIDTH, height=PREVIEW_HEIGHT, fps=PREVIEW_FPS,
+                  preset=PREVIEW_PRESET):
+    """Render a slideshow preview spreading duration_sec evenly over images"""
+    total_frames = int(round(duration_sec * fps))
+    cache = default_cache()
+    Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+
+    renderer = SegmentRenderer(output_path, width, height, fps, audio_path=audio_path,
+                               preset=preset, crf=28, audio_bitrate='96k')
+    try:
+        for i, p in enumerate(images):
+            # Integer frame boundaries so the holds add up to exactly total_frames
+            frames = total_frames * (i + 1) // len(images) - total_frames * i // len(images)
+            frame = cache.get(p, width, height, 'proxy_bilinear', 'rgb24',
+                              lambda src: load_proxy_frame(src, width, height))
+            renderer.add_still(np.ascontiguousarray(frame[:, :, ::-1]), frames)
+        return renderer.finish()
+    except Exception:
+        renderer.abort()
+        raise
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build a fast proxy-resolution preview")
+    parser.add_argument('--images', default=str(video_dir))
+    parser.add_argument('--output', default=str(output_dir / 'preview_21min.mp4'))
+    parser.add_argument('--duration', type=float, default=21 * 60,
+                        help='Preview length in seconds (default: 1260)')
+    parser.add_argument('--narration', default=str(output_dir / 'narration.mp3'),
+                        help='Narration to mux if it exists')
+    args = parser.parse_args()
+
+    images = sorted(Path(args.images).glob('*.png'))
+    print('found images', len(images))
+    if not images:
+        raise SystemExit('no images found')
+
+    audio_path = Path(args.narration) if Path(args.narration).exists() else None
+    print('narration', audio_path or 'none (silent preview)')
+
+    stats = build_preview(images, args.output, args.duration, audio_path=audio_path)
+    print(f"done {stats['output']}: {stats['frames']} frames in "
+          f"{stats['elapsed_seconds']:.1f}s ({stats['fps']:.0f} fps)")
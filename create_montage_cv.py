@@ -7,12 +7,15 @@ Creates a slideshow with crossfade transitions and narration overlay
 import os
 import glob
 import cv2
-import numpy as np
 from pathlib import Path
-from pydub import AudioSegment
-from pydub.utils import mediainfo
 import subprocess
 
+from frame_cache import default_cache
+from local_renderer import (FFmpegPipeWriter, SegmentRenderer, default_workers,
+                            encoder_threads, render_parallel)
+from media_probe import probe_duration
+from transition_engine import TransitionEngine, TRANSITION_TYPES
+
 # Configuration
 OUTPUT_DIR = Path("D:/workspace/True_Nas/firecrawl-mdjsonl/output")
 IMAGES_DIR = OUTPUT_DIR / "generated_images"
@@ -27,12 +30,28 @@ FPS = 30
 CROSSFADE_DURATION = 1.0  # 1 second crossfade between images
 CROSSFADE_FRAMES = int(FPS * CROSSFADE_DURATION)
 
+# Renderer: "pipe" streams frames into one libx264+AAC ffmpeg process,
+# "segments" encodes each still hold as one VFR frame, only transitions per frame,
+# "parallel" encodes image-boundary chunks across CPU cores and concats them,
+# "opencv" is the legacy mp4v temp file + second ffmpeg pass
+RENDERER = os.getenv("MONTAGE_RENDERER", "pipe")
+
+# Worker processes for the parallel renderer (0 = RENDER_WORKERS env or CPU count)
+WORKERS = int(os.getenv("MONTAGE_WORKERS", "0"))
+
+# Transition between images (see transition_engine.TRANSITION_TYPES)
+TRANSITION = os.getenv("MONTAGE_TRANSITION", "fade")
+
 def get_audio_duration(audio_file):
-    """Get audio duration using pydub"""
-    audio = AudioSegment.from_file(str(audio_file))
-    return len(audio) / 1000.0  # Convert ms to seconds
+    """Get audio duration from the file header (cached, no decode)"""
+    return probe_duration(audio_file)
 
 def load_and_resize_image(img_path):
+    """Load the normalized BGR frame for an image (via the frame cache)"""
+    return default_cache().get(img_path, VIDEO_WIDTH, VIDEO_HEIGHT, "height_crop_pad", "bgr24",
+                               normalize_image)
+
+def normalize_image(img_path):
     """Load image and resize to fit 1920x1080 maintaining aspect ratio"""
     img = cv2.imread(img_path)
     if img is None:
@@ -60,80 +79,165 @@ def load_and_resize_image(img_path):
 
     return img_resized
 
-def blend_images(img1, img2, alpha):
-    """Blend two images with given alpha (0-1)"""
-    return cv2.addWeighted(img1, 1 - alpha, img2, alpha, 0)
+def generate_montage_timeline(image_files, frames_per_image, transition=TRANSITION,
+                              start=0, end=None):
+    """
+    Yield (frame, repeat) pairs for the montage: fade-in, holds, transitions, fade-out
 
-def create_montage():
-    print("Starting montage creation with OpenCV...")
+    Transition frames come with repeat=1; each still hold is yielded once with
+    repeat=frames_per_image so renderers can encode it without N copies.
 
-    # Get all images sorted by filename
-    image_files = sorted(glob.glob(str(IMAGES_DIR / "*.png")))
-    print(f"Found {len(image_files)} images")
-
-    # Get audio duration
-    audio_duration = get_audio_duration(NARRATION_FILE)
-    print(f"Audio duration: {audio_duration:.2f} seconds ({audio_duration/60:.2f} minutes)")
-
-    # Calculate time per image (accounting for crossfades)
+    start/end select a chunk of images [start, end). A chunk owns the
+    transition into its first image (it loads the previous image itself), the
+    fade-in if it starts at 0 and the fade-out if it reaches the last image,
+    so consecutive chunks concatenate into exactly the full timeline.
+    """
     num_images = len(image_files)
-    total_crossfade_time = (num_images - 1) * CROSSFADE_DURATION
-    available_time = audio_duration - total_crossfade_time
-    time_per_image = available_time / num_images
-    frames_per_image = int(time_per_image * FPS)
-
-    print(f"Time per image: {time_per_image:.2f} seconds")
-    print(f"Frames per image: {frames_per_image}")
-    print(f"Crossfade frames: {CROSSFADE_FRAMES}")
-
-    # Initialize video writer
-    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-    out = cv2.VideoWriter(str(OUTPUT_VIDEO_NO_AUDIO), fourcc, FPS,
-                          (VIDEO_WIDTH, VIDEO_HEIGHT))
-
-    if not out.isOpened():
-        raise RuntimeError("Failed to open video writer")
-
-    # Add 2-second fade in from black
-    print("Adding fade-in from black...")
+    end = num_images if end is None else end
+    engine = TransitionEngine(VIDEO_WIDTH, VIDEO_HEIGHT)
     fade_frames = int(2.0 * FPS)
-    first_img = load_and_resize_image(image_files[0])
-    black_frame = np.zeros((VIDEO_HEIGHT, VIDEO_WIDTH, 3), dtype=np.uint8)
 
-    for i in range(fade_frames):
-        alpha = i / fade_frames
-        frame = blend_images(black_frame, first_img, alpha)
-        out.write(frame)
+    # Add 2-second fade in from black
+    first_img = load_and_resize_image(image_files[start])
+    if start == 0:
+        print("Adding fade-in from black...")
+        for frame in engine.fade_in(first_img, fade_frames):
+            yield frame, 1
 
     # Process each image
-    prev_img = None
-    total_frames = 0
+    prev_img = load_and_resize_image(image_files[start - 1]) if start > 0 else None
 
-    for idx, img_path in enumerate(image_files):
+    for idx in range(start, end):
+        img_path = image_files[idx]
         print(f"Processing image {idx+1}/{num_images}: {Path(img_path).name}")
 
-        curr_img = load_and_resize_image(img_path)
+        curr_img = first_img if idx == start else load_and_resize_image(img_path)
 
-        # Crossfade from previous image (except for first)
+        # Transition from previous image (except for first)
         if idx > 0 and prev_img is not None:
-            for i in range(CROSSFADE_FRAMES):
-                alpha = i / CROSSFADE_FRAMES
-                frame = blend_images(prev_img, curr_img, alpha)
-                out.write(frame)
-                total_frames += 1
+            for frame in engine.render(prev_img, curr_img, CROSSFADE_FRAMES, transition):
+                yield frame, 1
 
-        # Write full image frames
-        for _ in range(frames_per_image):
-            out.write(curr_img)
-            total_frames += 1
+        # Hold the full image
+        yield curr_img, frames_per_image
 
         prev_img = curr_img
 
     # Add 2-second fade out to black
-    print("Adding fade-out to black...")
-    for i in range(fade_frames):
-        alpha = i / fade_frames
-        frame = blend_images(prev_img, black_frame, alpha)
+    if end == num_images:
+        print("Adding fade-out to black...")
+        for frame in engine.fade_out(prev_img, fade_frames):
+            yield frame, 1
+
+def generate_montage_frames(image_files, frames_per_image, transition=TRANSITION,
+                            start=0, end=None):
+    """Yield every individual frame of the montage (holds expanded)"""
+    for frame, repeat in generate_montage_timeline(image_files, frames_per_image, transition,
+                                                   start, end):
+        for _ in range(repeat):
+            yield frame
+
+def render_montage_chunk(segment_path, chunk):
+    """Process-pool worker: encode images [start, end) of the montage to one segment"""
+    writer = FFmpegPipeWriter(segment_path, VIDEO_WIDTH, VIDEO_HEIGHT, FPS,
+                              preset='medium', crf=23, threads=chunk["threads"])
+    writer.open()
+    try:
+        for frame in generate_montage_frames(chunk["image_files"], chunk["frames_per_image"],
+                                             chunk["transition"], chunk["start"], chunk["end"]):
+            writer.write(frame)
+    except Exception:
+        writer.abort()
+        raise
+
+    return writer.release()["frames"]
+
+def render_with_pipe(image_files, frames_per_image, transition=TRANSITION):
+    """Single encode: stream raw BGR frames + narration into one ffmpeg process"""
+    print(f"Renderer: ffmpeg pipe (libx264 + AAC, single pass)")
+
+    writer = FFmpegPipeWriter(OUTPUT_FILE, VIDEO_WIDTH, VIDEO_HEIGHT, FPS,
+                              audio_path=NARRATION_FILE, preset='medium', crf=23,
+                              audio_bitrate='192k')
+    writer.open()
+    try:
+        for frame in generate_montage_frames(image_files, frames_per_image, transition):
+            if not writer.write(frame):
+                break
+    except Exception:
+        writer.abort()
+        raise
+
+    stats = writer.release()
+    print(f"Video created: {stats['frames']} frames")
+    print(f"Video duration: {stats['frames']/FPS:.2f} seconds")
+    print(f"Render speed: {stats['fps']:.1f} fps ({stats['elapsed_seconds']:.1f}s)")
+    return stats
+
+def render_with_segments(image_files, frames_per_image, transition=TRANSITION):
+    """Still holds encoded as two VFR frames each, transitions streamed, concat -c copy"""
+    print(f"Renderer: still segments (two frames per hold, concat copy)")
+
+    renderer = SegmentRenderer(OUTPUT_FILE, VIDEO_WIDTH, VIDEO_HEIGHT, FPS,
+                               audio_path=NARRATION_FILE, preset='medium', crf=23,
+                               audio_bitrate='192k')
+    try:
+        for frame, repeat in generate_montage_timeline(image_files, frames_per_image, transition):
+            if repeat > 1:
+                renderer.add_still(frame, repeat)
+            else:
+                renderer.add_frame(frame)
+    except Exception:
+        renderer.abort()
+        raise
+
+    stats = renderer.finish()
+    print(f"Video created: {stats['frames']} frames in {stats['segments']} segments")
+    print(f"Frames sent to encoder: {stats['frames_piped']}")
+    print(f"Video duration: {stats['frames']/FPS:.2f} seconds")
+    print(f"Render speed: {stats['fps']:.1f} fps ({stats['elapsed_seconds']:.1f}s)")
+    return stats
+
+def render_with_parallel(image_files, frames_per_image, transition=TRANSITION, workers=WORKERS):
+    """Split at image boundaries, encode chunks in a process pool, concat -c copy + narration"""
+    workers = workers or default_workers()
+    num_images = len(image_files)
+
+    # A few chunks per worker keeps the pool busy when chunks finish unevenly
+    num_chunks = min(num_images, workers * 2)
+    bounds = [num_images * i // num_chunks for i in range(num_chunks + 1)]
+    chunks = [{
+        "image_files": list(image_files),
+        "frames_per_image": frames_per_image,
+        "transition": transition,
+        "start": bounds[i],
+        "end": bounds[i + 1],
+        "threads": encoder_threads(workers),
+    } for i in range(num_chunks)]
+
+    print(f"Renderer: segment-parallel ({num_chunks} chunks, {workers} workers, concat copy)")
+
+    stats = render_parallel(render_montage_chunk, chunks, OUTPUT_FILE,
+                            audio_path=NARRATION_FILE, workers=workers, audio_bitrate='192k')
+    print(f"Video created: {stats['frames']} frames in {stats['segments']} segments")
+    print(f"Video duration: {stats['frames']/FPS:.2f} seconds")
+    print(f"Render speed: {stats['fps']:.1f} fps ({stats['elapsed_seconds']:.1f}s)")
+    return stats
+
+def render_with_opencv(image_files, frames_per_image, transition=TRANSITION):
+    """Legacy two-pass path: mp4v temp file, then ffmpeg re-encode with narration"""
+    print(f"Renderer: OpenCV mp4v + ffmpeg merge")
+
+    # Initialize video writer
+    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+    out = cv2.VideoWriter(str(OUTPUT_VIDEO_NO_AUDIO), fourcc, FPS,
+                          (VIDEO_WIDTH, VIDEO_HEIGHT))
+
+    if not out.isOpened():
+        raise RuntimeError("Failed to open video writer")
+
+    total_frames = 0
+    for frame in generate_montage_frames(image_files, frames_per_image, transition):
         out.write(frame)
         total_frames += 1
 
@@ -171,7 +275,7 @@ def create_montage():
         import shutil
         shutil.copy(OUTPUT_VIDEO_NO_AUDIO, OUTPUT_FILE)
         print("WARNING: Video created without audio sync. Please merge manually.")
-        return OUTPUT_FILE, OUTPUT_VIDEO_NO_AUDIO.stat().st_size / (1024 * 1024)
+        return False
     except subprocess.CalledProcessError as e:
         print(f"ERROR merging audio: {e}")
         print(f"STDERR: {e.stderr}")
@@ -181,6 +285,46 @@ def create_montage():
     if OUTPUT_VIDEO_NO_AUDIO.exists():
         OUTPUT_VIDEO_NO_AUDIO.unlink()
 
+    return True
+
+def create_montage(renderer=RENDERER, transition=TRANSITION, workers=WORKERS):
+    print("Starting montage creation with OpenCV...")
+
+    # Get all images sorted by filename
+    image_files = sorted(glob.glob(str(IMAGES_DIR / "*.png")))
+    print(f"Found {len(image_files)} images")
+
+    # Get audio duration
+    audio_duration = get_audio_duration(NARRATION_FILE)
+    print(f"Audio duration: {audio_duration:.2f} seconds ({audio_duration/60:.2f} minutes)")
+
+    # Calculate time per image (accounting for crossfades)
+    num_images = len(image_files)
+    total_crossfade_time = (num_images - 1) * CROSSFADE_DURATION
+    available_time = audio_duration - total_crossfade_time
+    time_per_image = available_time / num_images
+    frames_per_image = int(time_per_image * FPS)
+
+    print(f"Time per image: {time_per_image:.2f} seconds")
+    print(f"Frames per image: {frames_per_image}")
+    print(f"Crossfade frames: {CROSSFADE_FRAMES} ({transition})")
+
+    if renderer in ("pipe", "segments", "parallel"):
+        try:
+            if renderer == "parallel":
+                render_with_parallel(image_files, frames_per_image, transition, workers)
+            elif renderer == "segments":
+                render_with_segments(image_files, frames_per_image, transition)
+            else:
+                render_with_pipe(image_files, frames_per_image, transition)
+        except FileNotFoundError:
+            print(f"WARNING: ffmpeg not found for {renderer} renderer, falling back to OpenCV")
+            renderer = "opencv"
+
+    if renderer == "opencv":
+        if not render_with_opencv(image_files, frames_per_image, transition):
+            return OUTPUT_FILE, OUTPUT_VIDEO_NO_AUDIO.stat().st_size / (1024 * 1024)
+
     # Get file size
     file_size = OUTPUT_FILE.stat().st_size
     file_size_mb = file_size / (1024 * 1024)
@@ -194,8 +338,19 @@ def create_montage():
     return OUTPUT_FILE, file_size_mb
 
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Create image montage with narration")
+    parser.add_argument('--renderer', choices=['pipe', 'segments', 'parallel', 'opencv'],
+                        default=RENDERER, help=f'Render backend (default: {RENDERER})')
+    parser.add_argument('--transition', choices=TRANSITION_TYPES, default=TRANSITION,
+                        help=f'Transition between images (default: {TRANSITION})')
+    parser.add_argument('--workers', type=int, default=WORKERS,
+                        help='Worker processes for the parallel renderer (default: CPU count)')
+    args = parser.parse_args()
+
     try:
-        create_montage()
+        create_montage(renderer=args.renderer, transition=args.transition, workers=args.workers)
     except Exception as e:
         print(f"ERROR: {e}")
         import traceback
@@ -11,6 +11,9 @@ import numpy as np
 from pathlib import Path
 from PIL import Image
 
+from local_renderer import SegmentRenderer
+from transition_engine import TransitionEngine, TRANSITION_TYPES
+
 # Configuration
 OUTPUT_DIR = Path("D:/workspace/True_Nas/firecrawl-mdjsonl/output")
 IMAGES_DIR = OUTPUT_DIR / "generated_images"
@@ -32,6 +35,15 @@ ESTIMATED_AUDIO_DURATION = (AUDIO_FILE_SIZE_MB * 8192) / ESTIMATED_BITRATE_KBPS
 CROSSFADE_DURATION = 1.0  # 1 second crossfade
 CROSSFADE_FRAMES = int(FPS * CROSSFADE_DURATION)
 
+# Transition between images (see transition_engine.TRANSITION_TYPES)
+TRANSITION = os.getenv("MONTAGE_TRANSITION", "fade")
+
+# Renderer: "opencv" writes every frame with cv2.VideoWriter,
+# "segments" encodes each still hold as two frames (needs ffmpeg).
+# Not MONTAGE_RENDERER: create_montage_cv.py reads that with other choices
+RENDERERS = ("opencv", "segments")
+RENDERER = os.getenv("MONTAGE_SIMPLE_RENDERER", "opencv")
+
 def load_and_resize_image(img_path):
     """Load image using PIL and convert to OpenCV format, resize to fit 1920x1080"""
     # Load with PIL for better format support
@@ -61,11 +73,27 @@ def load_and_resize_image(img_path):
 
     return img_cv
 
-def blend_images(img1, img2, alpha):
-    """Blend two images with given alpha (0-1)"""
-    return cv2.addWeighted(img1, 1 - alpha, img2, alpha, 0)
+def open_video_writer():
+    """Open a cv2.VideoWriter, preferring H.264"""
+    # Initialize video writer with H.264 codec
+    fourcc = cv2.VideoWriter_fourcc(*'avc1')  # H.264
+    out = cv2.VideoWriter(str(OUTPUT_VIDEO_NO_AUDIO), fourcc, FPS,
+                          (VIDEO_WIDTH, VIDEO_HEIGHT))
+
+    if not out.isOpened():
+        print("Failed to open with avc1, trying mp4v...")
+        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+        out = cv2.VideoWriter(str(OUTPUT_VIDEO_NO_AUDIO), fourcc, FPS,
+                              (VIDEO_WIDTH, VIDEO_HEIGHT))
+
+    if not out.isOpened():
+        raise RuntimeError("Failed to open video writer")
+
+    return out
 
-def create_montage():
+def create_montage(transition=TRANSITION, renderer=RENDERER):
+    if renderer not in RENDERERS:
+        raise ValueError(f"Unknown renderer {renderer!r} (choose from {', '.join(RENDERERS)})")
     print("Starting montage creation...")
 
     # Get all images sorted by filename
@@ -85,66 +113,67 @@ def create_montage():
 
     print(f"Time per image: {time_per_image:.2f} seconds")
     print(f"Frames per image: {frames_per_image}")
-    print(f"Crossfade frames: {CROSSFADE_FRAMES}")
+    print(f"Crossfade frames: {CROSSFADE_FRAMES} ({transition})")
 
-    # Initialize video writer with H.264 codec
-    fourcc = cv2.VideoWriter_fourcc(*'avc1')  # H.264
-    out = cv2.VideoWriter(str(OUTPUT_VIDEO_NO_AUDIO), fourcc, FPS,
-                          (VIDEO_WIDTH, VIDEO_HEIGHT))
+    segments = None
+    if renderer == "segments":
+        print("Renderer: still segments (two frames per hold, concat copy)")
+        segments = SegmentRenderer(OUTPUT_VIDEO_NO_AUDIO, VIDEO_WIDTH, VIDEO_HEIGHT, FPS)
+        out = segments
+    else:
+        out = open_video_writer()
 
-    if not out.isOpened():
-        print("Failed to open with avc1, trying mp4v...")
-        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-        out = cv2.VideoWriter(str(OUTPUT_VIDEO_NO_AUDIO), fourcc, FPS,
-                              (VIDEO_WIDTH, VIDEO_HEIGHT))
+    engine = TransitionEngine(VIDEO_WIDTH, VIDEO_HEIGHT)
 
-    if not out.isOpened():
-        raise RuntimeError("Failed to open video writer")
-
-    # Add 2-second fade in from black
-    print("Adding fade-in from black...")
-    fade_frames = int(2.0 * FPS)
-    first_img = load_and_resize_image(image_files[0])
-    black_frame = np.zeros((VIDEO_HEIGHT, VIDEO_WIDTH, 3), dtype=np.uint8)
-
-    for i in range(fade_frames):
-        alpha = i / fade_frames
-        frame = blend_images(black_frame, first_img, alpha)
-        out.write(frame)
-
-    # Process each image
-    prev_img = None
-    total_frames = fade_frames
-
-    for idx, img_path in enumerate(image_files):
-        print(f"Processing image {idx+1}/{num_images}: {Path(img_path).name}")
-
-        curr_img = load_and_resize_image(img_path)
-
-        # Crossfade from previous image (except for first)
-        if idx > 0 and prev_img is not None:
-            for i in range(CROSSFADE_FRAMES):
-                alpha = i / CROSSFADE_FRAMES
-                frame = blend_images(prev_img, curr_img, alpha)
-                out.write(frame)
-                total_frames += 1
-
-        # Write full image frames
-        for _ in range(frames_per_image):
-            out.write(curr_img)
+    try:
+        # Add 2-second fade in from black
+        print("Adding fade-in from black...")
+        fade_frames = int(2.0 * FPS)
+        first_img = load_and_resize_image(image_files[0])
+
+        for frame in engine.fade_in(first_img, fade_frames):
+            out.write(frame)
+
+        # Process each image
+        prev_img = None
+        total_frames = fade_frames
+
+        for idx, img_path in enumerate(image_files):
+            print(f"Processing image {idx+1}/{num_images}: {Path(img_path).name}")
+
+            curr_img = first_img if idx == 0 else load_and_resize_image(img_path)
+
+            # Transition from previous image (except for first)
+            if idx > 0 and prev_img is not None:
+                for frame in engine.render(prev_img, curr_img, CROSSFADE_FRAMES, transition):
+                    out.write(frame)
+                    total_frames += 1
+
+            # Write full image frames (two encoded frames in segments mode)
+            if segments is not None:
+                segments.add_still(curr_img, frames_per_image)
+            else:
+                for _ in range(frames_per_image):
+                    out.write(curr_img)
+            total_frames += frames_per_image
+
+            prev_img = curr_img
+
+        # Add 2-second fade out to black
+        print("Adding fade-out to black...")
+        for frame in engine.fade_out(prev_img, fade_frames):
+            out.write(frame)
             total_frames += 1
+    except Exception:
+        if segments is not None:
+            segments.abort()
+        raise
 
-        prev_img = curr_img
-
-    # Add 2-second fade out to black
-    print("Adding fade-out to black...")
-    for i in range(fade_frames):
-        alpha = i / fade_frames
-        frame = blend_images(prev_img, black_frame, alpha)
-        out.write(frame)
-        total_frames += 1
-
-    out.release()
+    if segments is not None:
+        stats = segments.finish()
+        print(f"Frames sent to encoder: {stats['frames_piped']} ({stats['segments']} segments)")
+    else:
+        out.release()
 
     print(f"\nVideo created (no audio): {total_frames} frames")
     print(f"Video duration: {total_frames/FPS:.2f} seconds")
@@ -170,8 +199,17 @@ def create_montage():
     return OUTPUT_VIDEO_NO_AUDIO, file_size_mb
 
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Create image montage (no audio)")
+    parser.add_argument('--transition', choices=TRANSITION_TYPES, default=TRANSITION,
+                        help=f'Transition between images (default: {TRANSITION})')
+    parser.add_argument('--renderer', choices=RENDERERS, default=RENDERER,
+                        help=f'Render backend (default: {RENDERER})')
+    args = parser.parse_args()
+
     try:
-        output_file, size_mb = create_montage()
+        output_file, size_mb = create_montage(transition=args.transition, renderer=args.renderer)
         print(f"\nFinal output: {output_file}")
         print(f"Size: {size_mb:.2f} MB")
     except Exception as e:
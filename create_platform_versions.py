@@ -4,11 +4,93 @@ Create platform-specific video versions
 Optimizes for YouTube, TikTok, Instagram, and Twitter
 """
 import os
+import shutil
 import subprocess
 import json
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
-def create_platform_versions():
+# "split": decode once, fan out to every rendition in one ffmpeg process
+# "parallel": one ffmpeg per rendition, all running at once
+# "sequential": one ffmpeg per rendition, one after another (legacy)
+ENCODE_MODE = os.getenv("PLATFORM_ENCODE_MODE", "split")
+
+
+def fit_filter(width, height):
+    """Scale to fit and letterbox/pillarbox to width x height"""
+    return (f"scale={width}:{height}:force_original_aspect_ratio=decrease,"
+            f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2")
+
+
+def encode_args(output_path):
+    return ['-c:v', 'libx264', '-preset', 'fast', '-c:a', 'aac', '-y', output_path]
+
+
+def encode_split(ffmpeg_exe, input_video, renditions):
+    """
+    One decode, split filter to every rendition's scale/pad, one process
+
+    The outputs share one encode, so there is no per-rendition time: each
+    written output maps to None and only the caller's total is meaningful.
+    Returns {output_path: None} for the outputs that were written, including
+    the finished ones when ffmpeg fails on another.
+    """
+    from media_probe import parse_header
+
+    labels = [f"[v{i}]" for i in range(len(renditions))]
+    graph = f"[0:v]split={len(renditions)}{''.join(labels)}"
+    for i, r in enumerate(renditions):
+        graph += f";{labels[i]}{fit_filter(r['width'], r['height'])}[out{i}]"
+
+    cmd = [ffmpeg_exe, '-i', input_video, '-filter_complex', graph]
+    for i, r in enumerate(renditions):
+        cmd += ['-map', f'[out{i}]', '-map', '0:a?'] + encode_args(r['output_path'])
+        # A file left from an earlier run must not pass for this run's output
+        if os.path.exists(r['output_path']):
+            os.remove(r['output_path'])
+
+    result = subprocess.run(cmd, capture_output=True, text=True, timeout=600 * len(renditions))
+
+    if result.returncode != 0:
+        print(f"      [FAIL] FFmpeg error: {result.stderr[-300:]}")
+        # Only outputs that were finalized (moov written) are usable
+        return {r['output_path']: None for r in renditions
+                if os.path.exists(r['output_path']) and parse_header(r['output_path'])}
+    return {r['output_path']: None for r in renditions if os.path.exists(r['output_path'])}
+
+
+def encode_single(ffmpeg_exe, input_video, rendition):
+    """Encode one rendition in its own ffmpeg process; returns encode seconds or None"""
+    cmd = [ffmpeg_exe, '-i', input_video,
+           '-vf', fit_filter(rendition['width'], rendition['height'])] + encode_args(rendition['output_path'])
+
+    start = time.perf_counter()
+    result = subprocess.run(cmd, capture_output=True, text=True, timeout=600)
+    elapsed = time.perf_counter() - start
+
+    if result.returncode == 0 and os.path.exists(rendition['output_path']):
+        return elapsed
+    return None
+
+
+def encode_renditions(ffmpeg_exe, input_video, renditions, mode=ENCODE_MODE):
+    """
+    Encode renditions with the chosen mode
+
+    Returns {output_path: encode_seconds} for the outputs that were written;
+    seconds are None in split mode, where all outputs share one encode.
+    """
+    if mode == "split":
+        return encode_split(ffmpeg_exe, input_video, renditions)
+
+    workers = len(renditions) if mode == "parallel" else 1
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        times = list(pool.map(lambda r: encode_single(ffmpeg_exe, input_video, r), renditions))
+    return {r['output_path']: t for r, t in zip(renditions, times) if t is not None}
+
+
+def create_platform_versions(mode=ENCODE_MODE):
     """Create optimized versions for different platforms"""
 
     print("\n" + "="*80)
@@ -72,46 +154,56 @@ def create_platform_versions():
         }
     ]
 
-    print(f"\n[PLATFORMS] Creating {len(platforms)} versions...\n")
-
-    created_files = []
+    print(f"\n[PLATFORMS] Creating {len(platforms)} versions (mode: {mode})...\n")
 
     for i, platform in enumerate(platforms, 1):
         print(f"[{i}/{len(platforms)}] {platform['name']}")
         print(f"      Resolution: {platform['width']}x{platform['height']} ({platform['ratio']})")
         print(f"      {platform['description']}")
+        platform["output_path"] = f"{platforms_dir}/{platform['filename']}"
+
+    # Platforms with identical geometry share one encode (TikTok / Instagram)
+    renditions = {}
+    for platform in platforms:
+        renditions.setdefault((platform['width'], platform['height']), platform)
 
-        output_path = f"{platforms_dir}/{platform['filename']}"
-
-        try:
-            # Use ffmpeg to resize
-            cmd = [
-                ffmpeg_exe,
-                '-i', input_video,
-                '-vf', f"scale={platform['width']}:{platform['height']}:force_original_aspect_ratio=decrease,pad={platform['width']}:{platform['height']}:(ow-iw)/2:(oh-ih)/2",
-                '-c:v', 'libx264',
-                '-preset', 'fast',
-                '-c:a', 'aac',
-                '-y', output_path
-            ]
-
-            print(f"      Encoding...")
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=600)
-
-            if result.returncode == 0 and os.path.exists(output_path):
-                file_size = os.path.getsize(output_path) / (1024 * 1024)
-                print(f"      [OK] Success: {file_size:.1f} MB\n")
-                created_files.append({
-                    "platform": platform["name"],
-                    "file": output_path,
-                    "size_mb": file_size,
-                    "resolution": f"{platform['width']}x{platform['height']}"
-                })
-            else:
-                print(f"      [FAIL] Failed (FFmpeg error)\n")
-
-        except Exception as e:
-            print(f"      [ERROR] {str(e)[:60]}\n")
+    print(f"\n      Encoding {len(renditions)} unique renditions...")
+    start_time = time.perf_counter()
+    try:
+        encode_times = encode_renditions(ffmpeg_exe, input_video, list(renditions.values()), mode)
+    except Exception as e:
+        print(f"      [ERROR] {str(e)[:60]}\n")
+        encode_times = {}
+    total_seconds = time.perf_counter() - start_time
+
+    created_files = []
+
+    for platform in platforms:
+        output_path = platform["output_path"]
+        source = renditions[(platform['width'], platform['height'])]
+        if source["output_path"] not in encode_times:
+            print(f"      [FAIL] {platform['name']}: failed (FFmpeg error)")
+            continue
+        encode_seconds = encode_times[source["output_path"]]
+
+        entry = {
+            "platform": platform["name"],
+            "file": output_path,
+            "resolution": f"{platform['width']}x{platform['height']}",
+            # None: encoded together with the others (split), see total_encode_seconds
+            "encode_seconds": None if encode_seconds is None else round(encode_seconds, 2)
+        }
+        if source is not platform:
+            shutil.copyfile(source["output_path"], output_path)
+            entry["encode_seconds"] = 0.0
+            entry["copied_from"] = source["output_path"]
+
+        entry["size_mb"] = os.path.getsize(output_path) / (1024 * 1024)
+        timing = "shared encode" if entry["encode_seconds"] is None else f"{entry['encode_seconds']:.1f}s"
+        print(f"      [OK] {platform['name']}: {entry['size_mb']:.1f} MB ({timing})")
+        created_files.append(entry)
+
+    print()
 
     # Summary
     if created_files:
@@ -127,6 +219,8 @@ def create_platform_versions():
         metadata = {
             "base_video": input_video,
             "platforms_created": len(created_files),
+            "encode_mode": mode,
+            "total_encode_seconds": round(total_seconds, 2),
             "files": created_files,
             "upload_instructions": {
                 "YouTube": "Upload as-is, standard YouTube format",
@@ -151,7 +245,14 @@ def create_platform_versions():
 
 
 def main():
-    success = create_platform_versions()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Create platform-specific video versions")
+    parser.add_argument('--mode', choices=['split', 'parallel', 'sequential'], default=ENCODE_MODE,
+                        help=f'Rendition encode strategy (default: {ENCODE_MODE})')
+    args = parser.parse_args()
+
+    success = create_platform_versions(mode=args.mode)
 
     if success:
         print("\n" + "="*80)
@@ -8,18 +8,11 @@ import json
 from pathlib import Path
 
 def get_audio_duration(audio_path):
-    """Get audio duration in seconds using ffprobe"""
+    """Get audio duration in seconds (cached header probe, no decode)"""
     try:
-        cmd = [
-            'ffprobe', '-v', 'error',
-            '-show_entries', 'format=duration',
-            '-of', 'default=noprint_wrappers=1:nokey=1:noprint_wrappers=1',
-            audio_path
-        ]
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=10)
-        if result.returncode == 0:
-            return float(result.stdout.strip())
-    except:
+        from media_probe import probe_duration
+        return probe_duration(audio_path)
+    except Exception:
         pass
 
     # Fallback: estimate from file size (rough estimate)
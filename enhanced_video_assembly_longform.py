@@ -64,6 +64,25 @@ def calculate_image_duration(image_index: int, total_images: int) -> float:
     return SECTION_TIMINGS["section_normal"]
 
 
+def calculate_image_durations(total_images: int, beats=None) -> List[float]:
+    """
+    Per-image durations, with transitions snapped to the music's beats
+
+    beats defaults to the BEAT_SYNC_* environment (see beat_scheduler);
+    without a beat grid the section timings are returned unchanged.
+    """
+    durations = [calculate_image_duration(i, total_images) for i in range(total_images)]
+
+    if beats is None:
+        from beat_scheduler import beats_from_env
+        beats = beats_from_env()
+    if beats is None:
+        return durations
+
+    from beat_scheduler import beat_aligned_durations
+    return beat_aligned_durations(durations, beats, transition=SECTION_TIMINGS["transition"])
+
+
 def calculate_total_duration(image_count: int) -> float:
     """Calculate total video duration based on image count"""
     total = 0.0
@@ -110,6 +129,7 @@ def generate_signed_urls() -> Tuple[Optional[List[str]], Optional[str], Optional
 
         image_urls = []
         image_metadata = {}
+        durations = calculate_image_durations(len(images))
 
         for i, img_path in enumerate(images):
             s3_key = f"video-generation/{img_path.name}"
@@ -123,7 +143,7 @@ def generate_signed_urls() -> Tuple[Optional[List[str]], Optional[str], Optional
             image_urls.append(signed_url)
 
             # Store metadata
-            duration = calculate_image_duration(i, len(images))
+            duration = durations[i]
             image_metadata[i] = {
                 "filename": img_path.name,
                 "duration": duration,
@@ -211,6 +231,47 @@ def build_video_clips(image_urls: List[str], metadata: Dict) -> List[Dict]:
     return clips
 
 
+def build_local_segments(image_paths: List[Path], width: int = 1920, height: int = 1080,
+                         fps: int = 30, durations: Optional[List[float]] = None) -> List[Dict]:
+    """
+    Split the long-form timeline into independent local render chunks
+
+    Mirrors build_video_clips: clips overlap by the transition duration, so
+    each chunk covers its image's slot up to the next clip's start and owns
+    the crossfade in from the previous image. The first chunk fades in from
+    black, the last fades out, and every chunk is encode_still_clip-ready.
+    durations defaults to calculate_image_durations().
+    """
+    transition_duration = SECTION_TIMINGS["transition"]
+    total_images = len(image_paths)
+    durations = durations or calculate_image_durations(total_images)
+    chunks = []
+
+    for i, img_path in enumerate(image_paths):
+        duration = durations[i]
+        is_last = i == total_images - 1
+
+        chunk = {
+            "image": str(img_path),
+            "duration": duration if is_last else duration - transition_duration,
+            "width": width,
+            "height": height,
+            "fps": fps,
+        }
+        if i == 0:
+            chunk["fade_in"] = transition_duration
+        else:
+            chunk["prev_image"] = str(image_paths[i - 1])
+            chunk["transition_duration"] = transition_duration
+            chunk["transition"] = "fade"
+        if is_last:
+            chunk["fade_out"] = transition_duration * 2  # fadeSlow
+
+        chunks.append(chunk)
+
+    return chunks
+
+
 def assemble_longform_video() -> Tuple[bool, Optional[str]]:
     """Submit long-form video assembly to Shotstack using signed URLs"""
     api_key = os.getenv("SHOTSTACK_API_KEY")
@@ -229,7 +290,7 @@ def assemble_longform_video() -> Tuple[bool, Optional[str]]:
         import requests
 
         total_images = len(image_urls)
-        total_duration = calculate_total_duration(total_images)
+        total_duration = sum(m["duration"] for m in metadata.values())
 
         logger.info(f"\n{'='*60}")
         logger.info("VIDEO ASSEMBLY CONFIGURATION")
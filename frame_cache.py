@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Content-addressed cache of normalized video frames
+
+Renderers decode and resize the same source PNGs over and over. FrameCache
+stores each ready-to-encode frame as an .npy file keyed by the source
+file's content hash plus the target geometry, fit mode and pixel format,
+and hands it back memory-mapped (read-only) on the next render.
+
+The cache is size-bounded: hits refresh a file's mtime and the least
+recently used frames are evicted once the total exceeds max_bytes. The
+total is kept in memory (seeded by one directory scan on the first store),
+so a miss only rescans the cache when it pushes the total over the limit
+(which then evicts down to EVICT_TARGET of it); frames other processes add
+are counted at that rescan.
+
+Environment:
+    FRAME_CACHE_DIR     Cache directory (default: .cache/frames)
+    FRAME_CACHE_MAX_GB  Size limit in GB (default: 10)
+    FRAME_CACHE         Set to 0 to disable caching
+"""
+
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+# Eviction frees space down to this fraction of max_bytes, so a full cache
+# is rescanned once per ~10% of turnover rather than on every miss
+EVICT_TARGET = 0.9
+
+
+def file_content_hash(path) -> str:
+    """SHA-256 hex digest of a file's bytes, read in 1 MB blocks"""
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+class FrameCache:
+    """Disk cache of normalized frames, keyed by source content + geometry"""
+
+    def __init__(self, cache_dir, max_bytes: int = 10 * 1024 ** 3, enabled: bool = True):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+
+        # (path, size, mtime_ns) -> content hash, so a render hashes each file once
+        self._hashes: Dict[Tuple[str, int, int], str] = {}
+
+        # Bytes on disk as of the last scan plus our own stores (None: not scanned yet)
+        self._total: Optional[int] = None
+
+        if self.enabled:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def content_hash(self, src_path) -> str:
+        """SHA-256 of the source file (memoized per path/size/mtime)"""
+        src_path = Path(src_path)
+        st = src_path.stat()
+        memo_key = (str(src_path.resolve()), st.st_size, st.st_mtime_ns)
+
+        digest = self._hashes.get(memo_key)
+        if digest is None:
+            digest = file_content_hash(src_path)
+            self._hashes[memo_key] = digest
+        return digest
+
+    def key(self, src_path, width: int, height: int, fit: str, pix_fmt: str) -> str:
+        return f"{self.content_hash(src_path)}_{width}x{height}_{fit}_{pix_fmt}"
+
+    def path_for(self, key: str) -> Path:
+        # Two-level fan-out keeps directories small for large libraries
+        return self.cache_dir / key[:2] / f"{key}.npy"
+
+    def get(self, src_path, width: int, height: int, fit: str, pix_fmt: str,
+            normalize: Callable[[str], np.ndarray]) -> np.ndarray:
+        """
+        Return the normalized frame for src_path, computing it on a miss
+
+        normalize(src_path) must produce the frame for exactly this
+        geometry/fit/pix_fmt; the fit and pix_fmt strings are part of the
+        cache key, so use a distinct name for every distinct normalization.
+        Hits are read-only memory maps.
+        """
+        if not self.enabled:
+            return normalize(str(src_path))
+
+        entry = self.path_for(self.key(src_path, width, height, fit, pix_fmt))
+        if entry.exists():
+            try:
+                frame = np.load(entry, mmap_mode='r')
+                os.utime(entry)
+                self.hits += 1
+                return frame
+            except (OSError, ValueError):
+                # Truncated or corrupt entry: rebuild it below
+                self._unlink(entry)
+
+        self.misses += 1
+        frame = np.ascontiguousarray(normalize(str(src_path)))
+        self._store(entry, frame)
+        return frame
+
+    def _store(self, entry: Path, frame: np.ndarray):
+        entry.parent.mkdir(parents=True, exist_ok=True)
+
+        # Write-then-rename so concurrent renderers never read a partial file
+        fd, tmp = tempfile.mkstemp(suffix='.npy.tmp', dir=entry.parent)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.save(f, frame)
+            size = os.stat(tmp).st_size
+            os.replace(tmp, entry)
+        except OSError:
+            Path(tmp).unlink(missing_ok=True)
+            return
+
+        if self._total is None:
+            self.evict()
+            return
+        self._total += size
+        if self._total > self.max_bytes:
+            self.evict(int(self.max_bytes * EVICT_TARGET))
+
+    def _unlink(self, p: Path):
+        """Delete a cache file, keeping the tracked total in step"""
+        try:
+            size = p.stat().st_size
+            p.unlink()
+        except FileNotFoundError:
+            return
+        if self._total is not None:
+            self._total = max(0, self._total - size)
+
+    def size_bytes(self) -> int:
+        return sum(p.stat().st_size for p in self.cache_dir.glob("*/*.npy"))
+
+    def evict(self, max_bytes: Optional[int] = None) -> int:
+        """
+        Delete least recently used frames until the cache fits; returns files
+        removed. Scans the whole cache and resets the tracked total.
+        """
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+
+        entries = []
+        total = 0
+        for p in self.cache_dir.glob("*/*.npy"):
+            try:
+                st = p.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, p))
+            total += st.st_size
+
+        removed = 0
+        for _, size, p in sorted(entries):
+            if total <= max_bytes:
+                break
+            p.unlink(missing_ok=True)
+            total -= size
+            removed += 1
+        self._total = total
+        return removed
+
+    def stats(self) -> Dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size_bytes": self.size_bytes() if self.enabled else 0,
+            "cache_dir": str(self.cache_dir)
+        }
+
+
+_default_cache: Optional[FrameCache] = None
+
+
+def default_cache() -> FrameCache:
+    """Process-wide FrameCache configured from the environment"""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = FrameCache(
+            os.getenv("FRAME_CACHE_DIR", ".cache/frames"),
+            max_bytes=int(float(os.getenv("FRAME_CACHE_MAX_GB", "10")) * 1024 ** 3),
+            enabled=os.getenv("FRAME_CACHE", "1") != "0"
+        )
+    return _default_cache
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Content-addressed JSON cache for audio analyses
+
+Loudness measurements, loop points, clip-finder analyses and music features
+are all expensive to compute and depend only on a file's content. JsonCache
+stores each result as one JSON file named by the content digest and the
+analysis version (bump the version when the output changes and old
+entries are ignored). Writes are write-then-rename, so concurrent
+processes never read a partial entry and never rewrite each other's.
+
+Each cache is configured from the environment under its own prefix (see
+from_env):
+    <PREFIX>_DIR  Cache directory
+    <PREFIX>      Set to 0 to disable caching
+"""
+
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+
+class JsonCache:
+    """One JSON file per analysed content digest"""
+
+    def __init__(self, cache_dir, version: int = 1, enabled: bool = True):
+        self.cache_dir = Path(cache_dir)
+        self.version = version
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_env(cls, prefix: str, default_dir, version: int = 1) -> "JsonCache":
+        """Cache in ${prefix}_DIR (default_dir), disabled by ${prefix}=0"""
+        return cls(os.getenv(f"{prefix}_DIR", default_dir), version=version,
+                   enabled=os.getenv(prefix, "1") != "0")
+
+    def path_for(self, digest: str) -> Path:
+        return self.cache_dir / f"{digest}_v{self.version}.json"
+
+    def get(self, digest: str) -> Optional[Dict]:
+        if not self.enabled:
+            return None
+        entry = self.path_for(digest)
+        if not entry.exists():
+            self.misses += 1
+            return None
+        try:
+            data = json.loads(entry.read_text())
+        except (OSError, ValueError):
+            entry.unlink(missing_ok=True)
+            self.misses += 1
+            return None
+        self.hits += 1
+        return data
+
+    def put(self, digest: str, value: Dict):
+        if not self.enabled:
+            return
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(suffix='.json.tmp', dir=self.cache_dir)
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(value, f)
+            os.replace(tmp, self.path_for(digest))
+        except OSError:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+
+    def cached(self, digest: str, compute: Callable[[], Dict]) -> Dict:
+        """The entry for digest, computed (and stored) on a miss"""
+        value = self.get(digest)
+        if value is None:
+            value = compute()
+            self.put(digest, value)
+        return value
@@ -0,0 +1,582 @@
+#!/usr/bin/env python3
+"""
+Local Renderer
+Streams raw frames straight into ffmpeg (libx264 + AAC)
+
+- FFmpegPipeWriter: one encode, no intermediate mp4v file and no second
+  re-encode to attach narration
+- SegmentRenderer: each still-image hold is encoded once as a single
+  variable-frame-rate frame; only transitions are encoded frame by frame.
+  Segments share encoder settings and are joined with the concat demuxer
+  (-c copy)
+- render_parallel: splits a timeline into independent chunks, encodes them
+  in a process pool with identical encoder parameters and joins them the
+  same way
+"""
+
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+
+def ffmpeg_bin() -> str:
+    """Return ffmpeg binary path (bundled via imageio_ffmpeg when available)."""
+    try:
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except Exception:
+        return "ffmpeg"
+
+
+class FFmpegPipeWriter:
+    """
+    Write raw BGR frames to ffmpeg over stdin
+
+    Mirrors the cv2.VideoWriter write()/release() interface so the montage
+    frame loops can use it unchanged. Narration (if given) is muxed in the
+    same process, so the output is final after release().
+    """
+
+    def __init__(self, output_path, width: int, height: int, fps: int,
+                 audio_path=None, preset: str = "medium", crf: int = 23,
+                 audio_bitrate: str = "192k", pix_fmt: str = "bgr24",
+                 tune: Optional[str] = None, bitstream_filter: Optional[str] = None,
+                 threads: Optional[int] = None):
+        """
+        Args:
+            output_path: Final MP4 path
+            width, height: Frame size in pixels (frames must match exactly)
+            fps: Output frame rate
+            audio_path: Optional narration/mixed audio to mux (AAC)
+            preset: libx264 preset
+            crf: libx264 constant rate factor
+            audio_bitrate: AAC bitrate
+            pix_fmt: Pixel format of incoming frames (bgr24 for OpenCV)
+            tune: Optional libx264 tune (e.g. "stillimage")
+            bitstream_filter: Optional -bsf:v applied to encoded packets
+            threads: Optional libx264 thread count (for parallel chunk encodes)
+        """
+        self.output_path = Path(output_path)
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.audio_path = Path(audio_path) if audio_path else None
+        self.preset = preset
+        self.crf = crf
+        self.audio_bitrate = audio_bitrate
+        self.pix_fmt = pix_fmt
+        self.tune = tune
+        self.bitstream_filter = bitstream_filter
+        self.threads = threads
+
+        self.frames_written = 0
+        self._frame_bytes = width * height * 3
+        self._proc = None
+        self._stderr = None
+        self._start_time = None
+        self._input_closed = False
+
+    def build_command(self) -> List[str]:
+        """Build the ffmpeg command line for this writer"""
+        cmd = [
+            ffmpeg_bin(), '-y',
+            '-loglevel', 'error',
+            '-f', 'rawvideo',
+            '-pix_fmt', self.pix_fmt,
+            '-s', f"{self.width}x{self.height}",
+            '-r', str(self.fps),
+            '-i', 'pipe:0',
+        ]
+
+        if self.audio_path:
+            cmd += ['-i', str(self.audio_path), '-map', '0:v', '-map', '1:a']
+
+        cmd += [
+            '-c:v', 'libx264',
+            '-preset', self.preset,
+            '-crf', str(self.crf),
+            '-pix_fmt', 'yuv420p',
+        ]
+        if self.tune:
+            cmd += ['-tune', self.tune]
+        if self.bitstream_filter:
+            cmd += ['-bsf:v', self.bitstream_filter]
+        if self.threads:
+            cmd += ['-threads', str(self.threads)]
+
+        if self.audio_path:
+            cmd += ['-c:a', 'aac', '-b:a', self.audio_bitrate, '-shortest']
+
+        cmd += ['-movflags', '+faststart', str(self.output_path)]
+        return cmd
+
+    def open(self):
+        """Start the ffmpeg process (raises FileNotFoundError if ffmpeg is missing)"""
+        if self._proc is not None:
+            return self
+
+        self.output_path.parent.mkdir(parents=True, exist_ok=True)
+
+        # stderr goes to a temp file so a chatty encoder can never block the pipe
+        self._stderr = tempfile.TemporaryFile()
+        self._proc = subprocess.Popen(
+            self.build_command(),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.DEVNULL,
+            stderr=self._stderr
+        )
+        self._start_time = time.perf_counter()
+        return self
+
+    def isOpened(self) -> bool:
+        """cv2.VideoWriter compatible check"""
+        return self._proc is not None and self._proc.poll() is None
+
+    def write(self, frame) -> bool:
+        """
+        Write one HxWx3 uint8 frame
+
+        Returns False once ffmpeg has stopped reading (``-shortest`` reached the
+        end of the audio), so callers can stop generating frames early.
+        """
+        if self._proc is None:
+            self.open()
+        if self._input_closed:
+            return False
+
+        data = memoryview(frame).cast('B') if frame.flags['C_CONTIGUOUS'] else frame.tobytes()
+        if len(data) != self._frame_bytes:
+            raise ValueError(
+                f"Frame size mismatch: got {frame.shape}, expected "
+                f"({self.height}, {self.width}, 3)"
+            )
+
+        try:
+            self._proc.stdin.write(data)
+        except BrokenPipeError:
+            # With -shortest ffmpeg closes its input once the audio ends
+            if self.audio_path and self._proc.wait() == 0:
+                self._input_closed = True
+                return False
+            raise RuntimeError(f"ffmpeg exited early: {self._read_stderr()}")
+
+        self.frames_written += 1
+        return True
+
+    def release(self) -> Dict:
+        """Finish encoding and return render stats"""
+        if self._proc is None:
+            return self.stats(0.0)
+
+        try:
+            self._proc.stdin.close()
+        except (BrokenPipeError, OSError):
+            pass
+
+        returncode = self._proc.wait()
+        elapsed = time.perf_counter() - self._start_time
+        stderr = self._read_stderr()
+        self._stderr.close()
+        self._proc = None
+
+        if returncode != 0:
+            raise RuntimeError(f"ffmpeg failed ({returncode}): {stderr}")
+
+        return self.stats(elapsed)
+
+    def stats(self, elapsed: float) -> Dict:
+        """Frame count, wall time and throughput for this render"""
+        return {
+            "frames": self.frames_written,
+            "elapsed_seconds": elapsed,
+            "fps": self.frames_written / elapsed if elapsed > 0 else 0.0,
+            "output": str(self.output_path)
+        }
+
+    def _read_stderr(self) -> str:
+        if self._stderr is None:
+            return ""
+        self._stderr.seek(0)
+        return self._stderr.read().decode('utf-8', errors='ignore').strip()[-2000:]
+
+    def abort(self):
+        """Kill the encoder without finalizing (partial output is left as-is)"""
+        if self._proc is None:
+            return
+        self._proc.kill()
+        self._proc.wait()
+        self._stderr.close()
+        self._proc = None
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is not None:
+            self.abort()
+        else:
+            self.release()
+        return False
+
+
+class SegmentRenderer:
+    """
+    Render a slideshow as still + transition segments joined without re-encoding
+
+    A still segment encodes its frame as two packets and stretches the first
+    one's duration with the setts bitstream filter, so a 20 s hold costs two
+    encoded frames instead of 600 (the output is variable frame rate). Transition
+    frames are streamed into their own segments. All segments use identical
+    encoder settings (-tune stillimage), so the concat demuxer can join them
+    with -c copy and the narration is muxed in the same final step.
+    """
+
+    def __init__(self, output_path, width: int, height: int, fps: int,
+                 audio_path=None, preset: str = "medium", crf: int = 23,
+                 audio_bitrate: str = "192k", work_dir=None):
+        self.output_path = Path(output_path)
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.audio_path = Path(audio_path) if audio_path else None
+        self.preset = preset
+        self.crf = crf
+        self.audio_bitrate = audio_bitrate
+
+        self.output_path.parent.mkdir(parents=True, exist_ok=True)
+        self._own_work_dir = work_dir is None
+        self.work_dir = Path(work_dir) if work_dir else Path(
+            tempfile.mkdtemp(prefix="segments_", dir=self.output_path.parent))
+        self.work_dir.mkdir(parents=True, exist_ok=True)
+
+        self.segments: List[Path] = []
+        self.total_frames = 0
+        self.frames_piped = 0
+        self._transition = None
+        self._start_time = time.perf_counter()
+
+    def _segment_writer(self, bitstream_filter: Optional[str] = None) -> FFmpegPipeWriter:
+        path = self.work_dir / f"segment_{len(self.segments):05d}.mp4"
+        self.segments.append(path)
+        return FFmpegPipeWriter(path, self.width, self.height, self.fps,
+                                preset=self.preset, crf=self.crf,
+                                tune="stillimage", bitstream_filter=bitstream_filter).open()
+
+    def add_still(self, frame, frames: int):
+        """Hold one frame for `frames` frames, encoded as its own segment"""
+        if frames <= 0:
+            return
+        self._close_transition()
+
+        if frames == 1:
+            writer = self._segment_writer()
+            writer.write(frame)
+        else:
+            # Two packets: the frame stretched over frames - 1, then a plain
+            # one-frame copy at the end. concat -c copy drops the duration of
+            # the output's last packet, so a single stretched packet loses the
+            # whole hold when the still ends the video.
+            writer = self._segment_writer(
+                f"setts=ts=if(eq(N\\,1)\\,TS+DURATION*{frames - 2}\\,TS)"
+                f":duration=if(eq(N\\,0)\\,DURATION*{frames - 1}\\,DURATION)")
+            writer.write(frame)
+            writer.write(frame)
+        writer.release()
+
+        self.total_frames += frames
+        self.frames_piped += min(frames, 2)
+
+    def add_frame(self, frame):
+        """Append one frame to the current transition segment"""
+        if self._transition is None:
+            self._transition = self._segment_writer()
+        self._transition.write(frame)
+        self.total_frames += 1
+        self.frames_piped += 1
+
+    def write(self, frame):
+        """cv2.VideoWriter compatible alias for add_frame()"""
+        self.add_frame(frame)
+
+    def add_frames(self, frames: Iterable):
+        for frame in frames:
+            self.add_frame(frame)
+
+    def _close_transition(self):
+        if self._transition is not None:
+            self._transition.release()
+            self._transition = None
+
+    def finish(self) -> Dict:
+        """Concat all segments (+ narration) into the output and return stats"""
+        self._close_transition()
+
+        try:
+            concat_segments(self.segments, self.output_path, self.work_dir / "concat_list.txt",
+                            audio_path=self.audio_path, audio_bitrate=self.audio_bitrate,
+                            pad_audio_to=self.total_frames / self.fps)
+            self._check_length()
+        except Exception:
+            self.cleanup()
+            raise
+
+        elapsed = time.perf_counter() - self._start_time
+        stats = {
+            "frames": self.total_frames,
+            "frames_piped": self.frames_piped,
+            "segments": len(self.segments),
+            "elapsed_seconds": elapsed,
+            "fps": self.total_frames / elapsed if elapsed > 0 else 0.0,
+            "output": str(self.output_path)
+        }
+        self.cleanup()
+        return stats
+
+    def _check_length(self):
+        """Fail when the output plays fewer frames than were added"""
+        expected = self.total_frames / self.fps
+        played = video_packet_span(self.output_path)
+        if played is not None and played < expected - 1.5 / self.fps:
+            raise RuntimeError(
+                f"Segment concat lost frames: video plays {played:.2f}s, "
+                f"expected {expected:.2f}s ({self.total_frames} frames)")
+
+    def abort(self):
+        if self._transition is not None:
+            self._transition.abort()
+            self._transition = None
+        self.cleanup()
+
+    def cleanup(self):
+        if self._own_work_dir:
+            shutil.rmtree(self.work_dir, ignore_errors=True)
+
+
+def video_packet_span(path) -> Optional[float]:
+    """
+    Seconds from the first video packet's pts to the end of the last one
+
+    Read from the packets themselves (stream copy, nothing is decoded), not
+    the container header, which can report a length the decoder never plays.
+    """
+    result = subprocess.run([ffmpeg_bin(), '-v', 'error', '-i', str(path), '-map', '0:v:0',
+                             '-c', 'copy', '-f', 'framecrc', '-'], capture_output=True, text=True)
+    if result.returncode != 0:
+        return None
+
+    time_base = None
+    start = end = None
+    for line in result.stdout.splitlines():
+        if line.startswith('#tb 0:'):
+            num, den = line.split(':', 1)[1].strip().split('/')
+            time_base = int(num) / int(den)
+        elif line and not line.startswith('#'):
+            _, _, pts, duration = (int(v) for v in line.split(',')[:4])
+            start = pts if start is None else min(start, pts)
+            end = pts + duration if end is None else max(end, pts + duration)
+    if time_base is None or start is None:
+        return None
+    return (end - start) * time_base
+
+
+def concat_segments(segments: Sequence[Path], output_path, concat_file,
+                    audio_path=None, audio_bitrate: str = "192k",
+                    pad_audio_to: Optional[float] = None):
+    """
+    Join encoded segments with the concat demuxer (-c copy), optionally
+    muxing audio (AAC, -shortest) in the same step
+
+    pad_audio_to (seconds, the video's length) pads the audio with silence
+    to that length, so a video longer than its audio is not cut short.
+    """
+    with open(concat_file, 'w') as f:
+        for segment in segments:
+            f.write(f"file '{Path(segment).absolute().as_posix()}'\n")
+
+    cmd = [ffmpeg_bin(), '-y', '-loglevel', 'error',
+           '-f', 'concat', '-safe', '0', '-i', str(concat_file)]
+    if audio_path:
+        cmd += ['-i', str(audio_path), '-map', '0:v', '-map', '1:a',
+                '-c:v', 'copy', '-c:a', 'aac', '-b:a', audio_bitrate, '-shortest']
+        if pad_audio_to:
+            # Finite padding: apad without a length never ends with -c:v copy
+            cmd += ['-af', f'apad=whole_dur={pad_audio_to:.3f}']
+    else:
+        cmd += ['-c', 'copy']
+    cmd += ['-movflags', '+faststart', str(output_path)]
+
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Segment concat failed: {result.stderr[-2000:]}")
+
+
+def default_workers() -> int:
+    """Worker processes for parallel renders (RENDER_WORKERS env or CPU count)"""
+    return max(1, int(os.getenv("RENDER_WORKERS", "0")) or os.cpu_count() or 1)
+
+
+def encoder_threads(workers: int) -> int:
+    """Split the CPU between parallel encoders instead of oversubscribing it"""
+    return max(1, (os.cpu_count() or 1) // max(workers, 1))
+
+
+def encode_still_clip(segment_path: Path, chunk: Dict) -> int:
+    """
+    Chunk function: encode one image held for chunk["duration"] seconds
+
+    Chunk keys: image, duration, width, height, fps, and optionally preset,
+    crf, threads. The image is scaled to fit and padded to width x height.
+
+    Optional transition keys make a chunk self-contained at a boundary:
+    prev_image + transition_duration crossfade from the previous image
+    (xfade, chunk["transition"], default "fade") over the first seconds of
+    the clip; fade_in / fade_out fade from / to black over that many seconds.
+    Returns the number of frames encoded.
+    """
+    width, height, fps = chunk["width"], chunk["height"], chunk["fps"]
+    duration = chunk["duration"]
+    fit = (f"scale={width}:{height}:force_original_aspect_ratio=decrease,"
+           f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2,setsar=1,format=yuv420p")
+
+    cmd = [ffmpeg_bin(), '-y', '-loglevel', 'error']
+    prev_image = chunk.get("prev_image")
+    overlap = min(chunk.get("transition_duration", 0.0), duration) if prev_image else 0.0
+    if overlap > 0:
+        cmd += ['-loop', '1', '-framerate', str(fps), '-t', f"{overlap:.3f}",
+                '-i', str(prev_image)]
+    cmd += ['-loop', '1', '-framerate', str(fps), '-t', f"{duration:.3f}",
+            '-i', str(chunk["image"])]
+
+    if overlap > 0:
+        graph = (f"[0:v]{fit}[prev];[1:v]{fit}[curr];"
+                 f"[prev][curr]xfade=transition={chunk.get('transition', 'fade')}:"
+                 f"duration={overlap:.3f}:offset=0")
+    else:
+        graph = f"[0:v]{fit}"
+    if chunk.get("fade_in"):
+        graph += f",fade=t=in:st=0:d={chunk['fade_in']:.3f}"
+    if chunk.get("fade_out"):
+        fade_out = min(chunk["fade_out"], duration)
+        graph += f",fade=t=out:st={duration - fade_out:.3f}:d={fade_out:.3f}"
+
+    cmd += [
+        '-filter_complex', graph + "[v]", '-map', '[v]',
+        '-c:v', 'libx264',
+        '-preset', chunk.get("preset", "medium"),
+        '-crf', str(chunk.get("crf", 23)),
+        '-pix_fmt', 'yuv420p',
+    ]
+    if chunk.get("threads"):
+        cmd += ['-threads', str(chunk["threads"])]
+    cmd += [str(segment_path)]
+
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        Path(segment_path).unlink(missing_ok=True)
+        raise RuntimeError(f"Clip encode failed for {chunk['image']}: {result.stderr[-2000:]}")
+    return int(round(duration * fps))
+
+
+def encode_motion_clip(segment_path: Path, chunk: Dict) -> int:
+    """
+    Chunk function: render Ken Burns motion over one still (motion_engine)
+
+    Chunk keys: image, duration, width, height, fps, and optionally motion
+    (see motion_engine.MOTION_TYPES, default "zoom_in"), zoom, preset, crf,
+    threads. A local, near-free substitute for image-to-video API clips.
+    Returns the number of frames encoded.
+    """
+    import numpy as np
+    from PIL import Image
+
+    from motion_engine import DEFAULT_ZOOM, MotionEngine
+
+    width, height, fps = chunk["width"], chunk["height"], chunk["fps"]
+    frames = int(round(chunk["duration"] * fps))
+
+    with Image.open(chunk["image"]) as img:
+        source = np.asarray(img.convert('RGB'))
+
+    engine = MotionEngine(width, height)
+    writer = FFmpegPipeWriter(segment_path, width, height, fps,
+                              preset=chunk.get("preset", "medium"), crf=chunk.get("crf", 23),
+                              pix_fmt='rgb24', threads=chunk.get("threads"))
+    writer.open()
+    try:
+        for frame in engine.render(source, frames, chunk.get("motion", "zoom_in"),
+                                   chunk.get("zoom", DEFAULT_ZOOM)):
+            writer.write(frame)
+    except Exception:
+        writer.abort()
+        Path(segment_path).unlink(missing_ok=True)
+        raise
+
+    return writer.release()["frames"]
+
+
+def render_chunks(chunk_fn: Callable[[Path, Any], int],
+                  jobs: Sequence[Tuple[Path, Any]],
+                  workers: Optional[int] = None) -> List[int]:
+    """
+    Run chunk_fn(segment_path, chunk) for every job in a process pool
+
+    chunk_fn must be a module-level function (it is pickled to the workers)
+    and return the number of frames it encoded. Results keep job order.
+    """
+    workers = min(workers or default_workers(), max(len(jobs), 1))
+    if workers <= 1:
+        return [chunk_fn(path, chunk) for path, chunk in jobs]
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(chunk_fn, path, chunk) for path, chunk in jobs]
+        return [future.result() for future in futures]
+
+
+def render_parallel(chunk_fn: Callable[[Path, Any], int], chunks: Sequence[Any],
+                    output_path, audio_path=None, workers: Optional[int] = None,
+                    audio_bitrate: str = "192k", work_dir=None,
+                    pad_audio_to: Optional[float] = None) -> Dict:
+    """
+    Segment-parallel render: encode chunks across processes, then concat -c copy
+
+    Each chunk must be independently renderable (a chunk that starts with a
+    transition loads the previous image itself), and every chunk_fn call must
+    use identical encoder parameters so the segments can be joined without
+    re-encoding. Audio (if given) is muxed during the concat, cut to the
+    video and, with pad_audio_to, padded with silence to that many seconds.
+    """
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    workers = workers or default_workers()
+
+    own_work_dir = work_dir is None
+    work_dir = Path(work_dir) if work_dir else Path(
+        tempfile.mkdtemp(prefix="parallel_", dir=output_path.parent))
+    work_dir.mkdir(parents=True, exist_ok=True)
+
+    start_time = time.perf_counter()
+    jobs = [(work_dir / f"chunk_{i:05d}.mp4", chunk) for i, chunk in enumerate(chunks)]
+
+    try:
+        frame_counts = render_chunks(chunk_fn, jobs, workers)
+        concat_segments([path for path, _ in jobs], output_path, work_dir / "concat_list.txt",
+                        audio_path=audio_path, audio_bitrate=audio_bitrate, pad_audio_to=pad_audio_to)
+    finally:
+        if own_work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    elapsed = time.perf_counter() - start_time
+    frames = sum(frame_counts)
+    return {
+        "frames": frames,
+        "segments": len(jobs),
+        "workers": min(workers, len(jobs)),
+        "elapsed_seconds": elapsed,
+        "fps": frames / elapsed if elapsed > 0 else 0.0,
+        "output": str(output_path)
+    }
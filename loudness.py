@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+EBU R128 loudness normalization with cached measurements
+
+Measuring integrated loudness is a full decode + analysis pass (ffmpeg
+loudnorm, first pass). LoudnessCache runs it once per audio asset and
+stores the result keyed by the file's content hash, so every platform
+export afterwards is one encode with a single linear gain (ffmpeg volume),
+capped so the true peak stays under the platform ceiling.
+
+For mixes that do not exist yet (audio_mixer.stream_mix_platforms),
+KWeighting and gated_loudness measure BS.1770 loudness from float blocks
+in numpy, so the gain can be known before the single encode.
+
+Environment:
+    LOUDNESS_CACHE_DIR  Measurement cache directory (default: .cache/loudness)
+    LOUDNESS_CACHE      Set to 0 to disable caching
+"""
+
+import json
+import re
+import subprocess
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy as np
+
+from frame_cache import file_content_hash
+from json_cache import JsonCache
+from local_renderer import ffmpeg_bin
+
+# Default target (YouTube/most social platforms); podcasts usually use -16
+DEFAULT_LUFS = -14.0
+DEFAULT_TRUE_PEAK_DB = -1.0
+
+
+def measure_loudness(path) -> Dict:
+    """One loudnorm analysis pass: integrated LUFS, true peak, LRA, threshold"""
+    from pcm_cache import default_pcm_cache
+
+    # Reuse already-decoded PCM when this track is in the PCM cache
+    pcm = default_pcm_cache().lookup(path)
+    source = pcm.ffmpeg_input() if pcm else ['-i', str(path)]
+    cmd = [ffmpeg_bin(), '-hide_banner', '-nostats', *source, '-vn',
+           '-af', 'loudnorm=print_format=json', '-f', 'null', '-']
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Loudness analysis failed for {path}: {result.stderr[-2000:]}")
+
+    match = re.search(r"\{[^{}]*\"input_i\"[^{}]*\}", result.stderr)
+    if not match:
+        raise RuntimeError(f"No loudnorm measurement in ffmpeg output for {path}")
+    stats = json.loads(match.group(0))
+
+    return {
+        "integrated_lufs": float(stats["input_i"]),
+        "true_peak_db": float(stats["input_tp"]),
+        "lra": float(stats["input_lra"]),
+        "threshold": float(stats["input_thresh"]),
+    }
+
+
+class LoudnessCache(JsonCache):
+    """Loudness measurements keyed by file content hash"""
+
+    def __init__(self, cache_dir=None, enabled: Optional[bool] = None):
+        config = JsonCache.from_env("LOUDNESS_CACHE", ".cache/loudness")
+        super().__init__(cache_dir or config.cache_dir,
+                         enabled=config.enabled if enabled is None else enabled)
+
+    def measure(self, path) -> Dict:
+        """Cached measurement for path (analysed only if its content is new)"""
+        return self.cached(file_content_hash(path),
+                           lambda: {**measure_loudness(path), "source": str(path)})
+
+
+# BS.1770 K-weighting stages as (f0, Q, shelf gain dB), libebur128's constants
+K_SHELF = (1681.974450955533, 0.7071752369554196, 3.999843853973347)
+K_HIGHPASS = (38.13547087613982, 0.5003270373253953, None)
+
+# Gating: 400 ms blocks, 75% overlap, built from 100 ms sub-blocks
+SUBBLOCK_SECONDS = 0.1
+ABSOLUTE_GATE_LUFS = -70.0
+RELATIVE_GATE_LU = -10.0
+
+
+def _k_biquad(rate: int, f0: float, q: float, gain_db: Optional[float]):
+    """(b, a) of one K-weighting stage at rate"""
+    k = np.tan(np.pi * f0 / rate)
+    a0 = 1.0 + k / q + k * k
+    a = (1.0, 2.0 * (k * k - 1.0) / a0, (1.0 - k / q + k * k) / a0)
+    if gain_db is None:
+        return (1.0, -2.0, 1.0), a
+    vh = 10.0 ** (gain_db / 20.0)
+    vb = vh ** 0.4996667741545416
+    b = ((vh + vb * k / q + k * k) / a0, 2.0 * (k * k - vh) / a0, (vh - vb * k / q + k * k) / a0)
+    return b, a
+
+
+@lru_cache(maxsize=None)
+def k_weighting_ir(rate: int, tolerance: float = 1e-7) -> np.ndarray:
+    """Impulse response of the K-weighting filter, truncated once it has decayed"""
+    response = np.zeros(rate // 2)
+    response[0] = 1.0
+    for stage in (K_SHELF, K_HIGHPASS):
+        (b0, b1, b2), (_, a1, a2) = _k_biquad(rate, *stage)
+        x1 = x2 = y1 = y2 = 0.0
+        out = []
+        for x in response.tolist():
+            y = b0 * x + b1 * x1 + b2 * x2 - a1 * y1 - a2 * y2
+            x2, x1, y2, y1 = x1, x, y1, y
+            out.append(y)
+        response = np.array(out)
+
+    tail = np.cumsum(np.abs(response[::-1]))[::-1]
+    return response[:max(1, int(np.count_nonzero(tail > tolerance)))]
+
+
+def _fft_length(n: int) -> int:
+    """Smallest 2^a * 3^b * 5^c >= n (fast pocketfft sizes, far tighter than 2^k)"""
+    best = 1 << (n - 1).bit_length()
+    p5 = 1
+    while p5 < best:
+        p35 = p5
+        while p35 < best:
+            size = p35 << max(0, (-(-n // p35) - 1).bit_length())
+            best = min(best, size)
+            p35 *= 3
+        p5 *= 5
+    return best
+
+
+class KWeighting:
+    """Streaming K-weighting of (frames x channels) blocks (FFT overlap-add)"""
+
+    def __init__(self, rate: int, channels: int):
+        self.ir = k_weighting_ir(rate)
+        self._tail = np.zeros((len(self.ir) - 1, channels))
+        self._spectra: Dict[int, np.ndarray] = {}
+
+    def process(self, block: np.ndarray) -> np.ndarray:
+        frames = len(block)
+        n = frames + len(self.ir) - 1
+        size = _fft_length(n)
+        spectrum = self._spectra.get(size)
+        if spectrum is None:
+            spectrum = self._spectra[size] = np.fft.rfft(self.ir, size)[:, None]
+
+        out = np.fft.irfft(np.fft.rfft(block, size, axis=0) * spectrum, size, axis=0)[:n]
+        out[:len(self._tail)] += self._tail
+        self._tail = out[frames:]
+        return out[:frames]
+
+
+def gated_loudness(energy: np.ndarray) -> np.ndarray:
+    """
+    Integrated loudness (LUFS) from K-weighted mean-square energy per 100 ms
+    sub-block, summed over channels
+
+    energy is (..., subblocks); every leading row is measured independently.
+    Rows that are silent (entirely below the absolute gate) give -inf.
+    """
+    energy = np.asarray(energy, dtype=np.float64)
+    if energy.shape[-1] < 4:
+        return np.full(energy.shape[:-1], -np.inf)
+
+    blocks = np.lib.stride_tricks.sliding_window_view(energy, 4, axis=-1).mean(axis=-1)
+    with np.errstate(divide="ignore"):
+        levels = -0.691 + 10.0 * np.log10(blocks)
+
+        def gated_mean(mask):
+            count = mask.sum(axis=-1)
+            return np.where(mask, blocks, 0.0).sum(axis=-1) / np.maximum(count, 1), count
+
+        above_absolute = levels > ABSOLUTE_GATE_LUFS
+        mean, _ = gated_mean(above_absolute)
+        relative = -0.691 + 10.0 * np.log10(mean) + RELATIVE_GATE_LU
+        mean, count = gated_mean(above_absolute & (levels > relative[..., None]))
+        return np.where(count > 0, -0.691 + 10.0 * np.log10(mean), -np.inf)
+
+
+def correction_gain(measurement: Dict, target_lufs: float, true_peak_db: float) -> float:
+    """Linear gain (dB) reaching target_lufs without pushing true peak past the ceiling"""
+    integrated = measurement["integrated_lufs"]
+    if integrated == float("-inf") or integrated < -70:
+        # Silence (below the absolute gate): nothing to normalize
+        return 0.0
+    gain = target_lufs - integrated
+    return min(gain, true_peak_db - measurement["true_peak_db"])
+
+
+def normalize_loudness(input_path, output_path, target_lufs: float = DEFAULT_LUFS,
+                       true_peak_db: float = DEFAULT_TRUE_PEAK_DB,
+                       cache: Optional[LoudnessCache] = None, audio_bitrate: str = "192k") -> Dict:
+    """
+    Export input_path at target_lufs with one encode
+
+    Video streams (if any) are copied; only the audio is re-encoded with a
+    single volume gain. The measurement comes from the cache when this
+    content was analysed before.
+    Returns the measurement, applied gain and predicted output loudness.
+    """
+    cache = cache or LoudnessCache()
+
+    start_time = time.perf_counter()
+    measurement = cache.measure(input_path)
+    gain = correction_gain(measurement, target_lufs, true_peak_db)
+
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    # -c copy keeps video/subtitles; only audio is re-encoded to apply the gain
+    cmd = [ffmpeg_bin(), '-y', '-hide_banner', '-loglevel', 'error',
+           '-i', str(input_path), '-map', '0', '-c', 'copy',
+           '-c:a', _audio_codec(output_path), '-b:a', audio_bitrate,
+           '-af', f"volume={gain:.2f}dB", str(output_path)]
+
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Loudness export failed: {result.stderr[-2000:]}")
+
+    return {
+        "output": str(output_path),
+        "measured": measurement,
+        "gain_db": gain,
+        "predicted_lufs": measurement["integrated_lufs"] + gain,
+        "predicted_true_peak_db": measurement["true_peak_db"] + gain,
+        "elapsed_seconds": time.perf_counter() - start_time,
+    }
+
+
+def _audio_codec(output_path: Path) -> str:
+    return {
+        ".mp3": "libmp3lame",
+        ".wav": "pcm_f32le",
+        ".flac": "flac",
+        ".ogg": "libvorbis",
+        ".opus": "libopus",
+    }.get(output_path.suffix.lower(), "aac")
@@ -0,0 +1,488 @@
+#!/usr/bin/env python3
+"""
+Media probe: duration, sample rate, resolution and codecs without decoding
+
+One probe API for the whole pipeline:
+
+- MP3, WAV and MP4/MOV/M4A headers are parsed in-process (Xing/Info/VBRI
+  frame counts or CBR bitrate for MP3, RIFF chunks for WAV, moov boxes for
+  MP4), reading at most a few KB for audio and only the moov box for video
+- Anything else goes to ffprobe (ffmpeg -i when ffprobe is not installed);
+  probe_many() runs those concurrently
+- Results are cached in a JSON file keyed by (absolute path, size, mtime),
+  so a repeat probe is one stat() and a dict lookup
+
+Environment:
+    MEDIA_PROBE_CACHE  Cache file (default: .cache/media_probe.json; 0 disables)
+"""
+
+import json
+import os
+import re
+import shutil
+import struct
+import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+# Cached entries kept (oldest dropped first)
+MAX_CACHE_ENTRIES = 20000
+
+
+@dataclass
+class MediaInfo:
+    """Container-level facts about one media file"""
+    duration: float
+    format: str
+    sample_rate: Optional[int] = None
+    channels: Optional[int] = None
+    audio_codec: Optional[str] = None
+    width: Optional[int] = None
+    height: Optional[int] = None
+    fps: Optional[float] = None
+    video_codec: Optional[str] = None
+
+
+# ---------------------------------------------------------------------------
+# MP3
+# ---------------------------------------------------------------------------
+
+_MP3_BITRATES = {
+    # (mpeg1, layer) -> kbps by index
+    (True, 1): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (True, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (True, 3): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (False, 1): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (False, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (False, 3): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+_MP3_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+
+
+def _mp3_frame(header: int):
+    """Decode a 4-byte MPEG audio frame header; None if it is not one"""
+    if header >> 21 != 0x7FF:
+        return None
+    version = (header >> 19) & 3
+    layer = 4 - ((header >> 17) & 3)
+    bitrate_idx = (header >> 12) & 15
+    rate_idx = (header >> 10) & 3
+    if version == 1 or layer == 4 or bitrate_idx in (0, 15) or rate_idx == 3:
+        return None
+
+    mpeg1 = version == 3
+    bitrate = _MP3_BITRATES[(mpeg1, layer)][bitrate_idx] * 1000
+    sample_rate = _MP3_RATES[version][rate_idx]
+    padding = (header >> 9) & 1
+    mono = (header >> 6) & 3 == 3
+
+    if layer == 1:
+        samples, length = 384, (12 * bitrate // sample_rate + padding) * 4
+    else:
+        samples = 1152 if (layer == 2 or mpeg1) else 576
+        length = samples // 8 * bitrate // sample_rate + padding
+    return {"mpeg1": mpeg1, "bitrate": bitrate, "sample_rate": sample_rate,
+            "samples": samples, "length": length, "channels": 1 if mono else 2}
+
+
+def _parse_mp3(f, size: int) -> Optional[MediaInfo]:
+    head = f.read(10)
+    start = 0
+    if head[:3] == b"ID3" and len(head) == 10:
+        start = 10 + ((head[6] << 21) | (head[7] << 14) | (head[8] << 7) | head[9])
+        if head[5] & 0x10:
+            start += 10  # footer
+
+    f.seek(start)
+    buf = f.read(65536)
+
+    # First frame header whose successor is also a valid header (avoids false syncs)
+    frame, pos = None, 0
+    while pos < len(buf) - 4:
+        pos = buf.find(b"\xff", pos)
+        if pos < 0 or pos > len(buf) - 4:
+            return None
+        candidate = _mp3_frame(struct.unpack(">I", buf[pos:pos + 4])[0])
+        if candidate:
+            nxt = pos + candidate["length"]
+            if nxt + 4 > len(buf) or _mp3_frame(struct.unpack(">I", buf[nxt:nxt + 4])[0]):
+                frame = candidate
+                break
+        pos += 1
+    if frame is None:
+        return None
+
+    sample_rate = frame["sample_rate"]
+    info = MediaInfo(duration=0.0, format="mp3", sample_rate=sample_rate,
+                     channels=frame["channels"], audio_codec="mp3")
+
+    # Xing/Info (LAME) header inside the first frame
+    side = (32 if frame["channels"] == 2 else 17) if frame["mpeg1"] else \
+        (17 if frame["channels"] == 2 else 9)
+    xing = pos + 4 + side
+    if buf[xing:xing + 4] in (b"Xing", b"Info"):
+        flags = struct.unpack(">I", buf[xing + 4:xing + 8])[0]
+        if flags & 1:
+            frames = struct.unpack(">I", buf[xing + 8:xing + 12])[0]
+            total = frames * frame["samples"]
+            # LAME/Lavc tag: encoder delay and padding, trimmed by decoders
+            lame = xing + 8 + 4 * bool(flags & 1) + 4 * bool(flags & 2) + \
+                100 * bool(flags & 4) + 4 * bool(flags & 8)
+            if buf[lame:lame + 4] in (b"LAME", b"Lavc", b"Lavf") and len(buf) >= lame + 24:
+                b0, b1, b2 = buf[lame + 21:lame + 24]
+                total -= ((b0 << 4) | (b1 >> 4)) + (((b1 & 0xF) << 8) | b2)
+            info.duration = max(total, 0) / sample_rate
+            return info
+
+    # VBRI (Fraunhofer) header at a fixed offset
+    vbri = pos + 4 + 32
+    if buf[vbri:vbri + 4] == b"VBRI":
+        frames = struct.unpack(">I", buf[vbri + 14:vbri + 18])[0]
+        info.duration = frames * frame["samples"] / sample_rate
+        return info
+
+    # Constant bitrate: audio bytes over bitrate
+    audio_bytes = size - (start + pos)
+    f.seek(max(size - 128, 0))
+    if f.read(3) == b"TAG":
+        audio_bytes -= 128
+    info.duration = audio_bytes * 8 / frame["bitrate"]
+    return info
+
+
+# ---------------------------------------------------------------------------
+# WAV
+# ---------------------------------------------------------------------------
+
+def _parse_wav(f, size: int) -> Optional[MediaInfo]:
+    riff = f.read(12)
+    if riff[:4] != b"RIFF" or riff[8:12] != b"WAVE":
+        return None
+
+    fmt = None
+    while True:
+        chunk = f.read(8)
+        if len(chunk) < 8:
+            return None
+        chunk_id, chunk_size = chunk[:4], struct.unpack("<I", chunk[4:])[0]
+        if chunk_id == b"fmt ":
+            fmt = struct.unpack("<HHIIHH", f.read(16))
+            f.seek(chunk_size - 16 + (chunk_size & 1), os.SEEK_CUR)
+        elif chunk_id == b"data":
+            if fmt is None or fmt[3] == 0:
+                return None
+            # Streamed WAVs leave the size at 0 / 0xFFFFFFFF: use what is on disk
+            available = size - f.tell()
+            data_size = chunk_size if 0 < chunk_size <= available else available
+            return MediaInfo(duration=data_size / fmt[3], format="wav", sample_rate=fmt[2],
+                             channels=fmt[1],
+                             audio_codec=f"pcm_{'f' if fmt[0] == 3 else 's'}{fmt[5]}le")
+        else:
+            f.seek(chunk_size + (chunk_size & 1), os.SEEK_CUR)
+
+
+# ---------------------------------------------------------------------------
+# MP4 / MOV / M4A
+# ---------------------------------------------------------------------------
+
+_MP4_CODECS = {
+    "avc1": "h264", "avc3": "h264", "hvc1": "hevc", "hev1": "hevc", "av01": "av1",
+    "vp09": "vp9", "mp4v": "mpeg4", "mp4a": "aac", "Opus": "opus", "ac-3": "ac3",
+    "ec-3": "eac3", "alac": "alac", ".mp3": "mp3", "fLaC": "flac",
+}
+
+
+def _boxes(data: bytes, start: int = 0, end: Optional[int] = None):
+    """Iterate (type, payload_start, payload_end) over the boxes in data[start:end]"""
+    end = len(data) if end is None else end
+    pos = start
+    while pos + 8 <= end:
+        box_size, box_type = struct.unpack(">I4s", data[pos:pos + 8])
+        header = 8
+        if box_size == 1:
+            box_size = struct.unpack(">Q", data[pos + 8:pos + 16])[0]
+            header = 16
+        elif box_size == 0:
+            box_size = end - pos
+        if box_size < header:
+            return
+        yield box_type.decode("latin-1"), pos + header, min(pos + box_size, end)
+        pos += box_size
+
+
+def _find_moov(f, size: int) -> Optional[bytes]:
+    """Read only the moov box (walking top-level box headers to find it)"""
+    pos = 0
+    while pos + 8 <= size:
+        f.seek(pos)
+        header = f.read(16)
+        box_size, box_type = struct.unpack(">I4s", header[:8])
+        header_len = 8
+        if box_size == 1:
+            box_size = struct.unpack(">Q", header[8:16])[0]
+            header_len = 16
+        elif box_size == 0:
+            box_size = size - pos
+        if box_size < header_len:
+            return None
+        if box_type == b"moov":
+            f.seek(pos + header_len)
+            return f.read(box_size - header_len)
+        pos += box_size
+    return None
+
+
+def _full_box_times(data: bytes, start: int):
+    """(timescale, duration) from an mvhd/mdhd payload"""
+    if data[start] == 1:
+        return struct.unpack(">IQ", data[start + 20:start + 32])
+    return struct.unpack(">II", data[start + 12:start + 20])
+
+
+def _parse_mp4(f, size: int) -> Optional[MediaInfo]:
+    head = f.read(12)
+    if head[4:8] not in (b"ftyp", b"moov", b"mdat", b"wide", b"free", b"skip"):
+        return None
+    f.seek(0)
+    moov = _find_moov(f, size)
+    if moov is None:
+        return None
+
+    info = MediaInfo(duration=0.0, format="mov" if head[8:12] == b"qt  " else "mp4")
+    for box, start, end in _boxes(moov):
+        if box == "mvhd":
+            timescale, duration = _full_box_times(moov, start)
+            info.duration = duration / timescale if timescale else 0.0
+        elif box == "trak":
+            _parse_trak(moov, start, end, info)
+    return info
+
+
+def _parse_trak(data: bytes, start: int, end: int, info: MediaInfo):
+    handler = codec = None
+    timescale = duration = samples = 0
+    stsd = None
+
+    stack = [(start, end)]
+    while stack:
+        s, e = stack.pop()
+        for box, bs, be in _boxes(data, s, e):
+            if box in ("mdia", "minf", "stbl"):
+                stack.append((bs, be))
+            elif box == "mdhd":
+                timescale, duration = _full_box_times(data, bs)
+            elif box == "hdlr" and handler is None:
+                # mdia's media handler; QuickTime adds a data handler under minf
+                handler = data[bs + 8:bs + 12].decode("latin-1")
+            elif box == "stsd":
+                stsd = bs
+            elif box == "stts":
+                count = struct.unpack(">I", data[bs + 4:bs + 8])[0]
+                entries = struct.unpack(f">{2 * count}I", data[bs + 8:bs + 8 + 8 * count])
+                samples = sum(entries[0::2])
+
+    if stsd is None:
+        return
+    entry = stsd + 8  # version/flags + entry_count
+    codec = data[entry + 4:entry + 8].decode("latin-1")
+    body = entry + 16  # size, type, reserved(6), data_reference_index
+
+    if handler == "vide" and info.video_codec is None:
+        info.video_codec = _MP4_CODECS.get(codec, codec)
+        info.width, info.height = struct.unpack(">HH", data[body + 16:body + 20])
+        if samples and duration and timescale:
+            info.fps = round(samples * timescale / duration, 3)
+    elif handler == "soun" and info.audio_codec is None:
+        info.audio_codec = _MP4_CODECS.get(codec, codec)
+        info.channels = struct.unpack(">H", data[body + 8:body + 10])[0]
+        info.sample_rate = struct.unpack(">I", data[body + 16:body + 20])[0] >> 16
+        if info.format == "mp4" and info.video_codec is None:
+            info.format = "m4a"
+
+    if not info.duration and duration and timescale:
+        info.duration = duration / timescale
+
+
+_PARSERS = {
+    ".mp3": _parse_mp3,
+    ".wav": _parse_wav,
+    ".mp4": _parse_mp4, ".m4a": _parse_mp4, ".mov": _parse_mp4, ".m4v": _parse_mp4,
+}
+
+
+def parse_header(path) -> Optional[MediaInfo]:
+    """In-process header parse; None when the format is not handled"""
+    parser = _PARSERS.get(Path(path).suffix.lower())
+    if parser is None:
+        return None
+    try:
+        with open(path, "rb") as f:
+            info = parser(f, os.fstat(f.fileno()).st_size)
+    except (OSError, struct.error, IndexError, ValueError, ZeroDivisionError):
+        return None
+    if info is not None and info.format == "mp4" and info.video_codec is None and info.audio_codec is None:
+        return None
+    return info
+
+
+# ---------------------------------------------------------------------------
+# External probe
+# ---------------------------------------------------------------------------
+
+def probe_external(path) -> MediaInfo:
+    """ffprobe (or ffmpeg -i) fallback for formats the header parser does not handle"""
+    ffprobe = shutil.which("ffprobe")
+    if ffprobe:
+        result = subprocess.run([ffprobe, "-v", "quiet", "-print_format", "json",
+                                 "-show_format", "-show_streams", str(path)],
+                                capture_output=True, text=True, timeout=30)
+        if result.returncode != 0:
+            raise RuntimeError(f"ffprobe failed for {path}")
+        data = json.loads(result.stdout)
+        info = MediaInfo(duration=float(data.get("format", {}).get("duration", 0.0)),
+                         format=data.get("format", {}).get("format_name", "").split(",")[0])
+        for stream in data.get("streams", []):
+            if stream.get("codec_type") == "audio" and info.audio_codec is None:
+                info.audio_codec = stream.get("codec_name")
+                info.sample_rate = int(stream.get("sample_rate", 0)) or None
+                info.channels = stream.get("channels")
+            elif stream.get("codec_type") == "video" and info.video_codec is None:
+                info.video_codec = stream.get("codec_name")
+                info.width, info.height = stream.get("width"), stream.get("height")
+                num, _, den = stream.get("avg_frame_rate", "0/1").partition("/")
+                info.fps = round(float(num) / float(den), 3) if float(den or 0) else None
+        return info
+
+    from local_renderer import ffmpeg_bin
+
+    stderr = subprocess.run([ffmpeg_bin(), "-hide_banner", "-i", str(path)],
+                            capture_output=True, text=True, timeout=30).stderr
+    match = re.search(r"Duration: (\d+):(\d+):(\d+(?:\.\d+)?)", stderr)
+    if not match:
+        raise RuntimeError(f"Could not probe {path}")
+    h, m, s = match.groups()
+    container = re.search(r"Input #0, ([^,\s]+)", stderr)
+    info = MediaInfo(duration=int(h) * 3600 + int(m) * 60 + float(s),
+                     format=container.group(1) if container else "")
+    audio = re.search(r"Audio: (\w+).*?(\d+) Hz, ([^,]+)", stderr)
+    if audio:
+        layout = audio.group(3).strip()
+        count = re.match(r"(\d+) channels", layout)
+        info.audio_codec = audio.group(1)
+        info.sample_rate = int(audio.group(2))
+        info.channels = {"mono": 1, "stereo": 2}.get(layout, int(count.group(1)) if count else None)
+    video = re.search(r"Video: (\w+).*?, (\d{2,5})x(\d{2,5})", stderr)
+    if video:
+        info.video_codec = video.group(1)
+        info.width, info.height = int(video.group(2)), int(video.group(3))
+        fps = re.search(r"([\d.]+) fps", stderr)
+        info.fps = float(fps.group(1)) if fps else None
+    return info
+
+
+# ---------------------------------------------------------------------------
+# Cached probe
+# ---------------------------------------------------------------------------
+
+class MediaProbe:
+    """Probe with a persistent (path, size, mtime)-keyed cache"""
+
+    def __init__(self, cache_file=None, enabled: bool = True):
+        self.cache_file = Path(cache_file) if cache_file else None
+        self.enabled = enabled and self.cache_file is not None
+        self.hits = 0
+        self.misses = 0
+        self._entries: Dict[str, Dict] = {}
+        if self.enabled and self.cache_file.exists():
+            try:
+                self._entries = json.loads(self.cache_file.read_text())
+            except (OSError, ValueError):
+                self._entries = {}
+
+    @staticmethod
+    def key(path) -> str:
+        st = os.stat(path)
+        return f"{os.path.abspath(path)}|{st.st_size}|{st.st_mtime_ns}"
+
+    def probe(self, path) -> MediaInfo:
+        """MediaInfo for path (header parse or ffprobe on a cache miss)"""
+        key = self.key(path)
+        entry = self._entries.get(key)
+        if entry is not None:
+            self.hits += 1
+            return MediaInfo(**entry)
+
+        info = self._probe_uncached(path)
+        self._remember(key, info)
+        self._save()
+        return info
+
+    def probe_many(self, paths: Iterable, workers: int = 8) -> Dict[str, MediaInfo]:
+        """Probe several files; cache misses are probed concurrently"""
+        results: Dict[str, MediaInfo] = {}
+        missing = []
+        for path in paths:
+            key = self.key(path)
+            entry = self._entries.get(key)
+            if entry is not None:
+                self.hits += 1
+                results[str(path)] = MediaInfo(**entry)
+            else:
+                missing.append((key, path))
+
+        if missing:
+            with ThreadPoolExecutor(max_workers=max(1, min(workers, len(missing)))) as pool:
+                probed = list(pool.map(lambda item: self._probe_uncached(item[1]), missing))
+            for (key, path), info in zip(missing, probed):
+                self._remember(key, info)
+                results[str(path)] = info
+            self._save()
+        return results
+
+    def duration(self, path) -> float:
+        return self.probe(path).duration
+
+    def _probe_uncached(self, path) -> MediaInfo:
+        self.misses += 1
+        return parse_header(path) or probe_external(path)
+
+    def _remember(self, key: str, info: MediaInfo):
+        self._entries[key] = asdict(info)
+        while len(self._entries) > MAX_CACHE_ENTRIES:
+            self._entries.pop(next(iter(self._entries)))
+
+    def _save(self):
+        if not self.enabled:
+            return
+        try:
+            self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(suffix='.json.tmp', dir=self.cache_file.parent)
+            with os.fdopen(fd, 'w') as f:
+                json.dump(self._entries, f)
+            os.replace(tmp, self.cache_file)
+        except OSError:
+            pass
+
+
+_default_probe: Optional[MediaProbe] = None
+
+
+def default_probe() -> MediaProbe:
+    """Process-wide MediaProbe configured from the environment"""
+    global _default_probe
+    if _default_probe is None:
+        cache_file = os.getenv("MEDIA_PROBE_CACHE", ".cache/media_probe.json")
+        _default_probe = MediaProbe(cache_file, enabled=cache_file != "0")
+    return _default_probe
+
+
+def probe(path) -> MediaInfo:
+    return default_probe().probe(path)
+
+
+def probe_duration(path) -> float:
+    """Duration in seconds (cached; never decodes)"""
+    return default_probe().duration(path)
@@ -6,7 +6,7 @@ Organizes, catalogs, and provides easy access to downloaded music tracks
 Features:
 - Smart indexing and metadata extraction
 - Platform-specific track selection (YouTube, TikTok, Instagram, etc.)
-- Usage tracking and statistics
+- Usage tracking and statistics (SQLite store, see music_library_store)
 - Favorite/rating system
 - Auto-mixing with platform-appropriate volumes
 - CLI interface for easy searching and recommendations
@@ -16,8 +16,8 @@ Date: 2025-12-22
 """
 
 import os
-import json
 import random
+import time
 import argparse
 from pathlib import Path
 from datetime import datetime
@@ -25,88 +25,95 @@ from typing import List, Dict, Optional, Tuple
 import hashlib
 
 try:
-    from mutagen.mp3 import MP3
-    from mutagen.id3 import ID3
+    import mutagen  # noqa: F401  (tags are read in music_library_scanner)
     MUTAGEN_AVAILABLE = True
 except ImportError:
     MUTAGEN_AVAILABLE = False
     print("[WARNING] mutagen not installed. Install with: pip install mutagen")
-    print("[INFO] Limited metadata extraction will be used")
+    print("[INFO] Limited metadata extraction will be used (file headers only)")
+
+# pydub passes the export format to ffmpeg as -f; suffixes whose muxer has
+# another name (anything else, e.g. mp3/wav/flac/ogg, is its own muxer)
+PYDUB_EXPORT_FORMATS = {"m4a": "ipod", "aac": "adts"}
 
 
 class MusicLibraryManager:
     """Comprehensive music library management system"""
 
     def __init__(self, music_dir="background_music", metadata_file="music_library_metadata.json"):
+        from music_library_store import MusicLibraryStore, default_db_path
+
         self.music_dir = Path(music_dir)
         self.metadata_file = Path(metadata_file)
-        self.metadata = self._load_metadata()
+        self.store = MusicLibraryStore(default_db_path(self.metadata_file))
+
+        # One-shot migration of an existing JSON library
+        imported = self.store.import_json(self.metadata_file)
+        if imported:
+            print(f"[IMPORTED] {imported[0]} tracks, {imported[1]} usage records and "
+                  f"{imported[2]} favorites from {self.metadata_file} into {self.store.db_path}")
 
         # Platform configurations for audio mixing
         self.platform_configs = {
             "youtube": {
                 "bg_music_volume_db": -25,  # dB reduction
+                "duck_gap_db": -14,  # level in narration gaps when ducking
                 "bg_music_volume_percent": 15,  # 15% of narration
+                "loudness_lufs": -14,  # EBU R128 integrated target
+                "true_peak_db": -1,  # true-peak ceiling (dBTP)
                 "optimal_bpm": (60, 90),
                 "preferred_moods": ["calm", "uplifting", "ambient", "motivational"],
                 "max_energy": "medium"
             },
             "tiktok": {
                 "bg_music_volume_db": -15,
+                "duck_gap_db": -8,
                 "bg_music_volume_percent": 30,
+                "loudness_lufs": -14,
+                "true_peak_db": -1,
                 "optimal_bpm": (100, 140),
                 "preferred_moods": ["energetic", "upbeat", "trendy", "dynamic"],
                 "max_energy": "high"
             },
             "instagram": {
                 "bg_music_volume_db": -18,
+                "duck_gap_db": -10,
                 "bg_music_volume_percent": 25,
+                "loudness_lufs": -14,
+                "true_peak_db": -1,
                 "optimal_bpm": (90, 120),
                 "preferred_moods": ["uplifting", "trendy", "upbeat", "motivational"],
                 "max_energy": "medium-high"
             },
             "podcast": {
                 "bg_music_volume_db": -30,
+                "duck_gap_db": -20,
                 "bg_music_volume_percent": 10,
+                "loudness_lufs": -16,
+                "true_peak_db": -1,
                 "optimal_bpm": (50, 70),
                 "preferred_moods": ["calm", "ambient", "background", "subtle"],
                 "max_energy": "low"
             },
             "shorts": {
                 "bg_music_volume_db": -20,
+                "duck_gap_db": -12,
                 "bg_music_volume_percent": 20,
+                "loudness_lufs": -14,
+                "true_peak_db": -1,
                 "optimal_bpm": (110, 130),
                 "preferred_moods": ["upbeat", "energetic", "dynamic"],
                 "max_energy": "medium-high"
             }
         }
 
-    def _load_metadata(self) -> Dict:
-        """Load metadata from JSON file"""
-        if self.metadata_file.exists():
-            try:
-                with open(self.metadata_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except Exception as e:
-                print(f"[WARNING] Could not load metadata: {e}")
-                return {"tracks": {}, "usage": {}, "favorites": [], "stats": {}}
-        return {"tracks": {}, "usage": {}, "favorites": [], "stats": {}}
-
-    def _save_metadata(self):
-        """Save metadata to JSON file"""
-        try:
-            with open(self.metadata_file, 'w', encoding='utf-8') as f:
-                json.dump(self.metadata, f, indent=2, ensure_ascii=False)
-        except Exception as e:
-            print(f"[ERROR] Could not save metadata: {e}")
-
     def _get_file_hash(self, file_path: Path) -> str:
         """Generate unique hash for file"""
         return hashlib.md5(str(file_path.absolute()).encode()).hexdigest()[:16]
 
     def _extract_metadata_from_filename(self, filename: str) -> Dict:
         """Extract metadata from Epidemic Sound filename format"""
-        # Format: ES_Title - Artist.mp3
+        # Format: ES_Title - Artist.mp3 (or another audio extension)
         metadata = {
             "title": filename,
             "artist": "Unknown",
@@ -114,8 +121,8 @@ class MusicLibraryManager:
         }
 
         if filename.startswith("ES_"):
-            # Remove ES_ prefix and .mp3 extension
-            name = filename[3:].replace('.mp3', '')
+            # Remove ES_ prefix and extension
+            name = os.path.splitext(filename[3:])[0]
 
             # Split by " - " to get title and artist
             if " - " in name:
@@ -133,29 +140,6 @@ class MusicLibraryManager:
 
         return metadata
 
-    def _extract_audio_metadata(self, file_path: Path) -> Dict:
-        """Extract audio metadata using mutagen if available"""
-        metadata = {
-            "duration": 0,
-            "bitrate": 0,
-            "sample_rate": 0,
-            "channels": 0
-        }
-
-        if not MUTAGEN_AVAILABLE:
-            return metadata
-
-        try:
-            audio = MP3(file_path)
-            metadata["duration"] = audio.info.length
-            metadata["bitrate"] = audio.info.bitrate
-            metadata["sample_rate"] = audio.info.sample_rate
-            metadata["channels"] = audio.info.channels
-        except Exception as e:
-            print(f"[WARNING] Could not extract audio metadata from {file_path.name}: {e}")
-
-        return metadata
-
     def _infer_mood_from_title(self, title: str) -> str:
         """Infer mood from track title using keyword matching"""
         title_lower = title.lower()
@@ -181,7 +165,8 @@ class MusicLibraryManager:
         return "neutral"
 
     def _infer_bpm_from_mood(self, mood: str) -> int:
-        """Estimate BPM based on mood"""
+        """Placeholder BPM for a mood (the middle of its typical range), until
+        the audio is analysed (music_features)"""
         bpm_ranges = {
             "calm": (50, 70),
             "ambient": (60, 75),
@@ -197,7 +182,7 @@ class MusicLibraryManager:
         }
 
         bpm_range = bpm_ranges.get(mood, (80, 100))
-        return random.randint(bpm_range[0], bpm_range[1])
+        return (bpm_range[0] + bpm_range[1]) // 2
 
     def _calculate_platform_score(self, track: Dict, platform: str) -> float:
         """Calculate suitability score for platform (0-100)"""
@@ -207,13 +192,26 @@ class MusicLibraryManager:
         config = self.platform_configs[platform]
         score = 50.0  # Start with neutral
 
-        # Check BPM match
+        # Check BPM match (half/double time is close: tempo can be felt either way)
         track_bpm = track.get("bpm", 80)
         optimal_bpm = config["optimal_bpm"]
         if optimal_bpm[0] <= track_bpm <= optimal_bpm[1]:
             score += 20  # Good BPM match
         elif abs(track_bpm - optimal_bpm[0]) < 15 or abs(track_bpm - optimal_bpm[1]) < 15:
             score += 10  # Close match
+        elif any(optimal_bpm[0] <= bpm <= optimal_bpm[1] for bpm in (track_bpm / 2, track_bpm * 2)):
+            score += 10
+
+        # Check measured energy against the platform's ceiling
+        energy = track.get("energy")
+        if energy is not None:
+            from music_features import ENERGY_LEVELS
+
+            ceiling = ENERGY_LEVELS.get(config["max_energy"], 1.0)
+            if energy <= ceiling:
+                score += 10
+            else:
+                score -= min((energy - ceiling) * 100, 20)
 
         # Check mood match
         track_mood = track.get("mood", "neutral")
@@ -231,45 +229,109 @@ class MusicLibraryManager:
 
         return max(0, min(100, score))
 
-    def scan_library(self, force_rescan=False):
-        """Scan music directory and build/update index"""
+    def scan_library(self, force_rescan=False, roots: Optional[List[str]] = None,
+                     fingerprint: Optional[bool] = None, analyze: Optional[bool] = None):
+        """
+        Scan music roots recursively and index new, edited and moved files
+
+        Files whose (size, mtime_ns, inode) match the index are skipped
+        without being opened; see music_library_scanner. Copies of a track
+        (same sampled content hash) collapse into it; with fingerprint (or
+        MUSIC_FINGERPRINT=1) so do re-encodes that sound the same. Tracks not
+        yet analysed get their tempo, key, loudness and energy measured from
+        the audio, unless analyze is False (or MUSIC_ANALYZE=0).
+        """
+        from music_library_scanner import (SCAN_BATCH, library_roots, read_audio_infos,
+                                           read_features, read_fingerprints,
+                                           sampled_content_hash, walk_audio_files)
+
+        if fingerprint is None:
+            fingerprint = os.getenv("MUSIC_FINGERPRINT", "0") == "1"
+        if analyze is None:
+            analyze = os.getenv("MUSIC_ANALYZE", "1") != "0"
+
         print("\n" + "="*70)
         print("SCANNING MUSIC LIBRARY")
         print("="*70)
 
-        if not self.music_dir.exists():
-            print(f"[ERROR] Music directory not found: {self.music_dir}")
+        start_time = time.perf_counter()
+        roots = [Path(root) for root in roots] if roots else library_roots(self.music_dir)
+        for root in roots:
+            if not root.exists():
+                print(f"[ERROR] Music directory not found: {root}")
+        roots = [root for root in roots if root.exists()]
+        if not roots:
             return
 
-        # Find all MP3 files
-        mp3_files = list(self.music_dir.glob("*.mp3"))
-        print(f"\n[FOUND] {len(mp3_files)} MP3 files in {self.music_dir}")
-
-        new_tracks = 0
-        updated_tracks = 0
-
-        for mp3_file in mp3_files:
-            file_hash = self._get_file_hash(mp3_file)
-
-            # Check if already indexed
-            if file_hash in self.metadata["tracks"] and not force_rescan:
+        files = list(walk_audio_files(roots))
+        print(f"\n[FOUND] {len(files)} audio files in {', '.join(str(r) for r in roots)}")
+
+        known = self.store.file_states()
+        inodes = {path: inode for path, _, _, inode in files}
+        taken = {state[0] for state in known.values()}
+
+        # Indexed files no longer at their path (gone, or replaced by another
+        # inode), by identity: a new path with the same identity is a move
+        vanished = {(inode, size, mtime_ns): track_hash
+                    for path, (track_hash, size, mtime_ns, inode) in known.items()
+                    if inode and inodes.get(path) != inode}
+
+        moved = []
+        for path, size, mtime_ns, inode in files:
+            track_hash = vanished.get((inode, size, mtime_ns))
+            if track_hash is not None and known.get(path, (None,))[0] != track_hash:
+                moved.append((path, size, mtime_ns, inode, vanished.pop((inode, size, mtime_ns))))
+        moved_paths = {entry[0] for entry in moved}
+        moved_hashes = {entry[4] for entry in moved}
+
+        to_read = []
+        for path, size, mtime_ns, inode in files:
+            if path in moved_paths:
                 continue
-
-            print(f"\n[INDEXING] {mp3_file.name}")
+            state = known.get(path)
+            if state is not None and state[0] not in moved_hashes:
+                if force_rescan or state[1:] != (size, mtime_ns, inode):
+                    to_read.append((path, size, mtime_ns, inode, state[0]))
+                continue
+            file_hash = self._get_file_hash(Path(path))
+            if file_hash in taken and (state is None or state[0] == file_hash):
+                # The id derived from this path belongs to a track that moved away
+                file_hash = hashlib.md5(f"{path}|{inode}|{mtime_ns}".encode()).hexdigest()[:16]
+            taken.add(file_hash)
+            to_read.append((path, size, mtime_ns, inode, None, file_hash))
+
+        new_tracks = updated_tracks = 0
+        batch = []
+
+        # Moves keep the track (usage, rating, mood, BPM); only names and paths change
+        moves = []
+        for path, size, mtime_ns, inode, track_hash in moved:
+            filename = os.path.basename(path)
+            fields = self._extract_metadata_from_filename(filename)
+            fields.update(file_path=path, filename=filename, file_size=size,
+                          mtime_ns=mtime_ns, inode=inode)
+            moves.append((track_hash, fields))
+            print(f"\n[MOVED] {fields['title']} -> {path}")
+        self.store.move_tracks(moves)
+
+        stats = {entry[0]: entry[1:] for entry in to_read}
+        for path, audio_meta in read_audio_infos([entry[0] for entry in to_read]):
+            size, mtime_ns, inode, existing_hash, *new_hash = stats[path]
+            filename = os.path.basename(path)
+            print(f"\n[INDEXING] {filename}")
 
             # Extract metadata
-            filename_meta = self._extract_metadata_from_filename(mp3_file.name)
-            audio_meta = self._extract_audio_metadata(mp3_file)
+            filename_meta = self._extract_metadata_from_filename(filename)
 
-            # Infer mood and BPM
+            # Infer mood, and a BPM until the audio is analysed
             mood = self._infer_mood_from_title(filename_meta["title"])
             bpm = self._infer_bpm_from_mood(mood)
 
             # Build track metadata
             track_data = {
-                "file_path": str(mp3_file.absolute()),
-                "filename": mp3_file.name,
-                "file_hash": file_hash,
+                "file_path": path,
+                "filename": filename,
+                "file_hash": existing_hash or new_hash[0],
                 "title": filename_meta["title"],
                 "artist": filename_meta["artist"],
                 "source": filename_meta["source"],
@@ -279,7 +341,11 @@ class MusicLibraryManager:
                 "bitrate": audio_meta["bitrate"],
                 "sample_rate": audio_meta["sample_rate"],
                 "channels": audio_meta["channels"],
-                "file_size_mb": mp3_file.stat().st_size / (1024 * 1024),
+                "file_size_mb": size / (1024 * 1024),
+                "file_size": size,
+                "mtime_ns": mtime_ns,
+                "inode": inode,
+                "content_hash": audio_meta["content_hash"],
                 "indexed_date": datetime.now().isoformat(),
                 "usage_count": 0,
                 "rating": 0,
@@ -288,12 +354,12 @@ class MusicLibraryManager:
                 "notes": ""
             }
 
-            if file_hash in self.metadata["tracks"]:
+            if existing_hash:
                 updated_tracks += 1
             else:
                 new_tracks += 1
 
-            self.metadata["tracks"][file_hash] = track_data
+            batch.append(track_data)
 
             print(f"  Title: {track_data['title']}")
             print(f"  Artist: {track_data['artist']}")
@@ -301,35 +367,91 @@ class MusicLibraryManager:
             print(f"  BPM: {track_data['bpm']}")
             print(f"  Duration: {track_data['duration']:.1f}s")
 
-        # Save metadata
-        self._save_metadata()
+            # Rescans keep usage, rating and favorites
+            if len(batch) >= SCAN_BATCH:
+                self.store.upsert_tracks(batch)
+                batch = []
+
+        if batch:
+            self.store.upsert_tracks(batch)
+
+        # Tracks indexed before content hashing was added
+        missing = self.store.missing_content_hashes()
+        if missing:
+            hashes = []
+            for track_hash, path in missing:
+                try:
+                    hashes.append((track_hash, sampled_content_hash(path)))
+                except OSError:
+                    continue
+            self.store.set_content_hashes(hashes)
+
+        # Byte-identical copies first, then (optionally) re-encodes
+        collapsed = self.store.collapse_duplicates()
+        if fingerprint:
+            from audio_fingerprint import duplicate_groups
+
+            pending = self.store.missing_fingerprints()
+            if pending:
+                print(f"\n[FINGERPRINT] {len(pending)} tracks")
+                hashes = {path: track_hash for track_hash, path in pending}
+                fingerprints = []
+                try:
+                    for path, fp in read_fingerprints(list(hashes)):
+                        if fp is not None:  # unreadable: retried next scan
+                            fingerprints.append((hashes[path], fp))
+                except RuntimeError as e:
+                    print(f"[ERROR] Fingerprinting stopped: {e}")
+                self.store.set_fingerprints(fingerprints)
+            collapsed += self.store.merge_tracks(
+                (duplicate, group[0])
+                for group in duplicate_groups(self.store.fingerprints())
+                for duplicate in group[1:]
+            )
+
+        # Tempo, key, loudness and energy from the audio (cached per content)
+        analyzed = 0
+        if analyze:
+            from music_features import FEATURES_VERSION, energy_level
+
+            pending = self.store.missing_features(FEATURES_VERSION)
+            if pending:
+                print(f"\n[ANALYZING] {len(pending)} tracks (tempo, key, loudness, energy)")
+                hashes = {path: track_hash for track_hash, path in pending}
+                batch = []
+                try:
+                    for path, features in read_features(list(hashes)):
+                        if features is None:
+                            continue  # unreadable: retried next scan
+                        batch.append((hashes[path], features))
+                        if features:
+                            analyzed += 1
+                            print(f"  {os.path.basename(path)}: {features['bpm']:.0f} BPM, {features['key']}, "
+                                  f"{features['loudness_lufs']} LUFS, energy {features['energy']:.2f} "
+                                  f"({energy_level(features['energy'])})")
+                        if len(batch) >= SCAN_BATCH:
+                            self.store.set_features(batch, FEATURES_VERSION)
+                            batch = []
+                except RuntimeError as e:
+                    print(f"[ERROR] Analysis stopped: {e}")
+                self.store.set_features(batch, FEATURES_VERSION)
 
         print("\n" + "="*70)
-        print(f"[COMPLETE] Scan complete!")
+        print(f"[COMPLETE] Scan complete! ({time.perf_counter() - start_time:.2f}s)")
         print(f"  New tracks: {new_tracks}")
         print(f"  Updated tracks: {updated_tracks}")
-        print(f"  Total indexed: {len(self.metadata['tracks'])}")
+        print(f"  Moved tracks: {len(moved)}")
+        print(f"  Unchanged: {len(files) - len(to_read) - len(moved)}")
+        print(f"  Duplicates collapsed: {collapsed}")
+        print(f"  Analysed: {analyzed} tracks")
+        print(f"  Total indexed: {self.store.track_count()} tracks "
+              f"(+{self.store.duplicate_count()} duplicate files)")
         print("="*70)
 
     def search_tracks(self, query: str, limit: int = 10) -> List[Dict]:
-        """Search tracks by query string"""
-        query_lower = query.lower()
-        results = []
-
-        for track_hash, track in self.metadata["tracks"].items():
-            # Search in title, artist, mood, tags
-            searchable = f"{track['title']} {track['artist']} {track['mood']} {' '.join(track.get('tags', []))}".lower()
-
-            if query_lower in searchable:
-                results.append(track)
-
-        # Sort by relevance (title matches first, then usage count)
-        results.sort(key=lambda x: (
-            query_lower in x['title'].lower(),
-            -x['usage_count']
-        ), reverse=True)
-
-        return results[:limit]
+        """Search tracks by query string (title, artist, mood, tags)"""
+        # Words and word prefixes, BM25-ranked with title > artist > mood/tags
+        return self.store.search(query, limit)
 
     def get_music_for_platform(self, platform: str, duration: Optional[int] = None,
                                mood: Optional[str] = None) -> Optional[Dict]:
@@ -338,18 +460,9 @@ class MusicLibraryManager:
             print(f"[WARNING] Unknown platform: {platform}. Using default.")
             platform = "youtube"
 
-        # Filter tracks
+        # Filter tracks (duration within 30 seconds, mood) in the store
         candidates = []
-        for track_hash, track in self.metadata["tracks"].items():
-            # Filter by duration if specified
-            if duration and track["duration"] > 0:
-                if abs(track["duration"] - duration) > 30:  # Within 30 seconds
-                    continue
-
-            # Filter by mood if specified
-            if mood and track["mood"] != mood:
-                continue
-
+        for track in self.store.find_tracks(mood=mood, duration=duration, duration_tolerance=30):
             # Calculate platform score
             score = self._calculate_platform_score(track, platform)
             candidates.append((score, track))
@@ -368,21 +481,13 @@ class MusicLibraryManager:
         filters = filters or {}
 
         # Filter tracks
-        candidates = []
-        for track_hash, track in self.metadata["tracks"].items():
-            # Apply filters
-            if "mood" in filters and track["mood"] != filters["mood"]:
-                continue
-            if "min_bpm" in filters and track["bpm"] < filters["min_bpm"]:
-                continue
-            if "max_bpm" in filters and track["bpm"] > filters["max_bpm"]:
-                continue
-            if "artist" in filters and track["artist"] != filters["artist"]:
-                continue
-            if "favorites_only" in filters and filters["favorites_only"] and not track["is_favorite"]:
-                continue
-
-            candidates.append(track)
+        candidates = self.store.find_tracks(
+            mood=filters.get("mood"),
+            min_bpm=filters.get("min_bpm"),
+            max_bpm=filters.get("max_bpm"),
+            artist=filters.get("artist"),
+            favorites_only=bool(filters.get("favorites_only"))
+        )
 
         if not candidates:
             return None
@@ -395,15 +500,9 @@ class MusicLibraryManager:
 
         # Get all suitable tracks
         all_tracks = []
-        for track_hash, track in self.metadata["tracks"].items():
-            # Apply filters
-            if "mood" in filters and track["mood"] != filters["mood"]:
-                continue
-            if "min_bpm" in filters and track["bpm"] < filters["min_bpm"]:
-                continue
-            if "max_bpm" in filters and track["bpm"] > filters["max_bpm"]:
-                continue
-
+        for track in self.store.find_tracks(mood=filters.get("mood"),
+                                            min_bpm=filters.get("min_bpm"),
+                                            max_bpm=filters.get("max_bpm")):
             # Calculate platform score
             score = self._calculate_platform_score(track, platform)
             all_tracks.append((score, track))
@@ -436,123 +535,35 @@ class MusicLibraryManager:
 
     def track_usage(self, track_hash: str, video_title: str, platform: str):
         """Record track usage in a video"""
-        if track_hash not in self.metadata["tracks"]:
+        # Usage count and usage row in one transaction
+        if not self.store.record_usage(track_hash, video_title, platform):
             print(f"[WARNING] Track hash not found: {track_hash}")
-            return
-
-        # Update usage count
-        self.metadata["tracks"][track_hash]["usage_count"] += 1
-
-        # Record usage details
-        usage_key = f"{track_hash}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-        self.metadata["usage"][usage_key] = {
-            "track_hash": track_hash,
-            "track_title": self.metadata["tracks"][track_hash]["title"],
-            "video_title": video_title,
-            "platform": platform,
-            "date": datetime.now().isoformat()
-        }
-
-        self._save_metadata()
 
     def set_rating(self, track_hash: str, rating: int):
         """Set track rating (0-5 stars)"""
-        if track_hash not in self.metadata["tracks"]:
-            print(f"[WARNING] Track hash not found: {track_hash}")
-            return
-
         rating = max(0, min(5, rating))
-        self.metadata["tracks"][track_hash]["rating"] = rating
-        self._save_metadata()
+        if not self.store.set_rating(track_hash, rating):
+            print(f"[WARNING] Track hash not found: {track_hash}")
 
     def toggle_favorite(self, track_hash: str):
         """Toggle favorite status"""
-        if track_hash not in self.metadata["tracks"]:
+        if self.store.get_track(track_hash) is None:
             print(f"[WARNING] Track hash not found: {track_hash}")
             return
 
-        current = self.metadata["tracks"][track_hash].get("is_favorite", False)
-        self.metadata["tracks"][track_hash]["is_favorite"] = not current
-
-        # Update favorites list
-        if not current:
-            if track_hash not in self.metadata["favorites"]:
-                self.metadata["favorites"].append(track_hash)
-        else:
-            if track_hash in self.metadata["favorites"]:
-                self.metadata["favorites"].remove(track_hash)
-
-        self._save_metadata()
+        is_favorite = self.store.toggle_favorite(track_hash)
 
-        status = "added to" if not current else "removed from"
+        status = "added to" if is_favorite else "removed from"
         print(f"[UPDATED] Track {status} favorites")
 
     def get_library_stats(self) -> Dict:
         """Generate comprehensive library statistics"""
-        stats = {
-            "total_tracks": len(self.metadata["tracks"]),
-            "total_duration_hours": 0,
-            "total_size_mb": 0,
-            "moods": {},
-            "bpm_distribution": {"0-60": 0, "60-80": 0, "80-100": 0, "100-120": 0, "120+": 0},
-            "artists": {},
-            "sources": {},
-            "favorites": len(self.metadata["favorites"]),
-            "total_usage": len(self.metadata["usage"]),
-            "most_used": [],
-            "least_used": [],
-            "platform_breakdown": {}
-        }
-
-        # Process all tracks
-        for track_hash, track in self.metadata["tracks"].items():
-            # Duration
-            stats["total_duration_hours"] += track.get("duration", 0) / 3600
-
-            # Size
-            stats["total_size_mb"] += track.get("file_size_mb", 0)
-
-            # Moods
-            mood = track.get("mood", "unknown")
-            stats["moods"][mood] = stats["moods"].get(mood, 0) + 1
-
-            # BPM
-            bpm = track.get("bpm", 0)
-            if bpm < 60:
-                stats["bpm_distribution"]["0-60"] += 1
-            elif bpm < 80:
-                stats["bpm_distribution"]["60-80"] += 1
-            elif bpm < 100:
-                stats["bpm_distribution"]["80-100"] += 1
-            elif bpm < 120:
-                stats["bpm_distribution"]["100-120"] += 1
-            else:
-                stats["bpm_distribution"]["120+"] += 1
-
-            # Artists
-            artist = track.get("artist", "Unknown")
-            stats["artists"][artist] = stats["artists"].get(artist, 0) + 1
-
-            # Sources
-            source = track.get("source", "unknown")
-            stats["sources"][source] = stats["sources"].get(source, 0) + 1
-
-        # Most/least used
-        tracks_by_usage = sorted(
-            [(track["usage_count"], track["title"], track_hash)
-             for track_hash, track in self.metadata["tracks"].items()],
-            key=lambda x: x[0],
-            reverse=True
-        )
-
-        stats["most_used"] = tracks_by_usage[:5]
-        stats["least_used"] = [t for t in tracks_by_usage if t[0] == 0][:5]
-
-        # Platform breakdown
-        for usage_key, usage in self.metadata["usage"].items():
-            platform = usage.get("platform", "unknown")
-            stats["platform_breakdown"][platform] = stats["platform_breakdown"].get(platform, 0) + 1
-
+        # Aggregated in SQL: totals, mood/BPM/artist/source counts, most/least used
+        stats = self.store.summary()
+        stats["favorites"] = self.store.favorite_count()
+        stats["duplicate_files"] = self.store.duplicate_count()
+        stats["total_usage"] = self.store.usage_total()
+        stats["platform_breakdown"] = self.store.platform_breakdown()
         return stats
 
     def print_stats(self):
@@ -567,6 +578,7 @@ class MusicLibraryManager:
         print(f"  Total Tracks: {stats['total_tracks']}")
         print(f"  Total Duration: {stats['total_duration_hours']:.1f} hours")
         print(f"  Total Size: {stats['total_size_mb']:.1f} MB")
+        print(f"  Duplicate Files: {stats['duplicate_files']}")
         print(f"  Favorites: {stats['favorites']}")
         print(f"  Total Usage: {stats['total_usage']} times")
 
@@ -606,14 +618,10 @@ class MusicLibraryManager:
         """
         Prepare audio for video with platform-specific mixing
         Returns path to mixed audio file
-        """
-        try:
-            from pydub import AudioSegment
-        except ImportError:
-            print("[ERROR] pydub not installed. Install with: pip install pydub")
-            print("[INFO] Returning original narration path")
-            return narration_path
 
+        A .wav output_path keeps the mix as float PCM, so the video mux is
+        its only lossy encode; other extensions are encoded at 192k.
+        """
         if platform not in self.platform_configs:
             print(f"[WARNING] Unknown platform: {platform}. Using YouTube defaults.")
             platform = "youtube"
@@ -625,6 +633,84 @@ class MusicLibraryManager:
         print(f"  Narration: {Path(narration_path).name}")
         print(f"  Volume Reduction: {config['bg_music_volume_db']} dB")
 
+        # Block-streaming mixer (constant memory); MUSIC_MIXER=pydub forces the legacy path
+        if os.getenv("MUSIC_MIXER", "stream") == "stream":
+            try:
+                from audio_mixer import ducking_enabled, stream_mix
+
+                # Duck: bg_music_volume_db under speech, duck_gap_db between phrases
+                gap_gain_db = config.get('duck_gap_db') if ducking_enabled() else None
+                stats = stream_mix(track_path, narration_path, output_path,
+                                   music_gain_db=config['bg_music_volume_db'], bitrate="192k",
+                                   gap_gain_db=gap_gain_db)
+                print(f"[SUCCESS] Mixed audio saved: {output_path} "
+                      f"({stats['realtime_factor']:.0f}x realtime)")
+                return output_path
+            except Exception as e:
+                print(f"[WARNING] Streaming mixer failed ({e}), falling back to pydub")
+
+        return self._mix_with_pydub(track_path, narration_path, config, output_path)
+
+    def prepare_audio_for_platforms(self, track_path: str, narration_path: str,
+                                    platforms: Optional[List[str]] = None,
+                                    output_dir: Optional[str] = None,
+                                    extension: str = ".wav") -> Dict[str, str]:
+        """
+        Mix the same narration and track for several platforms at once
+
+        Narration and music are decoded once and every platform's mix
+        (music level, ducking, loudness target) comes out of the same
+        vectorized pass; see audio_mixer.stream_mix_platforms.
+        Returns {platform: output path}.
+        """
+        platforms = platforms or list(self.platform_configs)
+        out_dir = Path(output_dir) if output_dir else Path(narration_path).parent
+        out_dir.mkdir(parents=True, exist_ok=True)
+
+        outputs = {platform: str(out_dir / f"{Path(narration_path).stem}_{platform}{extension}")
+                   for platform in platforms}
+
+        print(f"\n[MIXING] Preparing audio for {len(platforms)} platform(s) in one pass")
+        print(f"  Background Music: {Path(track_path).name}")
+        print(f"  Narration: {Path(narration_path).name}")
+
+        try:
+            from audio_mixer import ducking_enabled, stream_mix_platforms
+
+            mixes = {}
+            for platform in platforms:
+                config = self.platform_configs[platform]
+                mixes[platform] = {
+                    "output_path": outputs[platform],
+                    "music_gain_db": config['bg_music_volume_db'],
+                    "gap_gain_db": config.get('duck_gap_db') if ducking_enabled() else None,
+                    "target_lufs": config['loudness_lufs'],
+                    "true_peak_db": config['true_peak_db'],
+                }
+            stats = stream_mix_platforms(track_path, narration_path, mixes)
+        except Exception as e:
+            print(f"[WARNING] Batch mix failed ({e}), mixing platforms one by one")
+            return {platform: self.prepare_audio_for_video(track_path, narration_path, platform,
+                                                           outputs[platform])
+                    for platform in platforms}
+
+        for platform, result in stats['mixes'].items():
+            print(f"  [OK] {platform}: {result['integrated_lufs']:.1f} LUFS "
+                  f"({result['loudness_gain_db']:+.1f} dB) -> {Path(result['output']).name}")
+        print(f"[SUCCESS] {len(platforms)} mixes in {stats['elapsed_seconds']:.1f}s "
+              f"({stats['realtime_factor']:.0f}x realtime)")
+        return outputs
+
+    def _mix_with_pydub(self, track_path: str, narration_path: str, config: Dict,
+                        output_path: str) -> str:
+        """Legacy in-memory mix: loop, attenuate and overlay with pydub"""
+        try:
+            from pydub import AudioSegment
+        except ImportError:
+            print("[ERROR] pydub not installed. Install with: pip install pydub")
+            print("[INFO] Returning original narration path")
+            return narration_path
+
         try:
             # Load audio files
             music = AudioSegment.from_mp3(track_path)
@@ -648,7 +734,8 @@ class MusicLibraryManager:
             mixed = music.overlay(narration)
 
             # Export
-            mixed.export(output_path, format="mp3", bitrate="192k")
+            suffix = Path(output_path).suffix.lstrip('.').lower() or "mp3"
+            mixed.export(output_path, format=PYDUB_EXPORT_FORMATS.get(suffix, suffix), bitrate="192k")
 
             print(f"[SUCCESS] Mixed audio saved: {output_path}")
             return output_path
@@ -657,6 +744,39 @@ class MusicLibraryManager:
             print(f"[ERROR] Audio mixing failed: {e}")
             return narration_path
 
+    def normalize_for_platforms(self, audio_path: str, platforms: Optional[List[str]] = None,
+                                output_dir: Optional[str] = None) -> Dict[str, str]:
+        """
+        Export audio_path at each platform's loudness target
+
+        The LUFS/true-peak measurement is cached by content hash, so each
+        export (and every re-run) costs a single encode.
+        Returns {platform: output path}.
+        """
+        from loudness import LoudnessCache, normalize_loudness
+
+        platforms = platforms or list(self.platform_configs)
+        out_dir = Path(output_dir) if output_dir else Path(audio_path).parent
+        cache = LoudnessCache()
+        outputs = {}
+
+        print(f"\n[LOUDNESS] Normalizing {Path(audio_path).name} for {len(platforms)} platform(s)")
+        for platform in platforms:
+            config = self.platform_configs[platform]
+            output_path = out_dir / f"{Path(audio_path).stem}_{platform}{Path(audio_path).suffix}"
+            try:
+                result = normalize_loudness(audio_path, output_path, config['loudness_lufs'],
+                                            config['true_peak_db'], cache=cache)
+                print(f"  [OK] {platform}: {result['measured']['integrated_lufs']:.1f} -> "
+                      f"{result['predicted_lufs']:.1f} LUFS ({result['gain_db']:+.1f} dB, "
+                      f"{result['elapsed_seconds']:.1f}s)")
+                outputs[platform] = str(output_path)
+            except Exception as e:
+                print(f"  [ERROR] {platform}: {e}")
+
+        print(f"  Measurements: {cache.hits} cached, {cache.misses} analysed")
+        return outputs
+
     def recommend_track(self, platform: str, duration: Optional[int] = None,
                        mood: Optional[str] = None, show_alternatives: bool = True) -> Optional[Dict]:
         """Get recommendation with explanation"""
@@ -677,6 +797,12 @@ class MusicLibraryManager:
         print(f"  Artist: {track['artist']}")
         print(f"  Mood: {track['mood']}")
         print(f"  BPM: {track['bpm']}")
+        if track.get("musical_key"):
+            print(f"  Key: {track['musical_key']}")
+        if track.get("energy") is not None:
+            from music_features import energy_level
+
+            print(f"  Energy: {track['energy']:.2f} ({energy_level(track['energy'])})")
         print(f"  Duration: {track['duration']:.1f}s")
         print(f"  Usage: {track['usage_count']} times")
         stars_filled = '*' * track['rating']
@@ -723,6 +849,9 @@ Examples:
 
   # Get rotation of 5 tracks for YouTube series
   python music_library_manager.py --rotation youtube --count 5
+
+  # Loudness-normalized exports (measured once, cached)
+  python music_library_manager.py --normalize output/mixed.mp3 --platforms youtube podcast
         """
     )
 
@@ -731,10 +860,19 @@ Examples:
     parser.add_argument('--metadata-file', default='music_library_metadata.json',
                        help='Metadata file path (default: music_library_metadata.json)')
 
+    parser.add_argument('--import-json', type=str, metavar='FILE',
+                       help='Import a metadata JSON into the SQLite library (again)')
+
     parser.add_argument('--scan', action='store_true',
                        help='Scan library and build/update index')
     parser.add_argument('--force-rescan', action='store_true',
                        help='Force rescan all tracks (updates metadata)')
+    parser.add_argument('--fingerprint', action='store_true',
+                       help='Also collapse re-encoded duplicates by audio fingerprint when scanning')
+    parser.add_argument('--no-analysis', action='store_true',
+                       help='Skip tempo/key/loudness/energy analysis when scanning')
+    parser.add_argument('--roots', type=str, nargs='+',
+                       help='Directories to scan recursively (default: --music-dir and MUSIC_LIBRARY_ROOTS)')
 
     parser.add_argument('--stats', action='store_true',
                        help='Show library statistics')
@@ -757,6 +895,14 @@ Examples:
     parser.add_argument('--list-platforms', action='store_true',
                        help='List all supported platforms and their configurations')
 
+    parser.add_argument('--normalize', type=str,
+                       help='Export an audio/video file at each platform loudness target')
+    parser.add_argument('--mix', type=str, nargs=2, metavar=('NARRATION', 'TRACK'),
+                       help='Mix narration with a track for each platform in one pass')
+    parser.add_argument('--platforms', type=str, nargs='+',
+                       choices=['youtube', 'tiktok', 'instagram', 'podcast', 'shorts'],
+                       help='Platforms for --normalize / --mix (default: all)')
+
     args = parser.parse_args()
 
     # Initialize manager
@@ -766,8 +912,18 @@ Examples:
     )
 
     # Execute commands
+    if args.import_json:
+        imported = manager.store.import_json(args.import_json, force=True)
+        if imported:
+            print(f"[IMPORTED] {imported[0]} tracks, {imported[1]} usage records and "
+                  f"{imported[2]} favorites from {args.import_json}")
+        else:
+            print(f"[ERROR] Metadata file not found: {args.import_json}")
+
     if args.scan or args.force_rescan:
-        manager.scan_library(force_rescan=args.force_rescan)
+        manager.scan_library(force_rescan=args.force_rescan, roots=args.roots,
+                             fingerprint=args.fingerprint or None,
+                             analyze=False if args.no_analysis else None)
 
     if args.stats:
         manager.print_stats()
@@ -797,6 +953,12 @@ Examples:
             print(f"   Mood: {track['mood']} | BPM: {track['bpm']} | Score: {score:.1f}")
             print(f"   File: {track['filename']}")
 
+    if args.normalize:
+        manager.normalize_for_platforms(args.normalize, args.platforms)
+
+    if args.mix:
+        manager.prepare_audio_for_platforms(args.mix[1], args.mix[0], args.platforms)
+
     if args.list_platforms:
         print("\n" + "="*70)
         print("SUPPORTED PLATFORMS")
@@ -804,6 +966,7 @@ Examples:
         for platform, config in manager.platform_configs.items():
             print(f"\n{platform.upper()}")
             print(f"  Background Music Volume: {config['bg_music_volume_percent']}% ({config['bg_music_volume_db']} dB)")
+            print(f"  Loudness Target: {config['loudness_lufs']} LUFS, {config['true_peak_db']} dBTP")
             print(f"  Optimal BPM: {config['optimal_bpm'][0]}-{config['optimal_bpm'][1]}")
             print(f"  Preferred Moods: {', '.join(config['preferred_moods'])}")
             print(f"  Energy Level: {config['max_energy']}")
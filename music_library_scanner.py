@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Incremental music library scanner
+
+scan_library used to glob *.mp3 in one directory, read tags one file at a
+time and skip files by an MD5 of their path, so a renamed file came back as
+a new track and an edited one was never re-read. This module supplies the
+pieces MusicLibraryManager.scan_library now uses:
+
+- walk_audio_files walks any number of roots recursively with os.scandir
+  and yields (path, size, mtime_ns, inode): one stat per file
+- The manager compares that triple with what the store recorded: unchanged
+  files cost a dict lookup, edited files are re-read, and a new path whose
+  (inode, size, mtime_ns) matches a track whose file has gone is a move
+  (the track keeps its id, usage, rating and favorites)
+- read_audio_infos reads tags/headers of new and edited files in a process
+  pool (mutagen when installed, else media_probe's header parsers), plus
+  sampled_content_hash: the file size and three 64 KB chunks, enough to
+  tell byte-identical copies (the "(1)" re-downloads) from other tracks
+- read_fingerprints runs audio_fingerprint over the same pool, for
+  re-encoded duplicates
+- read_features runs music_features (tempo, key, loudness, energy) over the
+  pool too, cached per sampled content hash
+
+Environment:
+    MUSIC_LIBRARY_ROOTS  Extra roots to scan (os.pathsep separated)
+    MUSIC_SCAN_WORKERS   Worker processes (default: CPU count)
+"""
+
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+AUDIO_EXTENSIONS = (".mp3", ".wav", ".m4a", ".flac")
+
+# Below this many files the pool's start-up costs more than it saves
+MIN_POOL_FILES = 16
+
+# Tracks written per store transaction
+SCAN_BATCH = 500
+
+# Bytes hashed from the start, middle and end of a file
+HASH_CHUNK = 64 * 1024
+
+
+def library_roots(music_dir) -> List[Path]:
+    """music_dir plus MUSIC_LIBRARY_ROOTS"""
+    extra = [Path(p) for p in os.getenv("MUSIC_LIBRARY_ROOTS", "").split(os.pathsep) if p]
+    return [Path(music_dir)] + extra
+
+
+def walk_audio_files(roots: Iterable, extensions: Sequence[str] = AUDIO_EXTENSIONS
+                     ) -> Iterator[Tuple[str, int, int, int]]:
+    """(absolute path, size, mtime_ns, inode) of every audio file under roots"""
+    extensions = tuple(ext.lower() for ext in extensions)
+    stack = [os.path.abspath(root) for root in roots]
+    seen = set()
+    while stack:
+        top = stack.pop()
+        if top in seen:
+            continue
+        seen.add(top)
+        try:
+            with os.scandir(top) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif entry.name.lower().endswith(extensions) and entry.is_file():
+                            st = entry.stat()
+                            yield entry.path, st.st_size, st.st_mtime_ns, entry.inode()
+                    except OSError:
+                        continue
+        except OSError:
+            continue
+
+
+def sampled_content_hash(path: str) -> str:
+    """Hash of the file size plus its first, middle and last HASH_CHUNK bytes"""
+    size = os.path.getsize(path)
+    h = hashlib.blake2b(str(size).encode(), digest_size=16)
+    with open(path, "rb") as f:
+        if size <= 3 * HASH_CHUNK:
+            h.update(f.read())
+        else:
+            for offset in (0, (size - HASH_CHUNK) // 2, size - HASH_CHUNK):
+                f.seek(offset)
+                h.update(f.read(HASH_CHUNK))
+    return h.hexdigest()
+
+
+def read_audio_info(path: str) -> Dict:
+    """Duration, bitrate, sample rate, channels (from the file's tags/header)
+    and sampled content hash"""
+    info = {"duration": 0, "bitrate": 0, "sample_rate": 0, "channels": 0,
+            "content_hash": sampled_content_hash(path)}
+
+    try:
+        from mutagen import File as MutagenFile
+
+        audio = MutagenFile(path)
+        if audio is not None and audio.info is not None:
+            info["duration"] = getattr(audio.info, "length", 0) or 0
+            info["bitrate"] = getattr(audio.info, "bitrate", 0) or 0
+            info["sample_rate"] = getattr(audio.info, "sample_rate", 0) or 0
+            info["channels"] = getattr(audio.info, "channels", 0) or 0
+    except ImportError:
+        pass
+    except Exception as e:
+        print(f"[WARNING] Could not extract audio metadata from {Path(path).name}: {e}")
+
+    if not info["duration"]:
+        from media_probe import parse_header
+
+        header = parse_header(path)
+        if header is not None and header.duration:
+            info["duration"] = header.duration
+            info["sample_rate"] = header.sample_rate or 0
+            info["channels"] = header.channels or 0
+            info["bitrate"] = int(os.path.getsize(path) * 8 / header.duration)
+
+    return info
+
+
+def _map_files(func: Callable, paths: List[str], workers: int = 0) -> Iterator[Tuple[str, object]]:
+    """(path, func(path)) in order, across a process pool when worthwhile"""
+    workers = workers or int(os.getenv("MUSIC_SCAN_WORKERS", "0")) or os.cpu_count() or 1
+    if workers == 1 or len(paths) < MIN_POOL_FILES:
+        for path in paths:
+            yield path, func(path)
+        return
+
+    chunksize = max(1, min(64, len(paths) // (workers * 4)))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        yield from zip(paths, pool.map(func, paths, chunksize=chunksize))
+
+
+def read_audio_infos(paths: List[str], workers: int = 0) -> Iterator[Tuple[str, Dict]]:
+    """(path, read_audio_info(path)) in order"""
+    return _map_files(read_audio_info, paths, workers)
+
+
+def _raise_if_environment(error: Exception, path: str):
+    """Errors about something other than path itself (ffmpeg missing, the
+    cache unwritable) would fail every file, so they stop the stage"""
+    if isinstance(error, OSError) and error.filename not in (None, path):
+        raise RuntimeError(f"Cannot read audio: {error}") from error
+
+
+def _safe_fingerprint(path: str) -> Optional[bytes]:
+    from audio_fingerprint import fingerprint
+
+    try:
+        return fingerprint(path)
+    except (OSError, RuntimeError, ValueError) as e:
+        _raise_if_environment(e, path)
+        print(f"[WARNING] Could not fingerprint {Path(path).name}: {e}")
+        return None
+
+
+def read_fingerprints(paths: List[str], workers: int = 0) -> Iterator[Tuple[str, Optional[bytes]]]:
+    """(path, audio fingerprint) in order; None for files that cannot be
+    read or decoded. Raises RuntimeError when no file can be (e.g. ffmpeg
+    is missing)"""
+    return _map_files(_safe_fingerprint, paths, workers)
+
+
+def _safe_features(path: str) -> Optional[Dict]:
+    from music_features import analyze_track, default_feature_cache
+
+    cache = default_feature_cache()
+    try:
+        digest = sampled_content_hash(path)
+        features = cache.get(digest)
+        # Empty results are cheap to redo (short audio) and not cached
+        if not features:
+            features = analyze_track(path)
+            if features:
+                cache.put(digest, features)
+        return features
+    except (OSError, RuntimeError, ValueError) as e:
+        _raise_if_environment(e, path)
+        print(f"[WARNING] Could not analyze {Path(path).name}: {e}")
+        return None
+
+
+def read_features(paths: List[str], workers: int = 0) -> Iterator[Tuple[str, Optional[Dict]]]:
+    """(path, music_features.analyze_track result) in order; None for files
+    that cannot be read or decoded. Raises RuntimeError when no file can be
+    (e.g. ffmpeg is missing)"""
+    return _map_files(_safe_features, paths, workers)
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+Inverted-index track search for the music library store
+
+MusicLibraryStore.search used to build a lowercase title/artist/mood/tags
+string for every track on every query and test it for the query as a
+substring: O(library text) per query, ranked only by "title matched" and
+usage. TrackSearchIndex keeps an inverted index in the same SQLite file:
+
+- search_terms  one row per term: the rowids of the tracks containing it
+                and, per track, the BM25F term-frequency part of its score
+                (title, artist, mood and tags weighted by FIELD_WEIGHTS,
+                length-normalized per field), as packed int64/float64
+                arrays. A term's IDF is applied at query time, so indexing a
+                track only rewrites the rows of its own terms
+- search_docs   per-track field lengths (BM25 length normalization) and terms
+
+Only tracks (not duplicate files) are indexed. The store reindexes rows in
+the same transaction that changes them, so a scan indexes what it adds and
+an edit re-tokenizes one track. Length normalization uses the average field
+lengths at the time a track was indexed; they drift little as a library
+grows, and rebuild() brings every track up to date.
+
+Queries run on the arrays in memory (plus the vocabulary and its
+trigrams), loaded on the first search and reloaded after this or another
+connection changes the index. A query word matches its own term, terms it
+is a prefix of ("upl" -> "uplifting", scored PREFIX_FACTOR) and, when
+nothing starts with it, terms containing it ("lift" -> "uplifting",
+SUBSTRING_FACTOR). A track's score is the sum over query words of its best
+matching term's BM25 score; ties go to the earliest indexed track.
+"""
+
+import bisect
+import heapq
+import json
+import math
+import re
+import sqlite3
+import unicodedata
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+SEARCH_SCHEMA = """
+CREATE TABLE IF NOT EXISTS search_terms (
+    term     TEXT PRIMARY KEY,
+    rowids   BLOB NOT NULL,
+    weights  BLOB NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS search_docs (
+    track_rowid  INTEGER PRIMARY KEY,
+    lengths      TEXT NOT NULL,
+    terms        TEXT NOT NULL
+);
+"""
+
+SEARCH_FIELDS = ("title", "artist", "mood", "tags")
+FIELD_WEIGHTS = (3.0, 2.0, 1.0, 1.0)
+
+# BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Score multipliers for words that only partly match a term
+PREFIX_FACTOR = 0.8
+SUBSTRING_FACTOR = 0.6
+
+# Terms a single query word may expand to (most common first)
+MAX_EXPANSIONS = 32
+
+_WORD = re.compile(r"\w+")
+
+ROWID_DTYPE = np.dtype("<i8")
+WEIGHT_DTYPE = np.dtype("<f8")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase words of text, accents removed"""
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return _WORD.findall(text)
+
+
+def _trigrams(term: str) -> set:
+    return {term[i:i + 3] for i in range(len(term) - 2)}
+
+
+def _idf(df: int, docs: int) -> float:
+    return math.log(1 + (docs - df + 0.5) / (df + 0.5))
+
+
+class _PackedIndex:
+    """In-memory postings: term -> (rowids, weights) arrays, vocabulary, trigrams"""
+
+    def __init__(self, conn: sqlite3.Connection, docs: int):
+        self.docs = docs
+        self.postings: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self.df: Dict[str, int] = {}
+        self.size = 1
+        for term, rowids, weights in conn.execute("SELECT term, rowids, weights FROM search_terms"):
+            rowids = np.frombuffer(rowids, dtype=ROWID_DTYPE)
+            self.postings[term] = (rowids, np.frombuffer(weights, dtype=WEIGHT_DTYPE))
+            self.df[term] = len(rowids)
+            self.size = max(self.size, int(rowids[-1]) + 1)
+
+        self.vocabulary = sorted(self.postings)
+        self.grams: Dict[str, List[str]] = {}
+        for term in self.vocabulary:
+            for gram in _trigrams(term):
+                self.grams.setdefault(gram, []).append(term)
+
+        # Score buffers, reused: fresh ones this size cost more in page faults than the query
+        self._total = np.zeros(self.size)
+        self._best = np.zeros(self.size)
+
+    def expansions(self, word: str) -> Dict[str, float]:
+        """term -> score multiplier (IDF x match factor) for one query word"""
+        terms = {word: 1.0} if word in self.postings else {}
+        if len(word) >= 2:
+            i = bisect.bisect_right(self.vocabulary, word)
+            j = bisect.bisect_left(self.vocabulary, word + "\U0010ffff")
+            for term in heapq.nlargest(MAX_EXPANSIONS, self.vocabulary[i:j], key=self.df.get):
+                terms[term] = PREFIX_FACTOR
+
+        if len(terms) <= 1 and len(word) >= 3:
+            grams = sorted(_trigrams(word), key=lambda g: len(self.grams.get(g, ())))
+            candidates = [t for t in self.grams.get(grams[0], ()) if word in t and t not in terms]
+            for term in heapq.nlargest(MAX_EXPANSIONS, candidates, key=self.df.get):
+                terms[term] = SUBSTRING_FACTOR
+
+        return {term: _idf(self.df[term], self.docs) * factor for term, factor in terms.items()}
+
+    def search(self, words: Sequence[str], limit: int) -> List[Tuple[int, float]]:
+        total, best = self._total, self._best
+        total.fill(0.0)
+        matched = False
+        for word in words:
+            expansions = self.expansions(word)
+            if not expansions:
+                continue
+            # A word scores its best matching term; the first word can go straight into total
+            scores = best if matched else total
+            if matched:
+                scores.fill(0.0)
+            for i, (term, factor) in enumerate(expansions.items()):
+                rowids, weights = self.postings[term]
+                if i == 0:
+                    scores[rowids] = weights * factor
+                else:
+                    scores[rowids] = np.maximum(scores[rowids], weights * factor)
+            if matched:
+                total += best
+            matched = True
+        if not matched:
+            return []
+
+        rowids = np.nonzero(total > 0)[0]
+        scores = total[rowids]  # a copy: the buffer is reused
+        if len(rowids) > limit:
+            # Select at the low end of the negated scores: numpy's partition is
+            # fast there but slow near the top when most scores are equal
+            cutoff = -np.partition(-scores, limit - 1)[limit - 1]
+            # Ties at the cutoff go to the lowest rowids (rowids are ascending)
+            above = np.nonzero(scores > cutoff)[0]
+            keep = np.concatenate([above, np.nonzero(scores == cutoff)[0][:limit - len(above)]])
+            rowids, scores = rowids[keep], scores[keep]
+        order = np.lexsort((rowids, -scores))
+        return [(int(rowids[i]), float(scores[i])) for i in order]
+
+
+class TrackSearchIndex:
+    """Inverted index over the tracks table of a MusicLibraryStore connection"""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+        self.conn.executescript(SEARCH_SCHEMA)
+        self._packed = None
+        self._data_version = None
+
+    # -- maintenance (callers hold the transaction) --------------------------
+
+    def _field_totals(self) -> Tuple[int, List[int]]:
+        """(indexed tracks, total tokens per field)"""
+        docs, totals = 0, [0] * len(SEARCH_FIELDS)
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'search:totals'").fetchone()
+        if row:
+            docs, *totals = (int(v) for v in row[0].split(","))
+        return docs, totals
+
+    def reindex(self, rowids: Iterable[int]):
+        """Re-read these tracks rows into the index (dropping deleted rows and duplicates)"""
+        rowids = sorted(set(rowids))
+        if not rowids:
+            return
+        docs, totals = self._field_totals()
+
+        affected = set()
+        for chunk in _chunks(rowids):
+            marks = ",".join("?" * len(chunk))
+            for lengths, terms in self.conn.execute(
+                    f"SELECT lengths, terms FROM search_docs WHERE track_rowid IN ({marks})", chunk):
+                docs -= 1
+                totals = [t - int(n) for t, n in zip(totals, lengths.split(","))]
+                affected.update(terms.split())
+            self.conn.execute(f"DELETE FROM search_docs WHERE track_rowid IN ({marks})", chunk)
+
+        # Tokenize first: the new lengths go into the averages used for weights
+        indexed = []
+        for chunk in _chunks(rowids):
+            marks = ",".join("?" * len(chunk))
+            for rowid, title, artist, mood, tags in self.conn.execute(
+                    f"SELECT rowid, title, artist, mood, tags FROM tracks "
+                    f"WHERE rowid IN ({marks}) AND duplicate_of IS NULL", chunk):
+                fields = [tokenize(title), tokenize(artist), tokenize(mood),
+                          tokenize(" ".join(_tag_list(tags)))]
+                lengths = [len(tokens) for tokens in fields]
+                indexed.append((rowid, fields, lengths))
+                docs += 1
+                totals = [t + n for t, n in zip(totals, lengths)]
+
+        averages = [max(t / docs, 1.0) if docs else 1.0 for t in totals]
+        added: Dict[str, List[Tuple[int, float]]] = {}
+        doc_rows = []
+        for rowid, fields, lengths in indexed:
+            tf: Dict[str, float] = {}
+            for tokens, length, avg, weight in zip(fields, lengths, averages, FIELD_WEIGHTS):
+                norm = 1 - BM25_B + BM25_B * length / avg
+                for token in tokens:
+                    tf[token] = tf.get(token, 0.0) + weight / norm
+            for term, value in tf.items():
+                added.setdefault(term, []).append((rowid, value * (BM25_K1 + 1) / (value + BM25_K1)))
+            doc_rows.append((rowid, ",".join(map(str, lengths)), " ".join(tf)))
+        affected.update(added)
+
+        # Rewrite each affected term's arrays once: drop these tracks, add their new weights
+        reindexed = np.array(rowids, dtype=ROWID_DTYPE)
+        writes, deletes = [], []
+        for chunk in _chunks(sorted(affected)):
+            stored = {term: (np.frombuffer(r, dtype=ROWID_DTYPE), np.frombuffer(w, dtype=WEIGHT_DTYPE))
+                      for term, r, w in self.conn.execute(
+                          f"SELECT term, rowids, weights FROM search_terms "
+                          f"WHERE term IN ({','.join('?' * len(chunk))})", chunk)}
+            for term in chunk:
+                old_rowids, old_weights = stored.get(term, (reindexed[:0], np.zeros(0, WEIGHT_DTYPE)))
+                keep = ~np.isin(old_rowids, reindexed, assume_unique=True)
+                new = added.get(term, [])
+                term_rowids = np.concatenate([old_rowids[keep], np.array([r for r, _ in new], dtype=ROWID_DTYPE)])
+                term_weights = np.concatenate([old_weights[keep], np.array([w for _, w in new], dtype=WEIGHT_DTYPE)])
+                if len(term_rowids) == 0:
+                    deletes.append((term,))
+                    continue
+                order = np.argsort(term_rowids, kind="stable")
+                writes.append((term, term_rowids[order].tobytes(), term_weights[order].tobytes()))
+
+        self.conn.executemany("INSERT OR REPLACE INTO search_terms (term, rowids, weights) VALUES (?, ?, ?)",
+                              writes)
+        self.conn.executemany("DELETE FROM search_terms WHERE term = ?", deletes)
+        self.conn.executemany("INSERT INTO search_docs (track_rowid, lengths, terms) VALUES (?, ?, ?)",
+                              doc_rows)
+        self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('search:totals', ?)",
+                          (",".join(str(v) for v in (docs, *totals)),))
+        self._packed = None
+
+    def rebuild(self):
+        """Index every track from scratch"""
+        self.conn.execute("DELETE FROM search_terms")
+        self.conn.execute("DELETE FROM search_docs")
+        self.conn.execute("DELETE FROM meta WHERE key = 'search:totals'")
+        self.reindex(row[0] for row in self.conn.execute("SELECT rowid FROM tracks"))
+
+    # -- queries -------------------------------------------------------------
+
+    def search(self, query: str, limit: int = 10) -> List[Tuple[int, float]]:
+        """(track rowid, score) of the best matches for query, best first"""
+        words = list(dict.fromkeys(tokenize(query)))
+        if not words or limit <= 0:
+            return []
+
+        # data_version changes when another connection commits
+        data_version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+        if self._packed is None or data_version != self._data_version:
+            self._packed = _PackedIndex(self.conn, self._field_totals()[0])
+            self._data_version = data_version
+        return self._packed.search(words, limit)
+
+
+def _tag_list(tags: str) -> List[str]:
+    try:
+        return [str(tag) for tag in json.loads(tags or "[]")]
+    except ValueError:
+        return []
+
+
+def _chunks(items: List, size: int = 500) -> Iterable[List]:
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
@@ -0,0 +1,542 @@
+#!/usr/bin/env python3
+"""
+SQLite storage for the music library
+
+MusicLibraryManager used to keep the whole library in one dict and rewrite
+music_library_metadata.json (indent=2) on every scan, play count, rating
+and favorite change. This store keeps the same records in SQLite (WAL
+mode), so each change is a single-row write:
+
+- tracks     one row per indexed file, keyed by file_hash; indexed on
+             mood, bpm, duration, source and usage_count. The file's size,
+             mtime_ns and inode at indexing time let scans skip unchanged
+             files and follow moved ones (music_library_scanner). bpm,
+             musical_key, loudness_lufs, energy and energy_curve come from
+             the audio (music_features) once features_version is set
+- search_*   inverted index over title, artist, mood and tags, updated
+             with every write that changes them; search() ranks with BM25
+             (music_library_search)
+- duplicates a file whose content_hash (or audio fingerprint) matches an
+             earlier track keeps its row, for change detection, with
+             duplicate_of pointing at that track. Its usage, rating and
+             favorite move to the track, and reads only return tracks, each
+             with "paths" listing all of its files. Usage, ratings and
+             favorites given a duplicate's hash apply to its track
+- usage      one row per track use (video title, platform, date)
+- favorites  one row per favorited track; a track dict's is_favorite is
+             derived from it
+
+Reads return the same track dicts the JSON held. import_json() loads an
+existing metadata JSON once (recorded in the meta table, so it is not
+imported twice).
+
+Environment:
+    MUSIC_LIBRARY_DB  Database file (default: next to the metadata JSON,
+                      with a .db suffix)
+"""
+
+import json
+import os
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from music_library_search import TrackSearchIndex
+
+SCHEMA_VERSION = 7
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tracks (
+    file_hash     TEXT PRIMARY KEY,
+    file_path     TEXT NOT NULL,
+    filename      TEXT NOT NULL,
+    title         TEXT NOT NULL,
+    artist        TEXT NOT NULL,
+    source        TEXT NOT NULL,
+    mood          TEXT NOT NULL,
+    bpm           INTEGER NOT NULL,
+    duration      REAL NOT NULL DEFAULT 0,
+    bitrate       INTEGER NOT NULL DEFAULT 0,
+    sample_rate   INTEGER NOT NULL DEFAULT 0,
+    channels      INTEGER NOT NULL DEFAULT 0,
+    file_size_mb  REAL NOT NULL DEFAULT 0,
+    file_size     INTEGER NOT NULL DEFAULT 0,
+    mtime_ns      INTEGER NOT NULL DEFAULT 0,
+    inode         INTEGER NOT NULL DEFAULT 0,
+    content_hash  TEXT NOT NULL DEFAULT '',
+    fingerprint   BLOB,
+    duplicate_of  TEXT,
+    musical_key   TEXT NOT NULL DEFAULT '',
+    loudness_lufs REAL,
+    energy        REAL,
+    energy_curve  TEXT NOT NULL DEFAULT '[]',
+    features_version INTEGER NOT NULL DEFAULT 0,
+    indexed_date  TEXT NOT NULL,
+    usage_count   INTEGER NOT NULL DEFAULT 0,
+    rating        INTEGER NOT NULL DEFAULT 0,
+    tags          TEXT NOT NULL DEFAULT '[]',
+    notes         TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS idx_tracks_mood ON tracks (mood);
+CREATE INDEX IF NOT EXISTS idx_tracks_bpm ON tracks (bpm);
+CREATE INDEX IF NOT EXISTS idx_tracks_duration ON tracks (duration);
+CREATE INDEX IF NOT EXISTS idx_tracks_source ON tracks (source);
+CREATE INDEX IF NOT EXISTS idx_tracks_usage_count ON tracks (usage_count);
+CREATE INDEX IF NOT EXISTS idx_tracks_file_path ON tracks (file_path);
+CREATE INDEX IF NOT EXISTS idx_tracks_content_hash ON tracks (content_hash);
+CREATE INDEX IF NOT EXISTS idx_tracks_duplicate_of ON tracks (duplicate_of);
+
+CREATE TABLE IF NOT EXISTS usage (
+    id           INTEGER PRIMARY KEY AUTOINCREMENT,
+    track_hash   TEXT NOT NULL,
+    track_title  TEXT NOT NULL,
+    video_title  TEXT NOT NULL,
+    platform     TEXT NOT NULL,
+    date         TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_usage_track ON usage (track_hash);
+CREATE INDEX IF NOT EXISTS idx_usage_platform ON usage (platform);
+
+CREATE TABLE IF NOT EXISTS favorites (
+    track_hash  TEXT PRIMARY KEY,
+    added_date  TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key    TEXT PRIMARY KEY,
+    value  TEXT NOT NULL
+);
+"""
+
+# Columns added after version 1 (ALTER TABLE on older databases)
+MIGRATIONS = {
+    2: ("ALTER TABLE tracks ADD COLUMN file_size INTEGER NOT NULL DEFAULT 0",
+        "ALTER TABLE tracks ADD COLUMN mtime_ns INTEGER NOT NULL DEFAULT 0",
+        "ALTER TABLE tracks ADD COLUMN inode INTEGER NOT NULL DEFAULT 0",
+        "CREATE INDEX IF NOT EXISTS idx_tracks_file_path ON tracks (file_path)"),
+    3: ("ALTER TABLE tracks ADD COLUMN content_hash TEXT NOT NULL DEFAULT ''",
+        "ALTER TABLE tracks ADD COLUMN fingerprint BLOB",
+        "ALTER TABLE tracks ADD COLUMN duplicate_of TEXT"),
+    5: ("ALTER TABLE tracks ADD COLUMN musical_key TEXT NOT NULL DEFAULT ''",
+        "ALTER TABLE tracks ADD COLUMN loudness_lufs REAL",
+        "ALTER TABLE tracks ADD COLUMN energy REAL",
+        "ALTER TABLE tracks ADD COLUMN energy_curve TEXT NOT NULL DEFAULT '[]'",
+        "ALTER TABLE tracks ADD COLUMN features_version INTEGER NOT NULL DEFAULT 0"),
+    # Version 5 scans marked tracks that failed to decode as analysed
+    6: ("UPDATE tracks SET features_version = 0 WHERE energy IS NULL",),
+    # ...and stored an empty fingerprint for them
+    7: ("UPDATE tracks SET fingerprint = NULL WHERE length(fingerprint) = 0",),
+}
+
+# Scanned (file-derived) columns; a rescan updates these and keeps usage,
+# rating, tags and notes
+SCANNED_COLUMNS = ("file_path", "filename", "title", "artist", "source", "mood", "bpm",
+                   "duration", "bitrate", "sample_rate", "channels", "file_size_mb",
+                   "file_size", "mtime_ns", "inode", "content_hash", "indexed_date")
+
+# Columns a move may change (the content, and so the analysis, is the same)
+MOVED_COLUMNS = ("file_path", "filename", "title", "artist", "source",
+                 "file_size", "mtime_ns", "inode")
+TRACK_COLUMNS = ("file_hash",) + SCANNED_COLUMNS + ("usage_count", "rating", "tags", "notes")
+
+# Track rows in the JSON's key order, with is_favorite from the favorites table,
+# the audio features and the paths of the track's file and its duplicates
+TRACK_SELECT = (
+    "SELECT t.file_path, t.filename, t.file_hash, t.title, t.artist, t.source, t.mood, "
+    "t.bpm, t.duration, t.bitrate, t.sample_rate, t.channels, t.file_size_mb, "
+    "t.indexed_date, t.usage_count, t.rating, f.track_hash IS NOT NULL AS is_favorite, "
+    "t.tags, t.notes, t.musical_key, t.loudness_lufs, t.energy, t.energy_curve, (SELECT json_group_array(file_path) FROM (SELECT d.file_path FROM tracks d "
+    "WHERE d.file_hash = t.file_hash OR d.duplicate_of = t.file_hash ORDER BY d.rowid)) AS paths "
+    "FROM tracks t LEFT JOIN favorites f ON f.track_hash = t.file_hash"
+)
+
+# The track a (possibly duplicate) file hash belongs to
+CANONICAL = "(SELECT COALESCE(duplicate_of, file_hash) FROM tracks WHERE file_hash = ?)"
+
+
+def _track_row(track: Dict) -> Tuple:
+    """TRACK_COLUMNS values of a track dict"""
+    defaults = {"tags": [], "notes": ""}
+    return tuple(json.dumps(track.get(col, [])) if col == "tags" else track.get(col, defaults.get(col, 0))
+                 for col in TRACK_COLUMNS)
+
+
+def _track_dict(row: sqlite3.Row) -> Dict:
+    track = dict(row)
+    track["is_favorite"] = bool(track["is_favorite"])
+    track["tags"] = json.loads(track["tags"] or "[]")
+    track["energy_curve"] = json.loads(track["energy_curve"] or "[]")
+    track["paths"] = json.loads(track["paths"])
+    return track
+
+
+class MusicLibraryStore:
+    """Tracks, usage and favorites in one SQLite database"""
+
+    def __init__(self, db_path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.db_path))
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        has_tracks = self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'tracks'").fetchone()
+        with self.conn:
+            if has_tracks:
+                for target in range(version + 1, SCHEMA_VERSION + 1):
+                    for statement in MIGRATIONS.get(target, ()):
+                        self.conn.execute(statement)
+            self.conn.executescript(SCHEMA)
+            self.search_index = TrackSearchIndex(self.conn)
+            if has_tracks and version < 4:  # search index added in version 4
+                self.search_index.rebuild()
+            self.conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+
+    def close(self):
+        self.conn.close()
+
+    # -- tracks --------------------------------------------------------------
+
+    def track_hashes(self) -> set:
+        return {row[0] for row in self.conn.execute("SELECT file_hash FROM tracks")}
+
+    def file_states(self) -> Dict[str, Tuple[str, int, int, int]]:
+        """file_path -> (file_hash, size, mtime_ns, inode) as last indexed"""
+        return {row[0]: tuple(row[1:]) for row in self.conn.execute(
+            "SELECT file_path, file_hash, file_size, mtime_ns, inode FROM tracks")}
+
+    def track_count(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM tracks WHERE duplicate_of IS NULL").fetchone()[0]
+
+    def duplicate_count(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM tracks WHERE duplicate_of IS NOT NULL").fetchone()[0]
+
+    def get_track(self, track_hash: str) -> Optional[Dict]:
+        """The track track_hash belongs to (itself, unless it is a duplicate)"""
+        row = self.conn.execute(f"{TRACK_SELECT} WHERE t.file_hash = {CANONICAL}", (track_hash,)).fetchone()
+        return _track_dict(row) if row else None
+
+    def upsert_tracks(self, tracks: Iterable[Dict]):
+        """Insert scanned tracks in one transaction; existing rows get the new
+        file metadata and keep their usage, rating, tags and notes. A changed
+        file is a track again until collapse_duplicates says otherwise, and
+        is due for audio analysis again"""
+        placeholders = ", ".join("?" * len(TRACK_COLUMNS))
+        updates = ", ".join(f"{col} = excluded.{col}" for col in SCANNED_COLUMNS)
+        rows = [_track_row(track) for track in tracks]
+        with self.conn:
+            self.conn.executemany(
+                f"INSERT INTO tracks ({', '.join(TRACK_COLUMNS)}) VALUES ({placeholders}) "
+                f"ON CONFLICT(file_hash) DO UPDATE SET {updates}, fingerprint = NULL, duplicate_of = NULL, "
+                f"features_version = 0",
+                rows
+            )
+            self.search_index.reindex(self._rowids(row[0] for row in rows))
+
+    def move_tracks(self, moves: Iterable[Tuple[str, Dict]]):
+        """Apply (file_hash, {MOVED_COLUMNS...}) moves in one transaction"""
+        updates = ", ".join(f"{col} = ?" for col in MOVED_COLUMNS)
+        moves = list(moves)
+        with self.conn:
+            self.conn.executemany(
+                f"UPDATE tracks SET {updates} WHERE file_hash = ?",
+                [tuple(fields[col] for col in MOVED_COLUMNS) + (track_hash,)
+                 for track_hash, fields in moves]
+            )
+            self.search_index.reindex(self._rowids(track_hash for track_hash, _ in moves))
+
+    def _rowids(self, track_hashes: Iterable[str]) -> List[int]:
+        track_hashes = list(track_hashes)
+        rowids = []
+        for i in range(0, len(track_hashes), 500):
+            chunk = track_hashes[i:i + 500]
+            rowids += [row[0] for row in self.conn.execute(
+                f"SELECT rowid FROM tracks WHERE file_hash IN ({','.join('?' * len(chunk))})", chunk)]
+        return rowids
+
+    # -- duplicates ----------------------------------------------------------
+
+    def missing_content_hashes(self) -> List[Tuple[str, str]]:
+        """(file_hash, file_path) of rows indexed before content hashing"""
+        return [tuple(row) for row in self.conn.execute(
+            "SELECT file_hash, file_path FROM tracks WHERE content_hash = ''")]
+
+    def set_content_hashes(self, hashes: Iterable[Tuple[str, str]]):
+        """Record (file_hash, content_hash) pairs"""
+        with self.conn:
+            self.conn.executemany("UPDATE tracks SET content_hash = ? WHERE file_hash = ?",
+                                  [(content, track_hash) for track_hash, content in hashes])
+
+    def collapse_duplicates(self) -> int:
+        """Merge tracks with equal content hashes into the earliest indexed one;
+        returns the number of tracks merged"""
+        first, merges = {}, []
+        for track_hash, content in self.conn.execute(
+                "SELECT file_hash, content_hash FROM tracks "
+                "WHERE duplicate_of IS NULL AND content_hash != '' ORDER BY rowid"):
+            if content in first:
+                merges.append((track_hash, first[content]))
+            else:
+                first[content] = track_hash
+        return self.merge_tracks(merges)
+
+    def merge_tracks(self, merges: Iterable[Tuple[str, str]]) -> int:
+        """
+        Make each (duplicate, track) pair's duplicate a file of track
+
+        The track takes over the duplicate's usage rows and count, the
+        higher rating and its favorite flag, and the duplicate's own
+        duplicates. Returns the number of pairs merged.
+        """
+        merges = list(merges)
+        with self.conn:
+            for duplicate, track in merges:
+                self.conn.execute(
+                    "UPDATE tracks SET "
+                    "usage_count = usage_count + (SELECT usage_count FROM tracks WHERE file_hash = ?1), "
+                    "rating = MAX(rating, (SELECT rating FROM tracks WHERE file_hash = ?1)) "
+                    "WHERE file_hash = ?2", (duplicate, track))
+                self.conn.execute("UPDATE usage SET track_hash = ? WHERE track_hash = ?",
+                                  (track, duplicate))
+                self.conn.execute(
+                    "INSERT OR IGNORE INTO favorites (track_hash, added_date) "
+                    "SELECT ?, added_date FROM favorites WHERE track_hash = ?", (track, duplicate))
+                self.conn.execute("DELETE FROM favorites WHERE track_hash = ?", (duplicate,))
+                self.conn.execute("UPDATE tracks SET duplicate_of = ? WHERE duplicate_of = ?",
+                                  (track, duplicate))
+                self.conn.execute(
+                    "UPDATE tracks SET duplicate_of = ?, usage_count = 0, rating = 0 WHERE file_hash = ?",
+                    (track, duplicate))
+            self.search_index.reindex(self._rowids(duplicate for duplicate, _ in merges))
+        return len(merges)
+
+    def missing_fingerprints(self) -> List[Tuple[str, str]]:
+        """(file_hash, file_path) of tracks without an audio fingerprint"""
+        return [tuple(row) for row in self.conn.execute(
+            "SELECT file_hash, file_path FROM tracks WHERE duplicate_of IS NULL AND fingerprint IS NULL")]
+
+    def set_fingerprints(self, fingerprints: Iterable[Tuple[str, bytes]]):
+        """Record (file_hash, fingerprint) pairs (b"" marks audio too short
+        to fingerprint)"""
+        with self.conn:
+            self.conn.executemany("UPDATE tracks SET fingerprint = ? WHERE file_hash = ?",
+                                  [(fp, track_hash) for track_hash, fp in fingerprints])
+
+    def fingerprints(self) -> List[Tuple[str, float, bytes]]:
+        """(file_hash, duration, fingerprint) of fingerprinted tracks, in indexing order"""
+        return [tuple(row) for row in self.conn.execute(
+            "SELECT file_hash, duration, fingerprint FROM tracks "
+            "WHERE duplicate_of IS NULL AND length(fingerprint) > 0 ORDER BY rowid")]
+
+    def missing_features(self, version: int) -> List[Tuple[str, str]]:
+        """(file_hash, file_path) of tracks not analysed by this features version"""
+        return [tuple(row) for row in self.conn.execute(
+            "SELECT file_hash, file_path FROM tracks WHERE duplicate_of IS NULL AND features_version < ? "
+            "ORDER BY rowid", (version,))]
+
+    def set_features(self, features: Iterable[Tuple[str, Dict]], version: int):
+        """Record (file_hash, music_features.analyze_track result) pairs; an
+        empty result (audio too short to analyse) marks the track analysed
+        and keeps its estimated BPM. Failed analyses are not recorded, so
+        they are retried"""
+        with self.conn:
+            self.conn.executemany(
+                "UPDATE tracks SET bpm = COALESCE(?, bpm), musical_key = ?, loudness_lufs = ?, "
+                "energy = ?, energy_curve = ?, features_version = ? WHERE file_hash = ?",
+                [(round(f["bpm"]) if f.get("bpm") else None, f.get("key", ""), f.get("loudness_lufs"),
+                  f.get("energy"), json.dumps(f.get("energy_curve", [])), version, track_hash)
+                 for track_hash, f in features]
+            )
+
+    def find_tracks(self, mood: Optional[str] = None, min_bpm: Optional[float] = None,
+                    max_bpm: Optional[float] = None, duration: Optional[float] = None,
+                    duration_tolerance: float = 30.0, artist: Optional[str] = None,
+                    favorites_only: bool = False) -> List[Dict]:
+        """
+        Tracks matching every given filter, in indexing order
+
+        duration keeps tracks within duration_tolerance seconds of it, plus
+        tracks whose duration is unknown (0).
+        """
+        clauses, params = ["t.duplicate_of IS NULL"], []
+        if mood:
+            clauses.append("t.mood = ?")
+            params.append(mood)
+        if min_bpm is not None:
+            clauses.append("t.bpm >= ?")
+            params.append(min_bpm)
+        if max_bpm is not None:
+            clauses.append("t.bpm <= ?")
+            params.append(max_bpm)
+        if duration:
+            clauses.append("(t.duration <= 0 OR t.duration BETWEEN ? AND ?)")
+            params += [duration - duration_tolerance, duration + duration_tolerance]
+        if artist:
+            clauses.append("t.artist = ?")
+            params.append(artist)
+        if favorites_only:
+            clauses.append("f.track_hash IS NOT NULL")
+
+        rows = self.conn.execute(f"{TRACK_SELECT} WHERE {' AND '.join(clauses)} ORDER BY t.rowid", params)
+        return [_track_dict(row) for row in rows]
+
+    def search(self, query: str, limit: int = 10) -> List[Dict]:
+        """Tracks matching words (or word prefixes) of query, best BM25 score
+        first; see music_library_search"""
+        rowids = [rowid for rowid, _ in self.search_index.search(query, limit)]
+        if not rowids:
+            return []
+        ranked = ",".join("(?, ?)" for _ in rowids)
+        params = [value for rank, rowid in enumerate(rowids) for value in (rowid, rank)]
+        rows = self.conn.execute(f"WITH ranked (track_rowid, rank) AS (VALUES {ranked}) "
+                                 f"{TRACK_SELECT} JOIN ranked r ON r.track_rowid = t.rowid "
+                                 f"ORDER BY r.rank", params)
+        return [_track_dict(row) for row in rows]
+
+    def canonical_hash(self, track_hash: str) -> Optional[str]:
+        """The hash of the track track_hash belongs to; None if unknown"""
+        row = self.conn.execute(f"SELECT {CANONICAL}", (track_hash,)).fetchone()
+        return row[0] if row else None
+
+    def set_rating(self, track_hash: str, rating: int) -> bool:
+        with self.conn:
+            cursor = self.conn.execute(f"UPDATE tracks SET rating = ? WHERE file_hash = {CANONICAL}",
+                                       (rating, track_hash))
+        return cursor.rowcount > 0
+
+    # -- usage ---------------------------------------------------------------
+
+    def record_usage(self, track_hash: str, video_title: str, platform: str) -> bool:
+        """Count one use of a track; False if the track is unknown"""
+        now = datetime.now().isoformat()
+        track_hash = self.canonical_hash(track_hash)
+        if track_hash is None:
+            return False
+        with self.conn:
+            self.conn.execute(
+                "UPDATE tracks SET usage_count = usage_count + 1 WHERE file_hash = ?", (track_hash,))
+            self.conn.execute(
+                "INSERT INTO usage (track_hash, track_title, video_title, platform, date) "
+                "SELECT file_hash, title, ?, ?, ? FROM tracks WHERE file_hash = ?",
+                (video_title, platform, now, track_hash)
+            )
+        return True
+
+    def usage_total(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM usage").fetchone()[0]
+
+    def platform_breakdown(self) -> Dict[str, int]:
+        return dict(self.conn.execute("SELECT platform, COUNT(*) FROM usage GROUP BY platform"))
+
+    # -- favorites -----------------------------------------------------------
+
+    def toggle_favorite(self, track_hash: str) -> bool:
+        """Flip a track's favorite status; returns the new status"""
+        track_hash = self.canonical_hash(track_hash) or track_hash
+        with self.conn:
+            cursor = self.conn.execute("DELETE FROM favorites WHERE track_hash = ?", (track_hash,))
+            if cursor.rowcount:
+                return False
+            self.conn.execute("INSERT INTO favorites (track_hash, added_date) VALUES (?, ?)",
+                              (track_hash, datetime.now().isoformat()))
+        return True
+
+    def favorite_count(self) -> int:
+        return self.conn.execute(
+            "SELECT COUNT(*) FROM favorites f JOIN tracks t ON t.file_hash = f.track_hash"
+        ).fetchone()[0]
+
+    # -- statistics ----------------------------------------------------------
+
+    def summary(self) -> Dict:
+        """Aggregates for MusicLibraryManager.get_library_stats"""
+        total, duration, size = self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(duration), 0), COALESCE(SUM(file_size_mb), 0) FROM tracks "
+            "WHERE duplicate_of IS NULL"
+        ).fetchone()
+        buckets = dict(self.conn.execute(
+            "SELECT CASE WHEN bpm < 60 THEN '0-60' WHEN bpm < 80 THEN '60-80' "
+            "WHEN bpm < 100 THEN '80-100' WHEN bpm < 120 THEN '100-120' ELSE '120+' END, COUNT(*) "
+            "FROM tracks WHERE duplicate_of IS NULL GROUP BY 1"
+        ))
+
+        def counts(column):
+            return dict(self.conn.execute(
+                f"SELECT {column}, COUNT(*) FROM tracks WHERE duplicate_of IS NULL "
+                f"GROUP BY {column} ORDER BY MIN(rowid)"))
+
+        def usage_rows(where=""):
+            return [tuple(row) for row in self.conn.execute(
+                f"SELECT usage_count, title, file_hash FROM tracks WHERE duplicate_of IS NULL {where} "
+                f"ORDER BY usage_count DESC, rowid LIMIT 5")]
+
+        return {
+            "total_tracks": total,
+            "total_duration_hours": duration / 3600,
+            "total_size_mb": size,
+            "moods": counts("mood"),
+            "bpm_distribution": {key: buckets.get(key, 0)
+                                 for key in ("0-60", "60-80", "80-100", "100-120", "120+")},
+            "artists": counts("artist"),
+            "sources": counts("source"),
+            "most_used": usage_rows(),
+            "least_used": usage_rows("AND usage_count = 0"),
+        }
+
+    # -- JSON import ---------------------------------------------------------
+
+    def import_json(self, json_path, force: bool = False) -> Optional[Tuple[int, int, int]]:
+        """
+        Load a music_library_metadata.json into the store, once
+
+        Returns (tracks, usage rows, favorites) imported, or None when the
+        file is missing or was already imported (unless force).
+        """
+        json_path = Path(json_path)
+        if not json_path.exists():
+            return None
+        key = f"imported:{json_path.resolve()}"
+        if not force and self.conn.execute("SELECT 1 FROM meta WHERE key = ?", (key,)).fetchone():
+            return None
+
+        with open(json_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+
+        tracks = list(data.get("tracks", {}).values())
+        usage = sorted(data.get("usage", {}).values(), key=lambda u: u.get("date", ""))
+        favorites = set(data.get("favorites", []))
+        favorites.update(t["file_hash"] for t in tracks if t.get("is_favorite"))
+        now = datetime.now().isoformat()
+
+        placeholders = ", ".join("?" * len(TRACK_COLUMNS))
+        with self.conn:
+            self.conn.executemany(
+                f"INSERT OR REPLACE INTO tracks ({', '.join(TRACK_COLUMNS)}) VALUES ({placeholders})",
+                [_track_row(t) for t in tracks]
+            )
+            # Re-imports skip usage rows that are already there
+            self.conn.executemany(
+                "INSERT INTO usage (track_hash, track_title, video_title, platform, date) "
+                "SELECT ?1, ?2, ?3, ?4, ?5 WHERE NOT EXISTS (SELECT 1 FROM usage "
+                "WHERE track_hash = ?1 AND video_title = ?3 AND platform = ?4 AND date = ?5)",
+                [(u.get("track_hash", ""), u.get("track_title", ""), u.get("video_title", ""),
+                  u.get("platform", "unknown"), u.get("date", now)) for u in usage]
+            )
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO favorites (track_hash, added_date) VALUES (?, ?)",
+                [(track_hash, now) for track_hash in favorites]
+            )
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, now))
+            # INSERT OR REPLACE gives replaced tracks new rowids
+            self.search_index.rebuild()
+
+        return len(tracks), len(usage), len(favorites)
+
+
+def default_db_path(metadata_file) -> Path:
+    """MUSIC_LIBRARY_DB, or the metadata JSON's path with a .db suffix"""
+    return Path(os.getenv("MUSIC_LIBRARY_DB") or Path(metadata_file).with_suffix(".db"))
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Seamless music looping
+
+Looping a track end-to-start (pydub `music * repeats`, MoviePy
+concatenate, ffmpeg -stream_loop) puts an audible seam where the ending
+meets the intro. Instead:
+
+- A log-energy envelope (100 Hz) is autocorrelated with one FFT to find
+  how long a loop the music's structure supports; loop lengths are whole
+  bars of the beat grid from optimal_clip_finder's (cached) analysis
+- The loop start is the beat whose surroundings best match the
+  surroundings of start + loop length, so the jump lands in the same musical
+  place
+- Points are cached per track content hash (.cache/loop_points/)
+- LoopingSource plays the intro up to loop_end, then repeats
+  [loop_start, loop_end) with a short equal-power crossfade at every seam.
+  It reads the track straight from the PCM cache's memmap (or holds one
+  decoded copy when the mix needs another rate) plus the crossfade
+
+Environment:
+    MUSIC_LOOP            seamless (default) or hard (plain -stream_loop)
+    LOOP_POINT_CACHE_DIR  Cache directory (default: .cache/loop_points)
+    LOOP_POINT_CACHE      Set to 0 to disable caching
+"""
+
+import os
+from typing import Dict, Optional
+
+import numpy as np
+
+from frame_cache import file_content_hash
+from json_cache import JsonCache
+
+# Envelope analysis
+ENVELOPE_DECODE_RATE = 11025
+ENVELOPE_HOP = 110          # ~100 envelope values per second
+MIN_LOOP_SECONDS = 8.0
+SEAM_WINDOW = 2.0           # seconds of envelope compared around a seam
+
+# Crossfade at each seam (seconds)
+LOOP_CROSSFADE = 0.1
+
+# Loop lengths within this much of the best autocorrelation count as equally
+# good; the longest of them wins (fewer audible repetitions)
+LAG_SCORE_SLACK = 0.05
+
+
+def seamless_loop_enabled() -> bool:
+    return os.getenv("MUSIC_LOOP", "seamless") != "hard"
+
+
+def _log_envelope(path) -> np.ndarray:
+    """Log RMS per ENVELOPE_HOP samples of a mono low-rate decode"""
+    from pcm_cache import open_track
+
+    decoder = open_track(path, ENVELOPE_DECODE_RATE, 1)
+    block = np.empty((ENVELOPE_HOP * 1024, 1), dtype=np.float32)
+    levels = []
+    try:
+        while True:
+            got = decoder.read(block) // ENVELOPE_HOP * ENVELOPE_HOP
+            if got == 0:
+                break
+            power = np.mean(np.square(block[:got, 0].reshape(-1, ENVELOPE_HOP)), axis=1)
+            levels.append(0.5 * np.log(power + 1e-8))
+    finally:
+        decoder.close()
+    return np.concatenate(levels) if levels else np.zeros(0)
+
+
+def _autocorrelation(env: np.ndarray) -> np.ndarray:
+    """Unbiased, normalized autocorrelation via FFT (ac[0] == 1)"""
+    x = env - env.mean()
+    n = len(x)
+    spectrum = np.fft.rfft(x, 2 * n)
+    ac = np.fft.irfft(spectrum * np.conj(spectrum))[:n]
+    ac /= np.arange(n, 0, -1)
+    return ac / ac[0] if ac[0] > 0 else ac
+
+
+def find_loop_points(path, crossfade: float = LOOP_CROSSFADE) -> Dict:
+    """
+    Choose bar-aligned loop points for a track
+
+    Returns {"loop_start", "loop_end"} in seconds plus diagnostics
+    ("lag_score": envelope autocorrelation at the loop length, "seam_error":
+    mean squared log-energy difference around the seam).
+    """
+    from optimal_clip_finder import OptimalClipFinder
+
+    env = _log_envelope(path)
+    rate = ENVELOPE_DECODE_RATE / ENVELOPE_HOP
+    duration = len(env) / rate
+    window = int(SEAM_WINDOW * rate)
+    half = window // 2
+
+    analysis = OptimalClipFinder().analyze_audio(str(path))
+    tempo = analysis.get("tempo") or 0.0
+    beats = np.asarray(analysis.get("beat_times", []), dtype=np.float64)
+
+    fallback = {"loop_start": crossfade, "loop_end": duration, "lag_score": 0.0,
+                "seam_error": None, "tempo": tempo}
+    if len(env) < 4 * window:
+        return fallback
+
+    ac = _autocorrelation(env)
+
+    # Candidate loop lengths: whole bars, or every envelope step without a beat grid
+    max_len = duration - crossfade - SEAM_WINDOW
+    if tempo > 0 and len(beats) > 4:
+        bar = 4 * 60.0 / tempo
+        lengths = bar * np.arange(max(1, int(np.ceil(MIN_LOOP_SECONDS / bar))),
+                                  int(max_len / bar) + 1)
+    else:
+        lengths = np.arange(int(MIN_LOOP_SECONDS * rate), int(max_len * rate)) / rate
+    if len(lengths) == 0:
+        return fallback
+
+    lag_scores = ac[np.rint(lengths * rate).astype(np.intp)]
+    good = lag_scores >= lag_scores.max() - LAG_SCORE_SLACK
+    length = lengths[good][-1]
+    lag = int(round(length * rate))
+
+    # Candidate starts: beats (or a 0.1 s grid) with room for the crossfade and
+    # the comparison window on both sides of the seam
+    starts = beats if len(beats) else np.arange(0.0, duration, 0.1)
+    start_idx = np.rint(starts * rate).astype(np.intp)
+    valid = (starts >= crossfade) & (start_idx >= half) & (start_idx + lag + half <= len(env))
+    if not np.any(valid):
+        return fallback
+    starts, start_idx = starts[valid], start_idx[valid]
+
+    # Seam error: log-energy around loop_start vs around loop_end, all candidates at once
+    offsets = np.arange(-half, half)
+    before = env[start_idx[:, None] + offsets]
+    after = env[start_idx[:, None] + lag + offsets]
+    errors = np.mean(np.square(before - after), axis=1)
+    best = int(np.argmin(errors))
+
+    return {
+        "loop_start": float(starts[best]),
+        "loop_end": float(starts[best] + length),
+        "lag_score": float(lag_scores[good][-1]),
+        "seam_error": float(errors[best]),
+        "tempo": tempo,
+    }
+
+
+class LoopPointCache(JsonCache):
+    """Loop points keyed by track content hash"""
+
+    def __init__(self, cache_dir=None, enabled: Optional[bool] = None):
+        config = JsonCache.from_env("LOOP_POINT_CACHE", ".cache/loop_points")
+        super().__init__(cache_dir or config.cache_dir,
+                         enabled=config.enabled if enabled is None else enabled)
+
+    def points(self, path) -> Dict:
+        """Cached loop points for path (computed once per track content)"""
+        return self.cached(file_content_hash(path),
+                           lambda: {**find_loop_points(path), "source": str(path)})
+
+
+class LoopingSource:
+    """
+    Endless music stream with crossfaded loop seams
+
+    Same read()/close() interface as audio_mixer's decoder. The stream is
+    track[0:end - X], then (seam, track[start:end - X]) repeated forever,
+    where seam blends track[end - X:end] (fading out) into
+    track[start - X:start] (fading in) with equal power. track is any
+    (frames x channels) float32 array, e.g. a PCM cache memmap.
+    """
+
+    def __init__(self, track: np.ndarray, rate: int, loop_start: float, loop_end: float,
+                 crossfade: float = LOOP_CROSSFADE):
+        self.track = track
+        frames = len(track)
+
+        fade = int(crossfade * rate)
+        end = min(int(round(loop_end * rate)), frames)
+        start = max(int(round(loop_start * rate)), fade)
+        if end - start <= 2 * fade:
+            raise ValueError(f"Loop points too close for a {crossfade}s crossfade: {loop_start}-{loop_end}")
+
+        t = (np.arange(fade, dtype=np.float32) + 0.5) / fade
+        fade_out = np.cos(t * np.pi / 2)[:, None]
+        fade_in = np.sin(t * np.pi / 2)[:, None]
+        self.seam = self.track[end - fade:end] * fade_out + self.track[start - fade:start] * fade_in
+
+        # (array, stop) pieces: intro once, then seam + body forever
+        self._intro = (self.track, end - fade)
+        self._cycle = ((self.seam, fade), (self.track[start:], end - fade - start))
+        self._piece, self._offset = self._intro, 0
+        self._cycle_index = 0
+
+    def read(self, buffer: np.ndarray) -> int:
+        """Fill buffer (frames x channels); the stream never ends"""
+        filled = 0
+        while filled < len(buffer):
+            source, stop = self._piece
+            n = min(stop - self._offset, len(buffer) - filled)
+            buffer[filled:filled + n] = source[self._offset:self._offset + n]
+            filled += n
+            self._offset += n
+            if self._offset == stop:
+                self._piece = self._cycle[self._cycle_index]
+                self._cycle_index = 1 - self._cycle_index
+                self._offset = 0
+        return filled
+
+    def close(self):
+        self.track = self.seam = None
+
+
+def _load_track(path, rate: int, channels: int, duration: float) -> np.ndarray:
+    """The whole track at rate/channels: the cached memmap when the format
+    matches, else one in-memory copy sized from the probed duration"""
+    from pcm_cache import PCMSource, open_track
+
+    reader = open_track(path, rate, channels)
+    if isinstance(reader, PCMSource):
+        return reader.samples
+
+    track = np.empty((int(duration * rate) + rate, channels), dtype=np.float32)
+    try:
+        frames = reader.read(track)
+    finally:
+        reader.close()
+    return track[:frames]
+
+
+def looping_source(path, rate: int, channels: int, duration: Optional[float] = None,
+                   cache: Optional[LoopPointCache] = None) -> LoopingSource:
+    """LoopingSource over path using its cached loop points"""
+    if duration is None:
+        from media_probe import probe_duration
+        duration = probe_duration(path)
+
+    points = (cache or LoopPointCache()).points(path)
+    track = _load_track(path, rate, channels, duration)
+    return LoopingSource(track, rate, points["loop_start"], points["loop_end"])
@@ -482,21 +482,19 @@ def _elevenlabs_tts(text: str, output_path: Path) -> Path:
     """Low-level ElevenLabs call so we can retry with shorter text if needed."""
     from elevenlabs import ElevenLabs
 
+    from audio_mixer import TTS_OUTPUT_FORMAT, save_tts_audio
+
     client = ElevenLabs(api_key=os.getenv("ELEVENLABS_API_KEY"))
     voice_id = os.getenv("ELEVENLABS_VOICE_ID", "21m00Tcm4TlvDq8ikWAM")  # Rachel
     model_id = os.getenv("ELEVENLABS_MODEL_ID", "eleven_monolingual_v1")
 
     logger.info(f"[TTS] Generating narration with voice {voice_id}")
-    audio_stream = client.text_to_speech.convert(text=text[:6000], voice_id=voice_id, model_id=model_id)
-
-    bytes_written = 0
-    with open(output_path, "wb") as f:
-        for chunk in audio_stream:
-            if chunk:
-                f.write(chunk)
-                bytes_written += len(chunk)
+    audio_stream = client.text_to_speech.convert(text=text[:6000], voice_id=voice_id, model_id=model_id,
+                                                 output_format=TTS_OUTPUT_FORMAT)
 
-    logger.info(f"[TTS] Saved {output_path.name} ({bytes_written} bytes)")
+    # PCM formats land as narration.wav: no lossy generation before the final mux
+    output_path = save_tts_audio(audio_stream, output_path, TTS_OUTPUT_FORMAT)
+    logger.info(f"[TTS] Saved {output_path.name} ({output_path.stat().st_size} bytes)")
     return output_path
 
 
@@ -580,8 +578,12 @@ def create_silent_audio(text: str, output_path: Optional[Path] = None) -> Path:
 
 
 def mix_audio(narration_path: Path, music_path: Path, music_db: float = -18.0) -> Path:
-    """Mix narration with background music using ffmpeg if available."""
-    mixed_path = OUTPUT_DIR / "narration_with_bgm.mp3"
+    """Mix narration with background music using ffmpeg if available.
+
+    The mix is an intermediate, so it stays float PCM; the video's AAC
+    encode is the only lossy one.
+    """
+    mixed_path = OUTPUT_DIR / "narration_with_bgm.wav"
     cmd = [
         ffmpeg_bin(),
         "-y",
@@ -592,7 +594,7 @@ def mix_audio(narration_path: Path, music_path: Path, music_db: float = -18.0) -
         "-filter_complex",
         f"[1:a]volume={music_db}dB[bgm];[0:a][bgm]amix=inputs=2:duration=first:dropout_transition=2",
         "-c:a",
-        "mp3",
+        "pcm_f32le",
         str(mixed_path),
     ]
     ok, _ = run_cmd(cmd, "ffmpeg audio mix", timeout=120)
@@ -624,13 +626,50 @@ def generate_placeholder_bgm(duration_seconds: float) -> Path:
     return bgm_path
 
 
-def generate_runway_clips(image_entries: List[Dict], motion_prompt: str = "Cinematic pan and subtle zoom, 3 seconds") -> List[Path]:
+MOTION_TYPES_CYCLE = ("zoom_in", "pan_right", "zoom_out", "pan_left", "parallax")
+
+
+def generate_local_motion_clip(entry: Dict, idx: int, output_dir: Path, duration: float = 3.0) -> Optional[Path]:
+    """Render a Ken Burns clip from the entry's local image (no API call, no cost)."""
+    from local_renderer import encode_motion_clip
+
+    img_path = entry.get("path")
+    if not img_path or not Path(img_path).exists():
+        logger.warning(f"[MOTION] Clip {idx}: no local image, skipping")
+        return None
+
+    clip_path = output_dir / f"motion_clip_{idx:02d}.mp4"
+    motion = entry.get("motion", MOTION_TYPES_CYCLE[(idx - 1) % len(MOTION_TYPES_CYCLE)])
+    try:
+        start = time.time()
+        encode_motion_clip(clip_path, {
+            "image": img_path,
+            "duration": duration,
+            "width": 1920,
+            "height": 1080,
+            "fps": 24,
+            "motion": motion,
+        })
+        logger.info(f"[MOTION] Saved {clip_path} ({motion}, {time.time() - start:.1f}s)")
+        return clip_path
+    except Exception as exc:
+        logger.error(f"[MOTION] Failed clip {idx}: {exc}")
+        return None
+
+
+def generate_runway_clips(image_entries: List[Dict], motion_prompt: str = "Cinematic pan and subtle zoom, 3 seconds",
+                          backend: Optional[str] = None) -> List[Path]:
     """
     Generate short clips from images using Runway image_to_video.
     Returns list of downloaded mp4 paths.
+
+    backend (or MOTION_BACKEND) picks the motion source: "runway" (default),
+    "local" for the local Ken Burns engine, or "auto" to go local whenever
+    Runway is unavailable. An entry's own "motion_backend" overrides it per shot.
     """
+    backend = backend or os.getenv("MOTION_BACKEND", "runway")
     api_key = os.getenv("RUNWAY_API_KEY")
-    if not api_key:
+    if not api_key and backend == "runway" and not any(e.get("motion_backend") == "local" for e in image_entries):
         logger.warning("[RUNWAY] RUNWAY_API_KEY missing; skipping Runway clips.")
         return []
 
@@ -647,6 +686,15 @@ def generate_runway_clips(image_entries: List[Dict], motion_prompt: str = "Cinem
     clip_paths: List[Path] = []
 
     for idx, entry in enumerate(image_entries, start=1):
+        shot_backend = entry.get("motion_backend", backend)
+        if shot_backend == "local" or (shot_backend == "auto" and not api_key):
+            clip_path = generate_local_motion_clip(entry, idx, output_dir)
+            if clip_path:
+                clip_paths.append(clip_path)
+            continue
+        if not api_key:
+            continue
+
         img_url = entry.get("url")
         if not img_url:
             continue
@@ -699,37 +747,89 @@ def generate_runway_clips(image_entries: List[Dict], motion_prompt: str = "Cinem
 # ---------------------------------------------------------------------------
 # Phase 5: Assembly (MoviePy)
 # ---------------------------------------------------------------------------
-def assemble_video(image_paths: List[Path], narration_path: Path, title: str) -> Path:
+def assemble_video_parallel(image_paths: List[Path], narration_path: Path, duration: float,
+                            output_path: Path, workers: Optional[int] = None) -> Path:
+    """Encode one segment per image across CPU cores, then concat -c copy with narration.
+
+    Like the MoviePy path, every image is held at least 3 s; when that runs
+    past the narration, the narration is padded with silence rather than
+    cutting the last images off.
+    """
+    from local_renderer import default_workers, encode_still_clip, encoder_threads, render_parallel
+    from PIL import Image
+
+    workers = workers or default_workers()
+    per_image = max(duration / max(len(image_paths), 1), 3.0)
+
+    # Same geometry as the MoviePy path: first image's aspect ratio at 1080p
+    with Image.open(image_paths[0]) as im:
+        width = int(round(im.width * 1080 / im.height / 2)) * 2
+    chunks = [
+        {
+            "image": str(path),
+            "duration": per_image,
+            "width": width,
+            "height": 1080,
+            "fps": 24,
+            "threads": encoder_threads(workers),
+        }
+        for path in image_paths
+    ]
+
+    logger.info(f"[VIDEO] Rendering {len(chunks)} segments with {workers} workers ...")
+    stats = render_parallel(encode_still_clip, chunks, output_path, audio_path=narration_path,
+                            workers=workers, pad_audio_to=per_image * len(chunks))
+    logger.info(
+        f"[VIDEO] Parallel render complete: {stats['frames']} frames in "
+        f"{stats['elapsed_seconds']:.1f}s ({stats['fps']:.0f} fps)"
+    )
+    return output_path
+
+
+def assemble_video(image_paths: List[Path], narration_path: Path, title: str,
+                   workers: Optional[int] = None) -> Path:
     """Assemble a simple slideshow video with narration."""
     from moviepy.audio.io.AudioFileClip import AudioFileClip
     from moviepy.video.io.ImageSequenceClip import ImageSequenceClip
     from PIL import Image
 
-    # Normalize image sizes
-    uniform_dir = OUTPUT_DIR / "temp_uniform_images"
-    uniform_dir.mkdir(parents=True, exist_ok=True)
-    target_size = None
-    uniform_paths = []
-    for idx, img_path in enumerate(image_paths, start=1):
+    output_path = OUTPUT_DIR / "final_video.mp4"
+    if os.getenv("MVP_RENDERER", "parallel") == "parallel" and image_paths:
+        try:
+            from media_probe import probe_duration
+
+            duration = probe_duration(narration_path)
+            return assemble_video_parallel(image_paths, narration_path, duration, output_path, workers)
+        except Exception as exc:
+            logger.warning(f"[VIDEO] Parallel render failed, falling back to MoviePy: {exc}")
+
+    import numpy as np
+    from frame_cache import default_cache
+
+    # Normalize image sizes (cached frames, resized to the first image's size)
+    with Image.open(image_paths[0]) as im:
+        target_size = im.size
+
+    def normalize(img_path: str):
         with Image.open(img_path) as im:
-            if target_size is None:
-                target_size = im.size
-            resized = im.resize(target_size)
-            out_path = uniform_dir / f"uniform_{idx:02d}.png"
-            resized.save(out_path)
-            uniform_paths.append(out_path)
+            return np.asarray(im.convert("RGB").resize(target_size))
+
+    cache = default_cache()
+    frames = [
+        cache.get(img_path, target_size[0], target_size[1], "stretch", "rgb24", normalize)
+        for img_path in image_paths
+    ]
 
     audio_clip = AudioFileClip(str(narration_path))
     duration = audio_clip.duration
-    per_image = max(duration / max(len(uniform_paths), 1), 3.0)
+    per_image = max(duration / max(len(frames), 1), 3.0)
 
-    clip = ImageSequenceClip([str(p) for p in uniform_paths], durations=[per_image] * len(uniform_paths))
+    clip = ImageSequenceClip(frames, durations=[per_image] * len(frames))
     if hasattr(clip, "resized"):
         clip = clip.resized(height=1080)
     if hasattr(clip, "with_audio"):
         clip = clip.with_audio(audio_clip)
 
-    output_path = OUTPUT_DIR / "final_video.mp4"
     logger.info("[VIDEO] Rendering final_video.mp4 ... this may take a minute")
     clip.write_videofile(
         str(output_path),
@@ -791,22 +891,11 @@ def run_pipeline(url: str, upload: bool = False, skip_openrouter: bool = False):
 
     audio_duration = None
     try:
-        from mutagen import File  # type: ignore
+        from media_probe import probe_duration
 
-        audio_info = File(str(narration_path))
-        if audio_info and getattr(audio_info, "info", None):
-            audio_duration = getattr(audio_info.info, "length", None)
+        audio_duration = probe_duration(narration_path)
     except Exception as exc:
-        logger.warning(f"[AUDIO] Could not read narration duration via mutagen: {exc}")
-
-    if audio_duration is None:
-        try:
-            from moviepy.audio.io.AudioFileClip import AudioFileClip
-
-            with AudioFileClip(str(narration_path)) as clip_duration:
-                audio_duration = clip_duration.duration
-        except Exception as exc:
-            logger.warning(f"[AUDIO] Could not read narration duration via moviepy: {exc}")
+        logger.warning(f"[AUDIO] Could not probe narration duration: {exc}")
 
     if audio_duration is None:
         audio_duration = max(len(narration_text.split()) / 2.5, 30)  # fallback estimate
@@ -881,7 +970,8 @@ def run_pipeline(url: str, upload: bool = False, skip_openrouter: bool = False):
     # Cost estimate
     flux_count = len([p for p in images if "nano_" not in p.name])
     nano_count = len([p for p in images if "nano_" in p.name])
-    runway_count = len(runway_clips)
+    # Local motion clips are free; only Runway renders are billed
+    runway_count = sum(1 for p in runway_clips if not p.name.startswith("motion_clip_"))
     flux_cost = flux_count * float(os.getenv("COST_FLUX", "0.06"))
     nano_cost = nano_count * float(os.getenv("COST_NANO", "0.03"))
     runway_cost = runway_count * float(os.getenv("COST_RUNWAY", "0.08"))
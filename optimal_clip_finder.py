@@ -0,0 +1,500 @@
+#!/usr/bin/env python3
+"""
+Optimal Clip Finder
+Find the best N-second background music clip in a longer track
+
+Analysis is one streaming pass over the decoded audio (mono float32 from
+ffmpeg, in blocks; resampled from the PCM cache) with a NumPy STFT
+(music_features.SpectrumStream):
+
+- Per-hop power gives 1 s energy segments and silence runs
+- Spectral flux on the log-magnitude STFT is the onset envelope; its
+  autocorrelation gives the tempo and a phase search the beat grid
+  (music_features.tempo_period / beat_grid, shared with the library)
+- Energy in the speech fundamental band (85-255 Hz) against total energy is
+  the narration conflict score, overall and per second
+
+Candidate windows start on beats and transitions. All of them are scored at
+once from cumulative sums of the per-second curves, so scoring cost does not
+grow with the clip length.
+
+Analyses are cached as JSON keyed by the file's content hash (json_cache),
+so re-analysing a music library only decodes new or changed files.
+
+Environment:
+    MUSIC_ANALYSIS_CACHE_DIR  Cache directory (default: .cache/music_analysis)
+    MUSIC_ANALYSIS_CACHE      Set to 0 to disable caching
+"""
+
+import json
+import subprocess
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from frame_cache import file_content_hash
+from json_cache import JsonCache
+from local_renderer import ffmpeg_bin
+from music_features import SpectrumStream, beat_grid, tempo_period
+from pcm_cache import open_track
+
+# Analysis resolution
+ANALYSIS_RATE = 22050
+N_FFT = 2048
+HOP = 512
+
+# Speech fundamental band used for the narration conflict score
+SPEECH_BAND = (85.0, 255.0)
+
+# Silence detection (matches the old pydub detect_nonsilent settings)
+SILENCE_THRESH_DB = -45.0
+MIN_SILENCE_LEN = 0.5
+
+# Bump when the analysis output changes so stale cache entries are ignored
+ANALYSIS_VERSION = 3
+
+
+def default_analysis_cache() -> JsonCache:
+    """Analysis cache configured from the environment"""
+    return JsonCache.from_env("MUSIC_ANALYSIS_CACHE", ".cache/music_analysis",
+                              version=ANALYSIS_VERSION)
+
+
+class OptimalClipFinder:
+    """
+    Vectorized audio analyzer for finding optimal background music clips
+    """
+
+    def __init__(self, target_duration=82.0, cache: Optional[JsonCache] = None):
+        """
+        Initialize the clip finder
+
+        Args:
+            target_duration: Target clip duration in seconds (default: 82)
+            cache: Analysis cache (default: from environment)
+        """
+        self.target_duration = target_duration
+        self.cache = cache or default_analysis_cache()
+
+    def analyze_audio(self, file_path: str) -> Dict:
+        """
+        Analyze tempo, beats, energy, transitions, speech conflict and silence
+
+        Args:
+            file_path: Path to audio file
+
+        Returns:
+            analysis_data: Complete analysis results (cached by content)
+        """
+        digest = file_content_hash(file_path)
+        cached = self.cache.get(digest)
+        if cached is not None:
+            print(f"  [CACHED] {Path(file_path).name}")
+            cached['file_path'] = str(file_path)
+            return cached
+
+        print(f"\n{'='*80}")
+        print(f"Analyzing: {Path(file_path).name}")
+        print(f"{'='*80}\n")
+
+        features = self._stream_features(file_path)
+        sr = ANALYSIS_RATE
+        duration = features['samples'] / sr
+        frame_rate = sr / HOP
+
+        print(f"Duration: {duration:.2f}s")
+
+        tempo, beat_times = self._detect_tempo_beats(features['flux'], frame_rate)
+        energy_segments = self._energy_segments(features['hop_power'], duration)
+        transitions = self._detect_transitions(features['flux'], frame_rate)
+        freq_analysis = self._analyze_frequency(features, duration)
+        silence_sections = self._detect_silence(features['hop_power'], duration)
+
+        print(f"  Tempo: {tempo:.2f} BPM ({len(beat_times)} beats)")
+        print(f"  Transitions detected: {len(transitions)}")
+        print(f"  Speech frequency conflict: {freq_analysis['conflict_score']:.2f}%")
+        print(f"  Non-silent sections: {len(silence_sections)}")
+
+        analysis = {
+            'file_path': str(file_path),
+            'duration': duration,
+            'sample_rate': sr,
+            'tempo': tempo,
+            'beat_times': beat_times.tolist(),
+            'energy_segments': energy_segments,
+            'transitions': transitions.tolist(),
+            'frequency_analysis': freq_analysis,
+            'silence_sections': silence_sections
+        }
+        self.cache.put(digest, analysis)
+        return analysis
+
+    def _stream_features(self, file_path: str) -> Dict:
+        """
+        Decode in blocks and collect per-hop power and per-frame STFT features
+
+        STFT frames (SpectrumStream) are N_FFT samples every HOP samples.
+        """
+        sr = ANALYSIS_RATE
+        freqs = np.fft.rfftfreq(N_FFT, 1.0 / sr)
+        speech_bins = (freqs >= SPEECH_BAND[0]) & (freqs <= SPEECH_BAND[1])
+        stft = SpectrumStream(N_FFT, HOP)
+
+        hop_power, flux, speech, total, centroid = [], [], [], [], []
+        samples = 0
+
+        decoder = open_track(file_path, sr, 1)
+        block = np.empty((HOP * 256, 1), dtype=np.float32)
+        pending = np.empty(0, dtype=np.float32)
+        try:
+            while True:
+                got = decoder.read(block)
+                if got == 0:
+                    break
+                samples += got
+                x = block[:got, 0]
+
+                # Exact power per non-overlapping hop (energy + silence)
+                data = np.concatenate((pending, x))
+                whole = len(data) // HOP * HOP
+                hop_power.append(np.mean(np.square(data[:whole].reshape(-1, HOP)), axis=1))
+                pending = data[whole:].copy()
+
+                spectrum = stft.add(x)
+                if spectrum is None:
+                    continue
+                mag, frame_flux = spectrum
+                flux.append(frame_flux)
+
+                power = np.square(mag)
+                speech.append(power[:, speech_bins].sum(axis=1))
+                total.append(power.sum(axis=1))
+                centroid.append((mag @ freqs) / np.maximum(mag.sum(axis=1), 1e-12))
+        finally:
+            decoder.close()
+
+        def joined(parts):
+            return np.concatenate(parts) if parts else np.zeros(0, dtype=np.float32)
+
+        return {
+            'samples': samples,
+            'hop_power': joined(hop_power),
+            'flux': joined(flux),
+            'speech_energy': joined(speech),
+            'total_energy': joined(total),
+            'centroid': joined(centroid)
+        }
+
+    def _detect_tempo_beats(self, flux: np.ndarray, frame_rate: float):
+        """Tempo from the onset envelope autocorrelation; beats from a phase search"""
+        period, beat_frames = beat_grid(flux, tempo_period(flux, frame_rate))
+        if not period:
+            return 0.0, np.zeros(0)
+        return float(60.0 * frame_rate / period), self._frame_times(beat_frames, frame_rate)
+
+    def _energy_segments(self, hop_power: np.ndarray, duration: float,
+                         segment_duration: float = 1.0) -> List[Dict]:
+        """RMS energy per segment_duration window"""
+        per_segment = self._binned(hop_power, segment_duration, mean=True)
+        rms_db = 10.0 * np.log10(np.maximum(per_segment, 1e-10))
+        starts = np.arange(len(per_segment)) * segment_duration
+
+        # Drop a trailing partial segment shorter than half a window
+        keep = np.minimum(starts + segment_duration, duration) - starts >= segment_duration / 2
+        return [
+            {
+                'start': float(start),
+                'end': float(min(start + segment_duration, duration)),
+                'energy_db': float(db),
+                'energy_normalized': float((db + 60) / 60)
+            }
+            for start, db in zip(starts[keep], rms_db[keep])
+        ]
+
+    @staticmethod
+    def _binned(values: np.ndarray, seconds: float, mean: bool = False) -> np.ndarray:
+        """Sum (or mean) of per-hop values over consecutive `seconds`-long bins"""
+        if len(values) == 0:
+            return np.zeros(0)
+        bins = (np.arange(len(values)) * (HOP / ANALYSIS_RATE) // seconds).astype(np.intp)
+        sums = np.bincount(bins, weights=values)
+        return sums / np.bincount(bins) if mean else sums
+
+    def _detect_transitions(self, flux: np.ndarray, frame_rate: float,
+                            threshold: float = 2.0) -> np.ndarray:
+        """Onset peaks well above the typical spectral flux"""
+        if len(flux) < 3:
+            return np.zeros(0)
+        limit = flux.mean() + threshold * flux.std()
+        mid = flux[1:-1]
+        peaks = np.flatnonzero((mid > flux[:-2]) & (mid >= flux[2:]) & (mid > limit)) + 1
+        return self._frame_times(peaks, frame_rate)
+
+    @staticmethod
+    def _frame_times(frames: np.ndarray, frame_rate: float) -> np.ndarray:
+        """Onset time of flux frames: an onset registers as it enters the end
+        of a frame, and frame i ends one hop after i * HOP"""
+        return (np.asarray(frames, dtype=np.float64) + 1) / frame_rate
+
+    def _analyze_frequency(self, features: Dict, duration: float) -> Dict:
+        """Share of spectral energy in the speech band, overall and per second"""
+        speech = features['speech_energy']
+        total = features['total_energy']
+        conflict_score = 100.0 * speech.sum() / max(total.sum(), 1e-12)
+
+        per_speech = self._binned(speech, 1.0)
+        per_total = self._binned(total, 1.0)
+        conflict_curve = 100.0 * per_speech / np.maximum(per_total, 1e-12)
+        centroid = features['centroid']
+
+        return {
+            'conflict_score': float(conflict_score),
+            'conflict_curve': np.round(conflict_curve, 3).tolist(),
+            'avg_centroid': float(centroid.mean()) if len(centroid) else 0.0,
+            'recommendation': 'good' if conflict_score < 30 else 'caution'
+        }
+
+    def _detect_silence(self, hop_power: np.ndarray, duration: float) -> List[List[float]]:
+        """Non-silent sections as [start, end] seconds (like detect_nonsilent)"""
+        hop_sec = HOP / ANALYSIS_RATE
+        quiet = 10.0 * np.log10(np.maximum(hop_power, 1e-10)) < SILENCE_THRESH_DB
+
+        # Silent runs long enough to count, as [start, end) hop indices
+        edges = np.diff(np.concatenate(([0], quiet.astype(np.int8), [0])))
+        run_starts = np.flatnonzero(edges == 1)
+        run_ends = np.flatnonzero(edges == -1)
+        long_runs = (run_ends - run_starts) * hop_sec >= MIN_SILENCE_LEN
+        run_starts, run_ends = run_starts[long_runs], run_ends[long_runs]
+
+        sections = []
+        cursor = 0.0
+        for s, e in zip(run_starts * hop_sec, run_ends * hop_sec):
+            if s > cursor:
+                sections.append([float(cursor), float(s)])
+            cursor = e
+        if cursor < duration:
+            sections.append([float(cursor), float(duration)])
+        return sections
+
+    def find_optimal_clips(self, analysis_data: Dict, num_clips=5) -> List[Dict]:
+        """
+        Find optimal clips based on analysis
+
+        Args:
+            analysis_data: Analysis results from analyze_audio()
+            num_clips: Number of top clips to return
+
+        Returns:
+            clips: List of optimal clip candidates with scores
+        """
+        print(f"\n{'='*80}")
+        print(f"Finding optimal {self.target_duration}s clips...")
+        print(f"{'='*80}\n")
+
+        duration = analysis_data['duration']
+        starts = np.unique(np.concatenate((
+            np.asarray(analysis_data['beat_times'], dtype=np.float64),
+            np.asarray(analysis_data['transitions'], dtype=np.float64)
+        )))
+        starts = starts[starts + self.target_duration <= duration]
+        if len(starts) == 0 and duration >= self.target_duration:
+            starts = np.zeros(1)
+
+        scores = self._score_clips(starts, analysis_data)
+        order = np.argsort(-scores['total'], kind='stable')
+
+        # Best-first, skipping clips within 1 second of one already taken
+        top_clips = []
+        for i in order:
+            start = starts[i]
+            if any(abs(start - clip['start']) < 1.0 for clip in top_clips):
+                continue
+            top_clips.append({
+                'start': float(start),
+                'end': float(start + self.target_duration),
+                'duration': self.target_duration,
+                'score': float(scores['total'][i]),
+                'score_breakdown': {name: float(values[i]) for name, values in scores.items()}
+            })
+            if len(top_clips) == num_clips:
+                break
+
+        print(f"Found {len(top_clips)} optimal clips ({len(starts)} candidates):\n")
+        for i, clip in enumerate(top_clips, 1):
+            print(f"{i}. Start: {clip['start']:.2f}s | Score: {clip['score']:.2f}")
+            print(f"   Energy: {clip['score_breakdown']['energy_score']:.2f}")
+            print(f"   Consistency: {clip['score_breakdown']['consistency_score']:.2f}")
+            print(f"   Alignment: {clip['score_breakdown']['alignment_score']:.2f}")
+            print(f"   Frequency: {clip['score_breakdown']['frequency_score']:.2f}")
+            print()
+
+        return top_clips
+
+    def _score_clips(self, starts: np.ndarray, analysis_data: Dict) -> Dict[str, np.ndarray]:
+        """
+        Score every candidate window at once
+
+        Per-second curves are turned into cumulative sums, so each window's
+        mean/variance is two lookups: window [s, s + D) covers the whole
+        1 s segments ceil(s) .. floor(s + D).
+        """
+        ends = starts + self.target_duration
+        segments = analysis_data['energy_segments']
+        energy = np.array([s['energy_normalized'] for s in segments], dtype=np.float64)
+        seg_starts = np.array([s['start'] for s in segments], dtype=np.float64)
+        seg_ends = np.array([s['end'] for s in segments], dtype=np.float64)
+
+        # Segments fully inside each window: first .. last - 1
+        first = np.searchsorted(seg_starts, starts, side='left')
+        last = np.maximum(np.searchsorted(seg_ends, ends, side='right'), first)
+        count = last - first
+
+        def window_sums(curve):
+            cumsum = np.concatenate(([0.0], np.cumsum(curve)))
+            return cumsum[last] - cumsum[first]
+
+        # 1. Energy score (prefer moderate energy around 0.4 for background)
+        safe = np.maximum(count, 1)
+        mean_energy = window_sums(energy) / safe
+        var_energy = np.maximum(window_sums(energy ** 2) / safe - mean_energy ** 2, 0.0)
+        std_energy = np.sqrt(var_energy)
+        energy_score = np.where(count > 0, np.maximum(0.0, 100 * (1 - np.abs(mean_energy - 0.4) / 0.4)), 0.0)
+
+        # 2. Consistency score (low variance is better)
+        consistency_score = 100 * (1 - np.minimum(std_energy * 2, 1.0))
+
+        # 3. Musical alignment (start/end distance to the nearest beat)
+        beat_times = np.asarray(analysis_data['beat_times'], dtype=np.float64)
+        if len(beat_times):
+            alignment_score = (self._beat_alignment(beat_times, starts) +
+                               self._beat_alignment(beat_times, ends)) / 2
+        else:
+            alignment_score = np.zeros(len(starts))
+
+        # 4. Frequency score (low speech-band conflict inside the window)
+        freq_data = analysis_data['frequency_analysis']
+        curve = np.asarray(freq_data.get('conflict_curve', []), dtype=np.float64)
+        if len(curve) >= len(energy) and len(energy):
+            conflict = np.where(count > 0, window_sums(curve[:len(energy)]) / safe,
+                                freq_data['conflict_score'])
+        else:
+            conflict = np.full(len(starts), freq_data['conflict_score'])
+        frequency_score = 100 * (1 - np.minimum(conflict / 100, 1.0))
+
+        # 5. No-silence score: any silent gap (between non-silent sections) in the window
+        sections = np.asarray(analysis_data['silence_sections'], dtype=np.float64).reshape(-1, 2)
+        bounds = np.concatenate(([0.0], sections.ravel(), [analysis_data['duration']]))
+        gap_starts, gap_ends = bounds[0::2], bounds[1::2]
+        real = gap_ends > gap_starts
+        gap_starts, gap_ends = gap_starts[real], gap_ends[real]
+        # Gaps are sorted and disjoint: overlaps = gaps starting before end - gaps ending by start
+        overlapping = (np.searchsorted(gap_starts, ends, side='left') -
+                       np.searchsorted(gap_ends, starts, side='right'))
+        silence_score = np.where(overlapping > 0, 50.0, 100.0)
+
+        total = (
+            energy_score * 0.25 +
+            consistency_score * 0.25 +
+            alignment_score * 0.20 +
+            frequency_score * 0.20 +
+            silence_score * 0.10
+        )
+
+        return {
+            'energy_score': energy_score,
+            'consistency_score': consistency_score,
+            'alignment_score': alignment_score,
+            'frequency_score': frequency_score,
+            'silence_score': silence_score,
+            'total': total
+        }
+
+    @staticmethod
+    def _beat_alignment(beat_times: np.ndarray, times: np.ndarray) -> np.ndarray:
+        """100 on a beat, falling to 0 at one second away"""
+        idx = np.searchsorted(beat_times, times)
+        before = beat_times[np.maximum(idx - 1, 0)]
+        after = beat_times[np.minimum(idx, len(beat_times) - 1)]
+        nearest = np.minimum(np.abs(times - before), np.abs(after - times))
+        return 100 * (1 - np.minimum(nearest, 1.0))
+
+    def extract_clip(self, file_path: str, start_time: float, output_path: str):
+        """
+        Extract the selected clip to a file
+
+        Args:
+            file_path: Source audio file
+            start_time: Start time in seconds
+            output_path: Output file path
+        """
+        print(f"\nExtracting clip...")
+        print(f"  Source: {Path(file_path).name}")
+        print(f"  Start: {start_time:.2f}s")
+        print(f"  Duration: {self.target_duration}s")
+        print(f"  Output: {output_path}")
+
+        # Input-side seek: only the clip is decoded and re-encoded
+        cmd = [ffmpeg_bin(), '-y', '-hide_banner', '-loglevel', 'error',
+               '-ss', f"{start_time:.3f}", '-t', f"{self.target_duration:.3f}",
+               '-i', str(file_path), '-vn', '-c:a', 'libmp3lame', '-q:a', '0',
+               str(output_path)]
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        if result.returncode != 0:
+            raise RuntimeError(f"Clip extraction failed: {result.stderr[-2000:]}")
+
+        print(f"  Clip extracted successfully!")
+
+        return output_path
+
+    def save_analysis(self, analysis_data: Dict, clips: List[Dict], output_file: str):
+        """Save analysis results to JSON"""
+        report = {
+            'analysis': analysis_data,
+            'optimal_clips': clips,
+            'target_duration': self.target_duration
+        }
+
+        with open(output_file, 'w') as f:
+            json.dump(report, f, indent=2)
+
+        print(f"\nAnalysis saved to: {output_file}")
+
+        return output_file
+
+
+def main():
+    """Example usage"""
+    import sys
+
+    if len(sys.argv) < 2:
+        print("Usage: python optimal_clip_finder.py <audio_file> [duration]")
+        print("\nExample:")
+        print("  python optimal_clip_finder.py background_music.mp3 82")
+        sys.exit(1)
+
+    file_path = sys.argv[1]
+
+    if not Path(file_path).exists():
+        print(f"Error: File not found: {file_path}")
+        sys.exit(1)
+
+    finder = OptimalClipFinder(target_duration=float(sys.argv[2]) if len(sys.argv) > 2 else 82.0)
+    analysis = finder.analyze_audio(file_path)
+    clips = finder.find_optimal_clips(analysis, num_clips=5)
+
+    output_json = f"{Path(file_path).stem}_analysis.json"
+    finder.save_analysis(analysis, clips, output_json)
+
+    if clips:
+        best_clip = clips[0]
+        output_mp3 = f"{Path(file_path).stem}_best_{int(finder.target_duration)}s.mp3"
+        finder.extract_clip(file_path, best_clip['start'], output_mp3)
+
+    print(f"\n{'='*80}")
+    print("ANALYSIS COMPLETE")
+    print(f"{'='*80}\n")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+Decoded-PCM cache for music tracks
+
+The same background tracks are mixed into every video and every platform
+export. PCMCache decodes each one once, at its native sample rate and
+channel count, into a raw float32 file with a 16-byte header:
+
+    b"PCMF" | version u16 | channels u16 | sample_rate u32 | reserved u32
+
+followed by interleaved float32 samples. ffmpeg writes straight into the
+file after the header, so decoding is constant-memory, and readers map it
+with numpy.memmap (frames x channels) without copying.
+
+Consumers that need another rate or layout (the analyzers' mono low-rate
+envelopes, loudness measurement) feed the cached PCM to ffmpeg as raw
+input, which only resamples; the MP3 is never decoded twice.
+
+Entries are keyed by the source's content hash. The cache is size-bounded:
+hits refresh mtime and the least recently used files are evicted.
+
+Environment:
+    PCM_CACHE_DIR     Cache directory (default: .cache/pcm)
+    PCM_CACHE_MAX_GB  Size limit in GB (default: 4)
+    PCM_CACHE         Set to 0 to disable caching
+"""
+
+import os
+import struct
+import subprocess
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from frame_cache import file_content_hash
+from local_renderer import ffmpeg_bin
+
+MAGIC = b"PCMF"
+VERSION = 1
+HEADER = struct.Struct("<4sHHII")  # 16 bytes keeps the samples 4-byte aligned
+
+
+class PCMEntry:
+    """One cached track: header fields plus zero-copy access to the samples"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            magic, version, channels, rate, _ = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC or version != VERSION or channels == 0:
+            raise ValueError(f"Not a PCM cache file: {path}")
+        self.channels = channels
+        self.sample_rate = rate
+        self.frames = (self.path.stat().st_size - HEADER.size) // (4 * channels)
+
+    @property
+    def duration(self) -> float:
+        return self.frames / self.sample_rate
+
+    def array(self) -> np.ndarray:
+        """Read-only (frames x channels) float32 memmap"""
+        if self.frames == 0:
+            return np.zeros((0, self.channels), dtype=np.float32)
+        return np.memmap(self.path, dtype=np.float32, mode="r", offset=HEADER.size,
+                         shape=(self.frames, self.channels))
+
+    def ffmpeg_input(self) -> List[str]:
+        """ffmpeg input arguments that read this file as raw float32 PCM"""
+        return ['-f', 'f32le', '-ar', str(self.sample_rate), '-ac', str(self.channels),
+                '-skip_initial_bytes', str(HEADER.size), '-i', str(self.path)]
+
+
+class PCMCache:
+    """Disk cache of decoded tracks, keyed by source content"""
+
+    def __init__(self, cache_dir, max_bytes: int = 4 * 1024 ** 3, enabled: bool = True):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+
+        # (path, size, mtime_ns) -> content hash; several stages look up the same track
+        self._hashes: Dict[Tuple[str, int, int], str] = {}
+
+        if self.enabled:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def path_for(self, src_path) -> Path:
+        st = os.stat(src_path)
+        memo_key = (os.path.abspath(src_path), st.st_size, st.st_mtime_ns)
+        digest = self._hashes.get(memo_key)
+        if digest is None:
+            digest = self._hashes[memo_key] = file_content_hash(src_path)
+        return self.cache_dir / f"{digest}.pcm"
+
+    def lookup(self, src_path) -> Optional[PCMEntry]:
+        """Cached entry for src_path, or None (never decodes)"""
+        if not self.enabled:
+            return None
+        entry = self.path_for(src_path)
+        if not entry.exists():
+            return None
+        try:
+            pcm = PCMEntry(entry)
+        except (OSError, ValueError, struct.error):
+            entry.unlink(missing_ok=True)
+            return None
+        os.utime(entry)
+        return pcm
+
+    def get(self, src_path) -> PCMEntry:
+        """Cached entry for src_path, decoding it on a miss"""
+        if not self.enabled:
+            raise RuntimeError("PCM cache is disabled")
+
+        pcm = self.lookup(src_path)
+        if pcm is not None:
+            self.hits += 1
+            return pcm
+
+        self.misses += 1
+        entry = self.path_for(src_path)
+        self._decode(src_path, entry)
+        self.evict()
+        return PCMEntry(entry)
+
+    def _decode(self, src_path, entry: Path):
+        from media_probe import probe
+
+        info = probe(src_path)
+        if not info.sample_rate:
+            raise RuntimeError(f"No audio stream found in {src_path}")
+        rate, channels = info.sample_rate, info.channels or 2
+
+        # Write-then-rename so concurrent mixers never map a partial file
+        fd, tmp = tempfile.mkstemp(suffix='.pcm.tmp', dir=self.cache_dir)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(HEADER.pack(MAGIC, VERSION, channels, rate, 0))
+                f.flush()
+                result = subprocess.run(
+                    [ffmpeg_bin(), '-hide_banner', '-loglevel', 'error', '-i', str(src_path),
+                     '-vn', '-f', 'f32le', '-acodec', 'pcm_f32le',
+                     '-ar', str(rate), '-ac', str(channels), '-'],
+                    stdout=f, stderr=subprocess.PIPE
+                )
+            if result.returncode != 0:
+                raise RuntimeError(f"PCM decode failed for {src_path}: "
+                                   f"{result.stderr.decode('utf-8', errors='ignore')[-2000:]}")
+            os.replace(tmp, entry)
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+
+    def size_bytes(self) -> int:
+        return sum(p.stat().st_size for p in self.cache_dir.glob("*.pcm"))
+
+    def evict(self, max_bytes: Optional[int] = None) -> int:
+        """Delete least recently used tracks until the cache fits; returns files removed"""
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+
+        entries = []
+        total = 0
+        for p in self.cache_dir.glob("*.pcm"):
+            try:
+                st = p.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, p))
+            total += st.st_size
+
+        removed = 0
+        # Never evict the newest entry (the one just decoded), even if it alone is too big
+        for _, size, p in sorted(entries)[:-1]:
+            if total <= max_bytes:
+                break
+            p.unlink(missing_ok=True)
+            total -= size
+            removed += 1
+        return removed
+
+
+class PCMSource:
+    """Sequential block reader over a cached track (audio_mixer decoder interface)"""
+
+    def __init__(self, pcm: PCMEntry):
+        self.channels = pcm.channels
+        self.samples = pcm.array()
+        self._position = 0
+
+    def read(self, buffer: np.ndarray) -> int:
+        """Fill buffer (frames x channels) from the track; returns frames read"""
+        n = min(len(buffer), len(self.samples) - self._position)
+        buffer[:n] = self.samples[self._position:self._position + n]
+        self._position += n
+        return n
+
+    def close(self):
+        self.samples = None
+
+
+_default_cache: Optional[PCMCache] = None
+
+
+def default_pcm_cache() -> PCMCache:
+    """Process-wide PCMCache configured from the environment"""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = PCMCache(
+            os.getenv("PCM_CACHE_DIR", ".cache/pcm"),
+            max_bytes=int(float(os.getenv("PCM_CACHE_MAX_GB", "4")) * 1024 ** 3),
+            enabled=os.getenv("PCM_CACHE", "1") != "0"
+        )
+    return _default_cache
+
+
+def open_track(path, rate: int, channels: int, loop: bool = False):
+    """
+    Block reader for a music track at rate/channels, decoding it at most once
+
+    Matching the cached format gives a zero-copy memmap reader; otherwise
+    ffmpeg resamples the cached PCM. With the cache disabled (or failing),
+    this is the plain ffmpeg decoder.
+    """
+    from audio_mixer import _Decoder
+
+    cache = default_pcm_cache()
+    if cache.enabled:
+        try:
+            pcm = cache.get(path)
+        except (OSError, RuntimeError) as e:
+            print(f"  [WARNING] PCM cache unavailable for {Path(path).name}: {e}")
+        else:
+            if pcm.sample_rate == rate and pcm.channels == channels and not loop:
+                return PCMSource(pcm)
+            return _Decoder(path, rate, channels, loop=loop, input_args=pcm.ffmpeg_input())
+    return _Decoder(path, rate, channels, loop=loop)
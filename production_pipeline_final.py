@@ -28,13 +28,38 @@ right now to automate their workflows, create stunning content, and solve comple
 Let's dive into the first tool that's revolutionizing how we interact with artificial intelligence.
 """
 
+# Subtitle styling: 1/3 size, bottom position, purple outline, NO box
+# FontSize 24 is original, so 1/3 = 8
+SUBTITLE_STYLE = (
+    "FontName=Arial,"
+    "FontSize=8,"  # 1/3 of original size
+    "PrimaryColour=&HFFFFFF,"  # White text
+    "OutlineColour=&HFF00FF,"  # Purple outline (BGR format)
+    "BackColour=&H00000000,"   # Fully transparent background
+    "BorderStyle=1,"           # Outline only (no box)
+    "Outline=1,"               # Thin outline
+    "Shadow=0,"                # No shadow
+    "MarginV=10"               # Very bottom of screen (10 pixels from bottom)
+)
+
+MUSIC_VOLUME = 0.15
+VIDEO_FPS = 30
+
 class FinalProductionPipeline:
-    def __init__(self):
+    def __init__(self, assembly="single_pass", compare_assembly=False):
+        """
+        Args:
+            assembly: "single_pass" (one ffmpeg filtergraph, one encode) or
+                      "multi_pass" (per-clip encodes, concats, mix, subtitle burn)
+            compare_assembly: Also run the other path and write a timing report
+        """
         self.output_dir = Path("output/production_final")
         self.output_dir.mkdir(parents=True, exist_ok=True)
         self.visuals_dir = self.output_dir / "visuals"
         self.visuals_dir.mkdir(exist_ok=True)
         self.music_dir = Path("background_music/Moderate-Recommended")
+        self.assembly = assembly
+        self.compare_assembly = compare_assembly
 
         print("\n" + "="*80)
         print("FINAL PRODUCTION PIPELINE - ALL FIXES APPLIED")
@@ -50,6 +75,7 @@ class FinalProductionPipeline:
 
         try:
             from elevenlabs.client import ElevenLabs
+            from audio_mixer import TTS_OUTPUT_FORMAT, save_tts_audio
 
             client = ElevenLabs(api_key=APIConfig.ELEVENLABS_API_KEY)
 
@@ -59,13 +85,12 @@ class FinalProductionPipeline:
             audio = client.text_to_speech.convert(
                 voice_id="EXAVITQu4vr4xnSDxMaL",
                 text=TEST_SCRIPT,
-                model_id="eleven_turbo_v2"
+                model_id="eleven_turbo_v2",
+                output_format=TTS_OUTPUT_FORMAT
             )
 
-            with open(narration_file, 'wb') as f:
-                for chunk in audio:
-                    if chunk:
-                        f.write(chunk)
+            # pcm_* formats are saved as narration.wav (lossless until the final mux)
+            narration_file = save_tts_audio(audio, narration_file, TTS_OUTPUT_FORMAT)
 
             # Get duration
             import subprocess
@@ -226,6 +251,180 @@ class FinalProductionPipeline:
         print("\n[5/6] Assembling Video...")
         print("-" * 80)
 
+        args = (visuals, narration_file, music_file, srt_file, narration_duration)
+        timings = {}
+        final_video = None
+
+        start = time.perf_counter()
+        mixed_audio = self.premix_ducked_audio(narration_file, music_file)
+        if mixed_audio:
+            timings["ducking"] = time.perf_counter() - start
+
+        if self.assembly == "single_pass":
+            start = time.perf_counter()
+            final_video = self.assemble_single_pass(*args, mixed_audio=mixed_audio)
+            timings["single_pass"] = time.perf_counter() - start
+
+            if not final_video:
+                print("[FALLBACK] Single-pass assembly failed, using multi-pass path")
+
+        if not final_video or self.compare_assembly:
+            # In compare mode the multi-pass result gets its own filename
+            final_name = ("final_production_video_multipass.mp4"
+                          if final_video else "final_production_video.mp4")
+            start = time.perf_counter()
+            multi_pass_video = self.assemble_multi_pass(*args, final_name=final_name,
+                                                        mixed_audio=mixed_audio)
+            timings["multi_pass"] = time.perf_counter() - start
+            final_video = final_video or multi_pass_video
+
+        if self.compare_assembly and self.assembly != "single_pass":
+            start = time.perf_counter()
+            self.assemble_single_pass(*args, final_name="final_production_video_single_pass.mp4",
+                                      mixed_audio=mixed_audio)
+            timings["single_pass"] = time.perf_counter() - start
+
+        self.write_assembly_report(timings, final_video)
+        return final_video
+
+    def premix_ducked_audio(self, narration_file, music_file):
+        """
+        Mix music under narration with sidechain ducking (MUSIC_VOLUME under
+        speech, louder in gaps). Returns the lossless premix, or None to use
+        the flat amix graph (MUSIC_DUCKING=0 or on failure).
+        """
+        from audio_mixer import DUCK_GAP_BOOST_DB, ducking_enabled, stream_mix, volume_to_db
+
+        if not ducking_enabled():
+            return None
+
+        mixed_audio = self.output_dir / "mixed_audio_ducked.wav"
+        try:
+            stats = stream_mix(music_file, narration_file, mixed_audio,
+                               music_gain_db=volume_to_db(MUSIC_VOLUME),
+                               gap_gain_db=volume_to_db(MUSIC_VOLUME) + DUCK_GAP_BOOST_DB,
+                               normalize=True)
+        except Exception as e:
+            print(f"[WARNING] Ducking failed ({e}), using flat music volume")
+            return None
+
+        print(f"[AUDIO] Music ducked under narration (+{DUCK_GAP_BOOST_DB:.0f} dB in gaps, "
+              f"{stats['realtime_factor']:.0f}x realtime)")
+        return mixed_audio
+
+    def build_single_pass_command(self, visuals, narration_file, music_file, srt_file,
+                                  narration_duration, output_file, mixed_audio=None):
+        """
+        Compile visuals, narration, music gain, loop-to-duration and subtitle
+        style into one ffmpeg command (single decode/filter/encode)
+
+        With mixed_audio (a ducked premix) the amix graph is replaced by that
+        single audio input.
+        """
+        # Images are fed through one ffconcat input; repeating the list covers
+        # the old "loop clips to narration length" step without extra encodes
+        visual_duration = sum(v['duration'] for v in visuals)
+        loops_needed = int(narration_duration / visual_duration) + 1
+
+        concat_file = self.visuals_dir / "single_pass_images.ffconcat"
+        with open(concat_file, 'w') as f:
+            f.write("ffconcat version 1.0\n")
+            for _ in range(loops_needed):
+                for visual in visuals:
+                    f.write(f"file '{Path(visual['file']).absolute().as_posix()}'\n")
+                    f.write(f"duration {visual['duration']}\n")
+            # Concat demuxer ignores the last duration unless the file repeats
+            f.write(f"file '{Path(visuals[-1]['file']).absolute().as_posix()}'\n")
+
+        video_chain = (
+            "[0:v]scale=1920:1080:force_original_aspect_ratio=decrease,"
+            "pad=1920:1080:(ow-iw)/2:(oh-ih)/2,setsar=1,"
+            f"fps={VIDEO_FPS},format=yuv420p"
+        )
+        if srt_file and srt_file.exists():
+            # Fix path for Windows
+            srt_path = str(srt_file.absolute()).replace('\\', '/').replace(':', '\\:')
+            video_chain += f",subtitles='{srt_path}':force_style='{SUBTITLE_STYLE}'"
+        video_chain += "[video]"
+
+        if mixed_audio:
+            audio_inputs = ['-i', str(mixed_audio)]
+            audio_chain = '[1:a]anull[audio]'
+        else:
+            audio_inputs = ['-i', str(narration_file), '-stream_loop', '-1', '-i', str(music_file)]
+            audio_chain = (
+                '[1:a]volume=1.0[narration];'
+                f'[2:a]volume={MUSIC_VOLUME}[music];'
+                '[narration][music]amix=inputs=2:duration=first:dropout_transition=2[audio]'
+            )
+
+        return [
+            'ffmpeg', '-y',
+            '-f', 'concat', '-safe', '0', '-i', str(concat_file),
+            *audio_inputs,
+            '-filter_complex', f"{video_chain};{audio_chain}",
+            '-map', '[video]',
+            '-map', '[audio]',
+            '-c:v', 'libx264',
+            '-pix_fmt', 'yuv420p',
+            '-c:a', 'aac',
+            '-b:a', '192k',
+            '-t', f"{narration_duration:.3f}",
+            '-movflags', '+faststart',
+            str(output_file)
+        ]
+
+    def assemble_single_pass(self, visuals, narration_file, music_file, srt_file,
+                             narration_duration, final_name="final_production_video.mp4",
+                             mixed_audio=None):
+        """One ffmpeg process: visuals + narration + music + subtitles, encoded once"""
+        import subprocess
+
+        final_video = self.output_dir / final_name
+        cmd = self.build_single_pass_command(visuals, narration_file, music_file, srt_file,
+                                             narration_duration, final_video, mixed_audio)
+
+        print(f"[SINGLE-PASS] {len(visuals)} images, looped to {narration_duration:.1f}s")
+        print(f"[AUDIO] Narration: 100% volume")
+        print(f"[AUDIO] Music: {MUSIC_VOLUME:.0%} volume (from {self.music_dir.name})")
+
+        result = subprocess.run(cmd, capture_output=True, text=True)
+
+        if result.returncode != 0:
+            print(f"[ERROR] Single-pass assembly failed: {result.stderr[-500:]}")
+            return None
+
+        if srt_file and srt_file.exists():
+            print(f"[OK] Subtitles embedded (1/3 size, bottom, purple outline)")
+        print(f"[OK] Single-pass assembly complete: {final_video.name}")
+        return final_video
+
+    def write_assembly_report(self, timings, final_video):
+        """Save assembly timings (and speedup when both paths ran)"""
+        report = {
+            "mode": self.assembly,
+            "output": str(final_video) if final_video else None,
+            "timings_seconds": {k: round(v, 2) for k, v in timings.items()},
+        }
+
+        if "single_pass" in timings and "multi_pass" in timings:
+            report["speedup"] = round(timings["multi_pass"] / max(timings["single_pass"], 1e-6), 2)
+            print(f"[TIMING] Single-pass: {timings['single_pass']:.1f}s | "
+                  f"Multi-pass: {timings['multi_pass']:.1f}s | "
+                  f"Speedup: {report['speedup']:.2f}x")
+        else:
+            for mode, seconds in timings.items():
+                print(f"[TIMING] {mode}: {seconds:.1f}s")
+
+        report_file = self.output_dir / "assembly_timing_report.json"
+        with open(report_file, 'w') as f:
+            json.dump(report, f, indent=2)
+
+        return report
+
+    def assemble_multi_pass(self, visuals, narration_file, music_file, srt_file, narration_duration,
+                            final_name="final_production_video.mp4", mixed_audio=None):
+        """Original path: per-clip encodes, concat, loop, amix, then subtitle burn-in"""
         import subprocess
 
         # Step 1: Create video clips from images
@@ -293,24 +492,37 @@ class FinalProductionPipeline:
         video_with_audio = self.output_dir / "video_with_audio.mp4"
 
         print(f"[AUDIO] Narration: 100% volume")
-        print(f"[AUDIO] Music: 15% volume (from {self.music_dir.name})")
+        print(f"[AUDIO] Music: {MUSIC_VOLUME:.0%} volume (from {self.music_dir.name})")
 
-        cmd = [
-            'ffmpeg', '-y',
-            '-i', str(video_extended),
-            '-i', str(narration_file),
-            '-i', str(music_file),
-            '-filter_complex',
-            '[1:a]volume=1.0[narration];'
-            '[2:a]volume=0.15[music];'
-            '[narration][music]amix=inputs=2:duration=first:dropout_transition=2[audio]',
-            '-map', '0:v',
-            '-map', '[audio]',
-            '-c:v', 'copy',
-            '-c:a', 'aac',
-            '-b:a', '192k',
-            str(video_with_audio)
-        ]
+        if mixed_audio:
+            cmd = [
+                'ffmpeg', '-y',
+                '-i', str(video_extended),
+                '-i', str(mixed_audio),
+                '-map', '0:v',
+                '-map', '1:a',
+                '-c:v', 'copy',
+                '-c:a', 'aac',
+                '-b:a', '192k',
+                str(video_with_audio)
+            ]
+        else:
+            cmd = [
+                'ffmpeg', '-y',
+                '-i', str(video_extended),
+                '-i', str(narration_file),
+                '-i', str(music_file),
+                '-filter_complex',
+                '[1:a]volume=1.0[narration];'
+                f'[2:a]volume={MUSIC_VOLUME}[music];'
+                '[narration][music]amix=inputs=2:duration=first:dropout_transition=2[audio]',
+                '-map', '0:v',
+                '-map', '[audio]',
+                '-c:v', 'copy',
+                '-c:a', 'aac',
+                '-b:a', '192k',
+                str(video_with_audio)
+            ]
 
         result = subprocess.run(cmd, capture_output=True, text=True)
 
@@ -322,21 +534,7 @@ class FinalProductionPipeline:
 
         # Step 5: Add subtitles with CORRECT styling
         if srt_file and srt_file.exists():
-            final_video = self.output_dir / "final_production_video.mp4"
-
-            # Subtitle styling: 1/3 size, bottom position, purple outline, NO box
-            # FontSize 24 is original, so 1/3 = 8
-            subtitle_style = (
-                "FontName=Arial,"
-                "FontSize=8,"  # 1/3 of original size
-                "PrimaryColour=&HFFFFFF,"  # White text
-                "OutlineColour=&HFF00FF,"  # Purple outline (BGR format)
-                "BackColour=&H00000000,"   # Fully transparent background
-                "BorderStyle=1,"           # Outline only (no box)
-                "Outline=1,"               # Thin outline
-                "Shadow=0,"                # No shadow
-                "MarginV=10"               # Very bottom of screen (10 pixels from bottom)
-            )
+            final_video = self.output_dir / final_name
 
             # Fix path for Windows
             srt_path = str(srt_file.absolute()).replace('\\', '/').replace(':', '\\:')
@@ -344,7 +542,7 @@ class FinalProductionPipeline:
             cmd = [
                 'ffmpeg', '-y',
                 '-i', str(video_with_audio),
-                '-vf', f"subtitles='{srt_path}':force_style='{subtitle_style}'",
+                '-vf', f"subtitles='{srt_path}':force_style='{SUBTITLE_STYLE}'",
                 '-c:a', 'copy',
                 str(final_video)
             ]
@@ -454,7 +652,16 @@ class FinalProductionPipeline:
         return final_video
 
 if __name__ == "__main__":
-    pipeline = FinalProductionPipeline()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Final production pipeline")
+    parser.add_argument('--assembly', choices=['single_pass', 'multi_pass'], default='single_pass',
+                        help='Video assembly path (default: single_pass, falls back to multi_pass)')
+    parser.add_argument('--compare-assembly', action='store_true',
+                        help='Run both assembly paths and write assembly_timing_report.json')
+    args = parser.parse_args()
+
+    pipeline = FinalProductionPipeline(assembly=args.assembly, compare_assembly=args.compare_assembly)
     result = pipeline.run()
 
     if result:
@@ -146,6 +146,7 @@ class ProductionPipeline:
 
         try:
             from elevenlabs.client import ElevenLabs
+            from audio_mixer import TTS_OUTPUT_FORMAT, save_tts_audio
 
             client = ElevenLabs(api_key=APIConfig.ELEVENLABS_API_KEY)
 
@@ -156,14 +157,12 @@ class ProductionPipeline:
             audio = client.text_to_speech.convert(
                 voice_id="EXAVITQu4vr4xnSDxMaL",  # Sarah
                 text=clean_script,
-                model_id="eleven_turbo_v2"
+                model_id="eleven_turbo_v2",
+                output_format=TTS_OUTPUT_FORMAT
             )
 
-            # Save
-            with open(narration_file, 'wb') as f:
-                for chunk in audio:
-                    if chunk:
-                        f.write(chunk)
+            # Save (pcm_* formats as narration.wav, lossless until the final mux)
+            narration_file = save_tts_audio(audio, narration_file, TTS_OUTPUT_FORMAT)
 
             size = narration_file.stat().st_size / 1024 / 1024
             print(f"[OK] Narration saved: {narration_file}")
@@ -266,9 +265,7 @@ class ProductionPipeline:
                             })
 
                 elif visual_type == "video":
-                    # Generate image first, then use WAN for video
-                    print(f"  [MODEL] WAN (Image-to-Video)")
-
+                    # Generate image first, then animate it (WAN or local motion)
                     # First generate a base image with Flux
                     image_result = fal_client.subscribe(
                         "fal-ai/flux-pro/v1.1",
@@ -282,30 +279,60 @@ class ProductionPipeline:
                     if image_result and 'images' in image_result:
                         image_url = image_result['images'][0]['url']
 
-                        # Now convert to video with WAN
-                        video_result = fal_client.subscribe(
-                            "fal-ai/wan-25-preview/image-to-video",
-                            arguments={
-                                "image_url": image_url,
-                                "prompt": content,
-                            }
-                        )
-
-                        if video_result and 'video' in video_result:
-                            video_url = video_result['video']['url']
-                            response = requests.get(video_url)
+                        # Local Ken Burns motion instead of WAN when latency/budget matters
+                        motion_backend = visual.get('motion_backend', os.getenv("PRODUCTION_MOTION_BACKEND", "wan"))
+                        if motion_backend == "local":
+                            from local_renderer import encode_motion_clip
 
+                            response = requests.get(image_url)
                             if response.status_code == 200:
-                                file_path = self.visuals_dir / f"visual_{i:02d}_video.mp4"
-                                with open(file_path, 'wb') as f:
+                                image_path = self.visuals_dir / f"visual_{i:02d}_video_source.jpg"
+                                with open(image_path, 'wb') as f:
                                     f.write(response.content)
 
+                                file_path = self.visuals_dir / f"visual_{i:02d}_video.mp4"
+                                print(f"  [MOTION] Local {visual.get('motion', 'zoom_in')} (no WAN call)")
+                                encode_motion_clip(file_path, {
+                                    'image': str(image_path),
+                                    'duration': 5,
+                                    'width': 1920,
+                                    'height': 1080,
+                                    'fps': 25,
+                                    'motion': visual.get('motion', 'zoom_in'),
+                                })
+
                                 print(f"  [OK] Saved: {file_path.name}")
                                 visuals.append({
                                     'file': file_path,
                                     'type': 'video',
                                     'duration': 5
                                 })
+                        else:
+                            # Now convert to video with WAN
+                            print(f"  [MODEL] WAN (Image-to-Video)")
+                            video_result = fal_client.subscribe(
+                                "fal-ai/wan-25-preview/image-to-video",
+                                arguments={
+                                    "image_url": image_url,
+                                    "prompt": content,
+                                }
+                            )
+
+                            if video_result and 'video' in video_result:
+                                video_url = video_result['video']['url']
+                                response = requests.get(video_url)
+
+                                if response.status_code == 200:
+                                    file_path = self.visuals_dir / f"visual_{i:02d}_video.mp4"
+                                    with open(file_path, 'wb') as f:
+                                        f.write(response.content)
+
+                                    print(f"  [OK] Saved: {file_path.name}")
+                                    visuals.append({
+                                        'file': file_path,
+                                        'type': 'video',
+                                        'duration': 5
+                                    })
 
                 # Small delay to avoid rate limits
                 time.sleep(2)
@@ -322,44 +349,54 @@ class ProductionPipeline:
         print("\n[4/6] Creating Video Timeline...")
         print("-" * 80)
 
-        clips = []
+        from local_renderer import default_workers, encode_still_clip, encoder_threads, render_chunks
+
+        clips = {}
+        jobs = []
+        workers = default_workers()
 
         for i, visual in enumerate(visuals, 1):
             clip_file = self.visuals_dir / f"clip_{i:02d}.mp4"
 
+            if visual['type'] == 'video':
+                # Already a video, just copy
+                import shutil
+                shutil.copy(visual['file'], clip_file)
+                clips[i] = clip_file
+                print(f"[{i}/{len(visuals)}] Video clip ready: {visual['file'].name}")
+            else:
+                # Convert image/infographic to video clip (encoded in parallel below)
+                jobs.append((clip_file, {
+                    'index': i,
+                    'image': str(visual['file']),
+                    'duration': visual['duration'],
+                    'width': 1920,
+                    'height': 1080,
+                    'fps': 25,
+                    'threads': encoder_threads(workers),
+                }))
+
+        if jobs:
+            print(f"[PARALLEL] Encoding {len(jobs)} image clips with {min(workers, len(jobs))} workers")
             try:
-                import subprocess
-
-                if visual['type'] == 'video':
-                    # Already a video, just copy
-                    import shutil
-                    shutil.copy(visual['file'], clip_file)
-                    clips.append(clip_file)
-                    print(f"[{i}/{len(visuals)}] Video clip ready: {visual['file'].name}")
+                render_chunks(encode_still_clip, jobs, workers)
+            except Exception as e:
+                print(f"[ERROR] Parallel clip encode failed: {e}")
 
+            for clip_file, job in jobs:
+                i = job['index']
+                if clip_file.exists():
+                    clips[i] = clip_file
+                    print(f"[{i}/{len(visuals)}] Clip created: {Path(job['image']).name} ({job['duration']}s)")
                 else:
-                    # Convert image/infographic to video clip
-                    cmd = [
-                        'ffmpeg', '-y', '-loop', '1',
-                        '-i', str(visual['file']),
-                        '-c:v', 'libx264', '-t', str(visual['duration']),
-                        '-pix_fmt', 'yuv420p',
-                        '-vf', 'scale=1920:1080:force_original_aspect_ratio=decrease,pad=1920:1080:(ow-iw)/2:(oh-ih)/2',
-                        str(clip_file)
-                    ]
-
-                    result = subprocess.run(cmd, capture_output=True)
-
-                    if result.returncode == 0:
-                        clips.append(clip_file)
-                        print(f"[{i}/{len(visuals)}] Clip created: {visual['file'].name} ({visual['duration']}s)")
+                    print(f"[ERROR] Failed to create clip {i}")
 
-            except Exception as e:
-                print(f"[ERROR] Failed to create clip {i}: {e}")
-                continue
+        clips = [clips[i] for i in sorted(clips)]
 
         # Concatenate clips
         if clips:
+            import subprocess
+
             concat_file = self.visuals_dir / "concat_list.txt"
             with open(concat_file, 'w') as f:
                 for clip in clips:
@@ -391,28 +428,57 @@ class ProductionPipeline:
 
         try:
             import subprocess
+            from audio_mixer import DUCK_GAP_BOOST_DB, ducking_enabled, stream_mix, volume_to_db
 
             # Mix at 10-15% background music volume
             print(f"[NARRATION] 100% volume")
             print(f"[MUSIC] 12% volume (background)")
 
-            cmd = [
-                'ffmpeg', '-y',
-                '-i', str(video_file),
-                '-i', str(narration_file),
-                '-i', str(music_file),
-                '-filter_complex',
-                '[1:a]volume=1.0[narration];'
-                '[2:a]volume=0.12[music];'
-                '[narration][music]amix=inputs=2:duration=first[audio]',
-                '-map', '0:v',
-                '-map', '[audio]',
-                '-c:v', 'copy',
-                '-c:a', 'aac',
-                '-b:a', '192k',
-                '-shortest',
-                str(final_video)
-            ]
+            mixed_audio = None
+            if ducking_enabled():
+                # Music at 12% under speech, raised between phrases (sidechain ducking)
+                try:
+                    mixed_audio = self.output_dir / "mixed_audio_ducked.wav"
+                    stream_mix(music_file, narration_file, mixed_audio,
+                               music_gain_db=volume_to_db(0.12),
+                               gap_gain_db=volume_to_db(0.12) + DUCK_GAP_BOOST_DB,
+                               normalize=True)
+                    print(f"[MUSIC] Ducked under narration (+{DUCK_GAP_BOOST_DB:.0f} dB in gaps)")
+                except Exception as e:
+                    print(f"[WARNING] Ducking failed ({e}), using flat music volume")
+                    mixed_audio = None
+
+            if mixed_audio:
+                cmd = [
+                    'ffmpeg', '-y',
+                    '-i', str(video_file),
+                    '-i', str(mixed_audio),
+                    '-map', '0:v',
+                    '-map', '1:a',
+                    '-c:v', 'copy',
+                    '-c:a', 'aac',
+                    '-b:a', '192k',
+                    '-shortest',
+                    str(final_video)
+                ]
+            else:
+                cmd = [
+                    'ffmpeg', '-y',
+                    '-i', str(video_file),
+                    '-i', str(narration_file),
+                    '-i', str(music_file),
+                    '-filter_complex',
+                    '[1:a]volume=1.0[narration];'
+                    '[2:a]volume=0.12[music];'
+                    '[narration][music]amix=inputs=2:duration=first[audio]',
+                    '-map', '0:v',
+                    '-map', '[audio]',
+                    '-c:v', 'copy',
+                    '-c:a', 'aac',
+                    '-b:a', '192k',
+                    '-shortest',
+                    str(final_video)
+                ]
 
             result = subprocess.run(cmd, capture_output=True, text=True)
 
@@ -0,0 +1,444 @@
+#!/usr/bin/env python3
+"""
+Distributed render farm for long-form videos
+
+A coordinator splits the timeline into independent segments and puts them
+in a SQLite queue on shared storage. Render workers (one or more per host)
+claim segments, encode them with identical encoder parameters, and publish
+them to a shared output directory. The coordinator stitches the finished
+segments with the concat demuxer (-c copy) and muxes the narration.
+
+Workers hold a lease on the segment they render and renew it with a
+heartbeat. When a worker dies its lease expires and the coordinator puts
+the segment back in the queue for another worker (or fails the job once the
+segment has been claimed MAX_ATTEMPTS times).
+
+The queue and output directory must live on storage every host can reach
+with working file locks (e.g. an NFS/SMB share). Host clocks should be
+NTP-synced because leases are compared against wall-clock time.
+
+Usage:
+    # Coordinator (optionally also running local workers)
+    python render_farm.py submit --queue /mnt/farm/queue.db --shared /mnt/farm/segments --local-workers 4
+
+    # Each render host
+    python render_farm.py worker --queue /mnt/farm/queue.db --shared /mnt/farm/segments
+
+    # Progress
+    python render_farm.py status --queue /mnt/farm/queue.db
+"""
+
+import json
+import logging
+import multiprocessing
+import os
+import socket
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from local_renderer import concat_segments, encode_still_clip
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+# Seconds a claim stays valid without a heartbeat before it is re-queued
+LEASE_SECONDS = float(os.getenv("RENDER_FARM_LEASE", "60"))
+
+# Seconds between queue polls (workers and coordinator)
+POLL_INTERVAL = float(os.getenv("RENDER_FARM_POLL", "2"))
+
+# Failed encodes or expired leases per segment before the whole job is marked failed
+MAX_ATTEMPTS = int(os.getenv("RENDER_FARM_MAX_ATTEMPTS", "3"))
+
+
+class RenderQueue:
+    """SQLite-backed segment queue shared by the coordinator and workers"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS segments (
+            job TEXT NOT NULL,
+            idx INTEGER NOT NULL,
+            chunk TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            worker TEXT,
+            heartbeat REAL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            error TEXT,
+            PRIMARY KEY (job, idx)
+        )
+    """
+
+    def __init__(self, db_path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(self.SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        # Autocommit mode; writers that read-then-update take BEGIN IMMEDIATE
+        return sqlite3.connect(str(self.db_path), timeout=30, isolation_level=None)
+
+    def enqueue(self, job: str, chunks: Sequence[Dict]):
+        """Add every chunk of a job as a pending segment (replaces an old job of that name)"""
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM segments WHERE job = ?", (job,))
+            conn.executemany(
+                "INSERT INTO segments (job, idx, chunk) VALUES (?, ?, ?)",
+                [(job, i, json.dumps(chunk)) for i, chunk in enumerate(chunks)]
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def claim(self, worker: str, job: Optional[str] = None) -> Optional[Tuple[str, int, Dict]]:
+        """Atomically take the next pending segment; returns (job, idx, chunk) or None"""
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            query = "SELECT job, idx, chunk FROM segments WHERE status = 'pending'"
+            params: Tuple = ()
+            if job:
+                query += " AND job = ?"
+                params = (job,)
+            row = conn.execute(query + " ORDER BY job, idx LIMIT 1", params).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+
+            conn.execute(
+                "UPDATE segments SET status = 'running', worker = ?, heartbeat = ?, "
+                "attempts = attempts + 1 WHERE job = ? AND idx = ?",
+                (worker, time.time(), row[0], row[1])
+            )
+            conn.execute("COMMIT")
+            return row[0], row[1], json.loads(row[2])
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def heartbeat(self, job: str, idx: int, worker: str) -> bool:
+        """Renew a claim; False if the segment was re-queued to someone else"""
+        conn = self._connect()
+        try:
+            cur = conn.execute(
+                "UPDATE segments SET heartbeat = ? "
+                "WHERE job = ? AND idx = ? AND worker = ? AND status = 'running'",
+                (time.time(), job, idx, worker)
+            )
+            return cur.rowcount == 1
+        finally:
+            conn.close()
+
+    def complete(self, job: str, idx: int, worker: str):
+        """Mark a segment done (the published file is valid whoever claimed it last)"""
+        conn = self._connect()
+        try:
+            conn.execute(
+                "UPDATE segments SET status = 'done', worker = ?, error = NULL "
+                "WHERE job = ? AND idx = ? AND status != 'done'",
+                (worker, job, idx)
+            )
+        finally:
+            conn.close()
+
+    def fail(self, job: str, idx: int, worker: str, error: str,
+             max_attempts: int = MAX_ATTEMPTS):
+        """Return a segment to the queue, or mark it failed after max_attempts"""
+        conn = self._connect()
+        try:
+            conn.execute(
+                "UPDATE segments SET "
+                "status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                "worker = NULL, heartbeat = NULL, error = ? "
+                "WHERE job = ? AND idx = ? AND worker = ? AND status = 'running'",
+                (max_attempts, error[-2000:], job, idx, worker)
+            )
+        finally:
+            conn.close()
+
+    def requeue_stale(self, lease_seconds: float = LEASE_SECONDS,
+                      max_attempts: int = MAX_ATTEMPTS) -> List[Tuple[str, int, str, str]]:
+        """
+        Put segments whose worker stopped heart-beating back in the queue, or
+        mark them failed after max_attempts (a segment that kills its worker
+        every time must not cycle forever). Returns (job, idx, worker, new
+        status) per expired lease.
+        """
+        status = "CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END"
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            cutoff = time.time() - lease_seconds
+            stale = conn.execute(
+                f"SELECT job, idx, worker, {status} FROM segments "
+                "WHERE status = 'running' AND heartbeat < ?", (max_attempts, cutoff)
+            ).fetchall()
+            conn.execute(
+                f"UPDATE segments SET status = {status}, worker = NULL, heartbeat = NULL, "
+                "error = 'lease expired (worker ' || worker || ' stopped responding)' "
+                "WHERE status = 'running' AND heartbeat < ?", (max_attempts, cutoff)
+            )
+            conn.execute("COMMIT")
+            return stale
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def progress(self, job: Optional[str] = None) -> Dict[str, int]:
+        """Segment counts by status (for one job or the whole queue)"""
+        conn = self._connect()
+        try:
+            query = "SELECT status, COUNT(*) FROM segments"
+            params: Tuple = ()
+            if job:
+                query += " WHERE job = ?"
+                params = (job,)
+            counts = {"pending": 0, "running": 0, "done": 0, "failed": 0}
+            for status, count in conn.execute(query + " GROUP BY status", params):
+                counts[status] = count
+            counts["total"] = sum(counts.values())
+            return counts
+        finally:
+            conn.close()
+
+    def errors(self, job: str) -> List[Tuple[int, str]]:
+        """(idx, last error) for every failed segment of a job"""
+        conn = self._connect()
+        try:
+            return conn.execute(
+                "SELECT idx, error FROM segments WHERE job = ? AND status = 'failed' ORDER BY idx",
+                (job,)
+            ).fetchall()
+        finally:
+            conn.close()
+
+
+def segment_path(shared_dir, job: str, idx: int) -> Path:
+    """Where a finished segment is published in the shared output directory"""
+    return Path(shared_dir) / job / f"segment_{idx:05d}.mp4"
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def _keep_alive(queue: RenderQueue, job: str, idx: int, worker: str,
+                stop: threading.Event, interval: float):
+    while not stop.wait(interval):
+        if not queue.heartbeat(job, idx, worker):
+            logger.warning(f"[{worker}] Lost lease on {job}#{idx}, finishing anyway")
+            return
+
+
+def run_worker(queue_path, shared_dir, worker_id: Optional[str] = None,
+               lease_seconds: float = LEASE_SECONDS, poll_interval: float = POLL_INTERVAL,
+               exit_when_idle: bool = False, job: Optional[str] = None) -> int:
+    """
+    Claim, render and publish segments until stopped (or the queue drains)
+
+    Segments are encoded to a worker-private temp name and renamed into
+    place, so the coordinator never sees a partially written file.
+    Returns the number of segments this worker rendered.
+    """
+    queue = RenderQueue(queue_path)
+    worker_id = worker_id or default_worker_id()
+    rendered = 0
+
+    logger.info(f"[{worker_id}] Render worker started (queue: {queue_path})")
+
+    while True:
+        claimed = queue.claim(worker_id, job)
+        if claimed is None:
+            counts = queue.progress(job)
+            if exit_when_idle and counts["pending"] == 0 and counts["running"] == 0:
+                break
+            time.sleep(poll_interval)
+            continue
+
+        seg_job, idx, chunk = claimed
+        final_path = segment_path(shared_dir, seg_job, idx)
+        final_path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = final_path.with_name(f".{worker_id}.{final_path.name}")
+
+        stop = threading.Event()
+        pulse = threading.Thread(target=_keep_alive, daemon=True,
+                                 args=(queue, seg_job, idx, worker_id, stop, lease_seconds / 3))
+        pulse.start()
+
+        start_time = time.perf_counter()
+        try:
+            frames = encode_still_clip(temp_path, chunk)
+            os.replace(temp_path, final_path)
+        except Exception as e:
+            temp_path.unlink(missing_ok=True)
+            logger.error(f"[{worker_id}] Segment {seg_job}#{idx} failed: {e}")
+            queue.fail(seg_job, idx, worker_id, str(e))
+            continue
+        finally:
+            stop.set()
+            pulse.join()
+
+        queue.complete(seg_job, idx, worker_id)
+        rendered += 1
+        logger.info(f"[{worker_id}] Segment {seg_job}#{idx} published: {frames} frames "
+                    f"in {time.perf_counter() - start_time:.1f}s")
+
+    logger.info(f"[{worker_id}] Queue drained, rendered {rendered} segments")
+    return rendered
+
+
+def _worker_process(queue_path, shared_dir, worker_id, lease_seconds, poll_interval, job):
+    run_worker(queue_path, shared_dir, worker_id, lease_seconds, poll_interval,
+               exit_when_idle=True, job=job)
+
+
+def coordinate(job: str, chunks: Sequence[Dict], queue_path, shared_dir, output_path,
+               audio_path=None, local_workers: int = 0,
+               lease_seconds: float = LEASE_SECONDS, poll_interval: float = POLL_INTERVAL,
+               timeout: Optional[float] = None) -> Dict:
+    """
+    Queue a job, wait for workers to render it, and stitch the final MP4
+
+    local_workers starts that many worker processes on this host as well.
+    Dead workers' segments are re-queued whenever their lease expires, up
+    to MAX_ATTEMPTS claims per segment.
+    """
+    queue = RenderQueue(queue_path)
+    queue.enqueue(job, chunks)
+    logger.info(f"Queued {len(chunks)} segments for job '{job}'")
+
+    processes = []
+    for n in range(local_workers):
+        worker_id = f"{default_worker_id()}-local{n}"
+        proc = multiprocessing.Process(
+            target=_worker_process,
+            args=(queue_path, shared_dir, worker_id, lease_seconds, poll_interval, job)
+        )
+        proc.start()
+        processes.append(proc)
+
+    start_time = time.perf_counter()
+    last_done = -1
+    try:
+        while True:
+            for stale_job, idx, worker, status in queue.requeue_stale(lease_seconds):
+                action = "re-queued" if status == "pending" else "failed"
+                logger.warning(f"Worker {worker} stopped responding, {action} {stale_job}#{idx}")
+
+            counts = queue.progress(job)
+            if counts["failed"]:
+                details = "; ".join(f"#{idx}: {error}" for idx, error in queue.errors(job))
+                raise RuntimeError(f"Render job '{job}' failed: {details}")
+            if counts["done"] != last_done:
+                logger.info(f"Progress: {counts['done']}/{counts['total']} segments "
+                            f"({counts['running']} rendering)")
+                last_done = counts["done"]
+            if counts["done"] == counts["total"]:
+                break
+            if timeout and time.perf_counter() - start_time > timeout:
+                raise TimeoutError(f"Render job '{job}' did not finish in {timeout:.0f}s")
+            time.sleep(poll_interval)
+    finally:
+        for proc in processes:
+            if proc.is_alive():
+                proc.terminate()
+            proc.join()
+
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    segments = [segment_path(shared_dir, job, idx) for idx in range(len(chunks))]
+    concat_segments(segments, output_path, segment_path(shared_dir, job, 0).with_name("concat_list.txt"),
+                    audio_path=audio_path)
+
+    elapsed = time.perf_counter() - start_time
+    frames = sum(int(round(chunk["duration"] * chunk["fps"])) for chunk in chunks)
+    logger.info(f"Stitched {len(segments)} segments into {output_path} in {elapsed:.1f}s")
+    return {
+        "job": job,
+        "frames": frames,
+        "segments": len(segments),
+        "elapsed_seconds": elapsed,
+        "fps": frames / elapsed if elapsed > 0 else 0.0,
+        "output": str(output_path)
+    }
+
+
+def submit_longform(queue_path, shared_dir, output_path="output/longform_video.mp4",
+                    images_dir="output/generated_images", narration_path="output/narration.mp3",
+                    job: Optional[str] = None, **kwargs) -> Dict:
+    """Render the enhanced_video_assembly_longform timeline on the farm"""
+    from enhanced_video_assembly_longform import build_local_segments
+
+    images = sorted(Path(images_dir).glob("*.png"))
+    if not images:
+        raise FileNotFoundError(f"No images found in {images_dir}")
+
+    narration = Path(narration_path)
+    audio_path = narration if narration.exists() else None
+    if audio_path is None:
+        logger.warning(f"Narration not found ({narration}), rendering without audio")
+
+    chunks = build_local_segments(images)
+    job = job or f"longform_{int(time.time())}"
+    return coordinate(job, chunks, queue_path, shared_dir, output_path,
+                      audio_path=audio_path, **kwargs)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Distributed long-form render farm")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    for name in ("submit", "worker", "status"):
+        cmd = sub.add_parser(name)
+        cmd.add_argument('--queue', default="output/render_farm/queue.db",
+                         help='SQLite queue on shared storage')
+        if name != "status":
+            cmd.add_argument('--shared', default="output/render_farm/segments",
+                             help='Shared directory for published segments')
+            cmd.add_argument('--lease', type=float, default=LEASE_SECONDS,
+                             help=f'Seconds without heartbeat before re-queue (default: {LEASE_SECONDS:.0f})')
+        cmd.add_argument('--job', default=None, help='Job name (default: longform_<timestamp>)')
+
+    submit = sub.choices["submit"]
+    submit.add_argument('--output', default="output/longform_video.mp4")
+    submit.add_argument('--images', default="output/generated_images")
+    submit.add_argument('--narration', default="output/narration.mp3")
+    submit.add_argument('--local-workers', type=int, default=0,
+                        help='Worker processes to run on this host as well')
+
+    worker = sub.choices["worker"]
+    worker.add_argument('--worker-id', default=None)
+    worker.add_argument('--exit-when-idle', action='store_true',
+                        help='Stop once the queue has no pending or running segments')
+
+    args = parser.parse_args()
+
+    if args.command == "status":
+        print(json.dumps(RenderQueue(args.queue).progress(args.job), indent=2))
+    elif args.command == "worker":
+        run_worker(args.queue, args.shared, args.worker_id, lease_seconds=args.lease,
+                   exit_when_idle=args.exit_when_idle, job=args.job)
+    else:
+        try:
+            stats = submit_longform(args.queue, args.shared, args.output, args.images,
+                                    args.narration, job=args.job,
+                                    local_workers=args.local_workers, lease_seconds=args.lease)
+            logger.info(f"Render complete: {stats['output']} ({stats['fps']:.0f} fps)")
+        except Exception as e:
+            logger.error(f"Render farm failed: {e}")
+            exit(1)
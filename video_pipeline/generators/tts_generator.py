@@ -201,8 +201,23 @@ class TTSGenerator:
             Duration in seconds
 
         Note:
-            This requires ffprobe or similar tool to be installed
+            Uses the repo's cached media_probe (header parse, no decode) when
+            importable, otherwise ffprobe
         """
+        try:
+            from media_probe import probe_duration
+        except ImportError:
+            probe_duration = None
+
+        if probe_duration is not None:
+            try:
+                duration = probe_duration(audio_path)
+                logger.debug(f"Audio duration: {duration}s for {audio_path.name}")
+                return duration
+            except (OSError, RuntimeError) as e:
+                logger.warning(f"Cannot determine audio duration: {e}")
+                return 0.0
+
         try:
             import subprocess
             import json